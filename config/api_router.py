@@ -1,6 +1,18 @@
 from django.conf import settings
 from rest_framework.routers import DefaultRouter, SimpleRouter
 
+from memo.flashcards.api.views import (
+    CardSyncViewSet,
+    CardViewSet,
+    MembershipSyncViewSet,
+    PerformanceSyncViewSet,
+    PerformanceViewSet,
+    ReviewViewSet,
+    StudyGroupViewSet,
+    TombstoneSyncViewSet,
+    TopicSyncViewSet,
+    TopicViewSet,
+)
 from memo.users.api.views import UserViewSet
 
 if settings.DEBUG:
@@ -9,6 +21,21 @@ else:
     router = SimpleRouter()
 
 router.register("users", UserViewSet)
+# Read api of the user's groups
+router.register("groups", StudyGroupViewSet, basename="group")
+router.register("topics", TopicViewSet, basename="topic")
+router.register("cards", CardViewSet, basename="card")
+router.register("performances", PerformanceViewSet, basename="performance")
+# Delta sync of the user's groups (offline clients)
+router.register("sync/memberships", MembershipSyncViewSet, basename="sync-membership")
+router.register("sync/topics", TopicSyncViewSet, basename="sync-topic")
+router.register("sync/cards", CardSyncViewSet, basename="sync-card")
+router.register(
+    "sync/performances", PerformanceSyncViewSet, basename="sync-performance"
+)
+router.register("sync/tombstones", TombstoneSyncViewSet, basename="sync-tombstone")
+# Batch upload of reviews (offline sessions)
+router.register("reviews", ReviewViewSet, basename="review")
 
 
 app_name = "api"
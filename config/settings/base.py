@@ -1,6 +1,7 @@
 """
 Base settings to build other settings files upon.
 """
+
 from pathlib import Path
 
 import environ
@@ -62,6 +63,7 @@ DJANGO_APPS = [
     "django.contrib.staticfiles",
     # "django.contrib.humanize", # Handy template tags
     "django.contrib.admin",
+    "django.contrib.postgres",  # pg_trgm lookups & indexes
     "django.forms",
 ]
 THIRD_PARTY_APPS = [
@@ -197,6 +199,7 @@ TEMPLATES = [
                 "django.contrib.messages.context_processors.messages",
                 "memo.utils.context_processors.settings_context",
                 "memo.utils.context_processors.default_domain",
+                "memo.flashcards.context_processors.due_cards",
             ],
         },
     }
@@ -296,6 +299,37 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# http://docs.celeryproject.org/en/latest/userguide/periodic-tasks.html#beat-entries
+CELERY_BEAT_SCHEDULE = {
+    "refresh-public-catalogue": {
+        "task": "studygroups.tasks.refresh_public_catalogue",
+        "schedule": 10 * 60,
+    },
+    "prune-tombstones": {
+        "task": "flashcards.tasks.prune_tombstones",
+        "schedule": 24 * 60 * 60,
+    },
+    "rebuild-member-progress": {
+        "task": "studygroups.tasks.rebuild_member_progress",
+        "schedule": 24 * 60 * 60,
+    },
+    "rebuild-daily-study-stats": {
+        "task": "flashcards.tasks.rebuild_daily_study_stats",
+        "schedule": 24 * 60 * 60,
+    },
+    "refresh-due-counts": {
+        "task": "flashcards.tasks.refresh_due_counts",
+        "schedule": 15 * 60,
+    },
+    "send-due-digests": {
+        "task": "flashcards.tasks.send_due_digests",
+        "schedule": 24 * 60 * 60,
+    },
+    "take-share-snapshots": {
+        "task": "shareholder.tasks.take_share_snapshots",
+        "schedule": 24 * 60 * 60,
+    },
+}
 
 # Import Export Celery
 # https://github.com/auto-mat/django-import-export-celery
@@ -12,3 +12,20 @@ def media_storage(settings, tmpdir):
 @pytest.fixture
 def user() -> User:
     return UserFactory()
+
+
+def pytest_terminal_summary(terminalreporter):
+    # Reports the timings of the benchmark tests (record_property "benchmark")
+    reports = terminalreporter.stats.get("passed", []) + terminalreporter.stats.get(
+        "failed", []
+    )
+    timings = [
+        (report.nodeid, value)
+        for report in reports
+        for name, value in report.user_properties
+        if name == "benchmark"
+    ]
+    if timings:
+        terminalreporter.section("benchmarks")
+        for nodeid, value in timings:
+            terminalreporter.write_line("%s: %s" % (nodeid, value))
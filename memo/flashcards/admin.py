@@ -1,10 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
-from django.utils.html import strip_tags
 from import_export import fields, resources, widgets
 from import_export.admin import ImportExportModelAdmin
 from import_export_celery.admin_actions import create_export_job_action
 from studygroups.models import StudyGroup
+from utils.admin import IndexedSearchMixin
+from utils.pagination import EstimatedCountPaginator
 
 from .models import Card, Performance, Topic
 
@@ -66,7 +67,7 @@ class CardInline(admin.TabularInline):
 
 
 @admin.register(Topic)
-class TopicAdmin(admin.ModelAdmin):
+class TopicAdmin(IndexedSearchMixin, admin.ModelAdmin):
     save_on_top = True
     list_display = (
         "group",
@@ -79,7 +80,7 @@ class TopicAdmin(admin.ModelAdmin):
         "created_at",
         "updated_at",
     ]
-    search_fields = ["group", "title"]
+    search_fields = ["title", "group__name"]
     autocomplete_fields = ["group"]
     inlines = [
         CardInline,
@@ -126,23 +127,24 @@ class PerformanceInline(admin.TabularInline):
 
 
 @admin.register(Card)
-class CardAdmin(ImportExportModelAdmin):
+class CardAdmin(IndexedSearchMixin, ImportExportModelAdmin):
     save_on_top = True
     list_display = (
-        "front_text",
+        "preview",
         "group",
         "topic",
         "good_one",
         "creator",
     )
-    list_display_links = ("front_text",)
+    list_display_links = ("preview",)
     readonly_fields = [
         "id",
         "unique_id",
         "created_at",
         "updated_at",
     ]
-    search_fields = ["front_text", "back_text", "topic", "group"]
+    # search_text: normalized text of both sides (trigram index)
+    search_fields = ["search_text", "topic__title", "group__name"]
     autocomplete_fields = ["group", "creator"]
     inlines = [PerformanceInline]
     actions = (create_export_job_action,)
@@ -179,7 +181,7 @@ class CardAdmin(ImportExportModelAdmin):
 
 
 @admin.register(Performance)
-class PerformanceAdmin(admin.ModelAdmin):
+class PerformanceAdmin(IndexedSearchMixin, admin.ModelAdmin):
     save_on_top = True
     list_display = (
         "owner",
@@ -198,6 +200,10 @@ class PerformanceAdmin(admin.ModelAdmin):
         "is_paused",
         "priority",
     )
+    list_select_related = ("owner", "card")
+    # no exact COUNT(*) of the whole table per changelist page
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = [
         "id",
         "unique_id",
@@ -215,7 +221,7 @@ class PerformanceAdmin(admin.ModelAdmin):
         "card_front_text",
         "card_back_text",
     ]
-    search_fields = ["owner__username", "card__front_text", "card__back_text"]
+    search_fields = ["^owner__username", "card__search_text"]
     autocomplete_fields = ["owner", "card"]
     actions = ["reset_data"]
     fieldsets = (
@@ -259,23 +265,22 @@ class PerformanceAdmin(admin.ModelAdmin):
     )
 
     def short_card_title(self, obj):
-        return strip_tags(obj.card.front_text)[:30]
+        return obj.card.preview
 
     short_card_title.short_description = "Card"
 
     def card_front_text(self, obj):
-        return obj.card.front_text
+        return obj.card.front_plain
 
     card_front_text.short_description = "Front Side"
 
     def card_back_text(self, obj):
-        return obj.card.back_text
+        return obj.card.back_plain
 
     card_back_text.short_description = "Back Side"
 
     def reset_data(self, request, queryset):
-        for obj in queryset:
-            obj.set_initial_data()
-            obj.save()
+        count = Performance.objects.reset_data(queryset)
+        self.message_user(request, "%d performances reset." % count)
 
     reset_data.short_description = "Reset data to initial value"
@@ -0,0 +1,175 @@
+#
+# Learning analytics
+# The review history (Performance.data) is loaded as columnar NumPy arrays with
+# one row per data point, sorted by performance and time. Every metric is then
+# computed with vectorized operations over the whole history instead of a
+# Python loop per Performance.
+import numpy as np
+
+DAY = np.timedelta64(1, "D")
+# highest outcome of a data point per mode (outcomes are normalized to 0-1)
+MAX_OUTCOME = {"learning": 1, "recalling": 5}
+# last recall outcome (normalized) of a mastered card
+MASTERY_THRESHOLD = 0.8
+# upper bounds (days since the previous review) of the retention curve bins
+RETENTION_BINS = (1, 2, 4, 7, 14, 30, 60, 120)
+# topic id of cards without a topic
+NO_TOPIC = -1
+
+
+class ReviewHistory:
+    """
+    Columnar review history
+    performance, owner, topic: ids of the data point's performance, its owner
+    and the card's topic; recall: recall (True) or training data point;
+    outcome: normalized to 0-1; duration: seconds; reviewed_at: datetime64[s]
+    """
+
+    COLUMNS = (
+        "performance",
+        "owner",
+        "topic",
+        "recall",
+        "outcome",
+        "duration",
+        "reviewed_at",
+    )
+
+    def __init__(
+        self, performance, owner, topic, recall, outcome, duration, reviewed_at
+    ):
+        order = np.lexsort((reviewed_at, performance))
+        self.performance = performance[order]
+        self.owner = owner[order]
+        self.topic = topic[order]
+        self.recall = recall[order]
+        self.outcome = outcome[order]
+        self.duration = duration[order]
+        self.reviewed_at = reviewed_at[order]
+
+    def __len__(self):
+        return len(self.performance)
+
+    @classmethod
+    def load(cls, performances, batch_size=2000):
+        # Loads the history of a Performance queryset (one query per batch)
+        rows = performances.values_list(
+            "pk", "owner_id", "card__topic_id", "data"
+        ).iterator(chunk_size=batch_size)
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_rows(cls, rows):
+        # rows: (performance id, owner id, topic id, data) tuples
+        # The columns are collected as lists and converted to arrays once
+        performance, owner, topic, recall = [], [], [], []
+        outcome, duration, reviewed_at = [], [], []
+        for performance_id, owner_id, topic_id, data in rows:
+            for mode in MAX_OUTCOME:
+                points = data.get(mode, [])
+                if not points:
+                    continue
+                count = len(points)
+                performance.extend([performance_id] * count)
+                owner.extend([owner_id] * count)
+                topic.extend([topic_id or NO_TOPIC] * count)
+                recall.extend([mode == "recalling"] * count)
+                for timestamp, outcome_int, duration_sec in points:
+                    reviewed_at.append(timestamp)
+                    outcome.append(outcome_int)
+                    duration.append(duration_sec)
+        recall = np.array(recall, dtype=bool)
+        max_outcome = np.where(
+            recall, MAX_OUTCOME["recalling"], MAX_OUTCOME["learning"]
+        )
+        return cls(
+            performance=np.array(performance, dtype=np.int64),
+            owner=np.array(owner, dtype=np.int64),
+            topic=np.array(topic, dtype=np.int64),
+            recall=recall,
+            outcome=np.array(outcome, dtype=np.float64) / max_outcome,
+            duration=np.array(duration, dtype=np.float64),
+            # ISO strings (or datetimes) with or without milliseconds
+            reviewed_at=np.array(reviewed_at, dtype="datetime64[ms]").astype(
+                "datetime64[s]"
+            ),
+        )
+
+    def split_by_owner(self):
+        # Returns {owner id: ReviewHistory of the owner}
+        order = np.argsort(self.owner, kind="stable")
+        owners, starts = np.unique(self.owner[order], return_index=True)
+        columns = [
+            np.split(getattr(self, name)[order], starts[1:])
+            for name in ReviewHistory.COLUMNS
+        ]
+        return {
+            int(owner): ReviewHistory(*parts) for owner, *parts in zip(owners, *columns)
+        }
+
+    def score(self):
+        # Mean recall score (0-100) of the reviewed performances
+        if not self.recall.any():
+            return 0.0
+        performances = self.performance[self.recall]
+        outcomes = self.outcome[self.recall]
+        ids, inverse = np.unique(performances, return_inverse=True)
+        means = np.bincount(inverse, weights=outcomes) / np.bincount(inverse)
+        return float(means.mean() * 100)
+
+    def last_recalls(self):
+        # Returns the indices of the last recall data point of each performance
+        indices = np.flatnonzero(self.recall)
+        performances = self.performance[indices]
+        is_last = np.append(performances[1:] != performances[:-1], True)
+        return indices[is_last[: len(indices)]]
+
+    def topic_mastery(self, threshold=MASTERY_THRESHOLD):
+        # {topic id: (cards recalled, cards mastered)} by the last recall outcome
+        last = self.last_recalls()
+        topics, inverse = np.unique(self.topic[last], return_inverse=True)
+        cards = np.bincount(inverse, minlength=len(topics))
+        mastered = np.bincount(
+            inverse, weights=self.outcome[last] >= threshold, minlength=len(topics)
+        )
+        return {
+            int(topic): (int(n), int(m)) for topic, n, m in zip(topics, cards, mastered)
+        }
+
+    def retention_curve(self, bins=RETENTION_BINS):
+        # [(max days, mean recall outcome, reviews)] by the days since the
+        # previous review of the performance (max days None: older)
+        same = self.performance[1:] == self.performance[:-1]
+        mask = same & self.recall[1:]
+        intervals = (self.reviewed_at[1:] - self.reviewed_at[:-1])[mask] / DAY
+        index = np.digitize(intervals, bins, right=True)
+        reviews = np.bincount(index, minlength=len(bins) + 1)
+        outcomes = np.bincount(
+            index, weights=self.outcome[1:][mask], minlength=len(bins) + 1
+        )
+        retention = np.divide(
+            outcomes, reviews, out=np.zeros(len(reviews)), where=reviews > 0
+        )
+        return list(zip(list(bins) + [None], retention.tolist(), reviews.tolist()))
+
+    def days(self):
+        return self.reviewed_at.astype("datetime64[D]")
+
+    def time_on_task(self):
+        # [(day, seconds)] of the days with reviews
+        days, inverse = np.unique(self.days(), return_inverse=True)
+        seconds = np.bincount(inverse, weights=self.duration, minlength=len(days))
+        return list(zip(days.tolist(), seconds.astype(int).tolist()))
+
+    def streaks(self, today):
+        # (current, longest) number of consecutive days with reviews
+        # the current streak is kept until the end of the day after its last day
+        days = np.unique(self.days())
+        if not len(days):
+            return 0, 0
+        breaks = np.diff(days) != DAY
+        runs = np.bincount(np.concatenate(([0], np.cumsum(breaks))))
+        current = 0
+        if days[-1] >= np.datetime64(today, "D") - DAY:
+            current = int(runs[-1])
+        return current, int(runs.max())
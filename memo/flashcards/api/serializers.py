@@ -0,0 +1,269 @@
+import hashlib
+import json
+from operator import attrgetter
+
+from django.core.cache import cache
+from flashcards.models import Card, Performance, Tombstone, Topic
+from rest_framework import serializers
+from studygroups.models import Membership, StudyGroup
+from utils.cache import count_cache_access
+
+# Serialized payloads of the read api, per object and field set
+PAYLOAD_CACHE_KEY = "api:payload:%s:%s:%s"
+PAYLOAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class StudyGroupSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StudyGroup
+        fields = [
+            "unique_id",
+            "name",
+            "slug",
+            "is_main_user_group",
+            "is_publicly_available",
+            "updated_at",
+        ]
+
+
+class MembershipSyncSerializer(serializers.ModelSerializer):
+    group = StudyGroupSyncSerializer()
+
+    class Meta:
+        model = Membership
+        fields = ["unique_id", "group", "role", "approved", "blocked", "updated_at"]
+
+
+class TopicSyncSerializer(serializers.ModelSerializer):
+    group = serializers.SlugRelatedField(slug_field="unique_id", read_only=True)
+
+    class Meta:
+        model = Topic
+        fields = ["unique_id", "group", "title", "created_at", "updated_at"]
+
+
+class CardSyncSerializer(serializers.ModelSerializer):
+    group = serializers.SlugRelatedField(slug_field="unique_id", read_only=True)
+    topic = serializers.SlugRelatedField(slug_field="unique_id", read_only=True)
+
+    class Meta:
+        model = Card
+        fields = [
+            "unique_id",
+            "group",
+            "topic",
+            "front_text",
+            "back_text",
+            "front_html",
+            "back_html",
+            "preview",
+            "created_at",
+            "updated_at",
+        ]
+
+
+class PerformanceSyncSerializer(serializers.ModelSerializer):
+    card = serializers.SlugRelatedField(slug_field="unique_id", read_only=True)
+
+    class Meta:
+        model = Performance
+        fields = [
+            "unique_id",
+            "card",
+            "learn_timeout",
+            "recall_timeout",
+            "is_paused",
+            "priority",
+            "data",
+            "recall_total_time",
+            "recall_trials",
+            "recall_score",
+            "learn_total_time",
+            "learn_trials",
+            "learn_score",
+            "updated_at",
+        ]
+
+
+class TombstoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tombstone
+        fields = ["kind", "unique_id", "deleted_at"]
+
+
+class ReviewSerializer(serializers.Serializer):
+    """
+    A review event of an offline session
+    client_id is generated by the client once per event; reviewed_at is the
+    time of the review on the client
+    """
+
+    # highest outcome per mode (train: wrong/right, recall: 0 to 5)
+    MAX_OUTCOME = {"train": 1, "recall": 5}
+
+    client_id = serializers.UUIDField()
+    performance = serializers.UUIDField()
+    mode = serializers.ChoiceField(choices=["train", "recall"])
+    outcome_int = serializers.IntegerField(min_value=0)
+    duration_sec = serializers.IntegerField(min_value=0)
+    reviewed_at = serializers.DateTimeField()
+
+    def validate(self, attrs):
+        if attrs["outcome_int"] > self.MAX_OUTCOME[attrs["mode"]]:
+            raise serializers.ValidationError(
+                {"outcome_int": "Must be at most %d." % self.MAX_OUTCOME[attrs["mode"]]}
+            )
+        return attrs
+
+
+class CachedListSerializer(serializers.ListSerializer):
+    # Serializes a page with one cache round trip; only misses are serialized
+    def to_representation(self, data):
+        instances = list(data.all() if hasattr(data, "all") else data)
+        keys = [self.child.get_cache_key(instance) for instance in instances]
+        cached = cache.get_many(keys)
+        missing = {}
+        for key, instance in zip(keys, instances):
+            hit = key in cached
+            count_cache_access("api_payload", hit)
+            if not hit:
+                missing[key] = self.child.to_representation(instance)
+        cache.set_many(missing, PAYLOAD_CACHE_TIMEOUT)
+        cached.update(missing)
+        return [cached[key] for key in keys]
+
+
+class ReadSerializer(serializers.ModelSerializer):
+    """
+    Read api serializer with sparse fieldsets and cached payloads
+    The fields of the context ("fields", e.g. from ?fields=) limit the output.
+    Meta.select_related / Meta.prefetch_related map fields to the relations
+    they read, so views only join what is requested (get_relations). Payloads
+    are cached per object and field set and versioned by the updated_at of the
+    object and of its loaded relations.
+    """
+
+    class Meta:
+        list_serializer_class = CachedListSerializer
+        select_related = {}
+        prefetch_related = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get("fields")
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_relations(cls, fields=None):
+        # returns the (select_related, prefetch_related) lookups of fields
+        fields = fields or cls.Meta.fields
+        return (
+            [
+                cls.Meta.select_related[f]
+                for f in fields
+                if f in cls.Meta.select_related
+            ],
+            [
+                cls.Meta.prefetch_related[f]
+                for f in fields
+                if f in cls.Meta.prefetch_related
+            ],
+        )
+
+    def get_cache_version(self, instance):
+        # returns the updated_at of instance and of the relations of the fields
+        version = [instance.updated_at]
+        for name in self.fields:
+            if name in self.Meta.select_related:
+                related = attrgetter(self.Meta.select_related[name])(instance)
+                version.append(getattr(related, "updated_at", None))
+            elif name in self.Meta.prefetch_related:
+                # count and last change of the (prefetched) related rows
+                related = getattr(instance, name).all()
+                version.append(len(related))
+                version.append(max((r.updated_at for r in related), default=None))
+        return version
+
+    def get_cache_key(self, instance):
+        version = [sorted(self.fields), self.get_cache_version(instance)]
+        digest = hashlib.md5(json.dumps(version, default=str).encode()).hexdigest()
+        return PAYLOAD_CACHE_KEY % (
+            self.Meta.model._meta.label_lower,
+            instance.pk,
+            digest,
+        )
+
+
+class StudyGroupSerializer(ReadSerializer):
+    topics = serializers.SlugRelatedField(
+        slug_field="unique_id", many=True, read_only=True
+    )
+
+    class Meta(ReadSerializer.Meta):
+        model = StudyGroup
+        fields = [
+            "unique_id",
+            "name",
+            "slug",
+            "description",
+            "is_main_user_group",
+            "is_publicly_available",
+            "topics",
+            "created_at",
+            "updated_at",
+        ]
+        prefetch_related = {"topics": "topics"}
+
+
+class TopicSerializer(ReadSerializer):
+    group = serializers.SlugRelatedField(slug_field="unique_id", read_only=True)
+
+    class Meta(ReadSerializer.Meta):
+        model = Topic
+        fields = ["unique_id", "group", "title", "created_at", "updated_at"]
+        select_related = {"group": "group"}
+
+
+class CardSerializer(ReadSerializer):
+    group = serializers.SlugRelatedField(slug_field="unique_id", read_only=True)
+    topic = serializers.SlugRelatedField(slug_field="unique_id", read_only=True)
+
+    class Meta(ReadSerializer.Meta):
+        model = Card
+        fields = [
+            "unique_id",
+            "group",
+            "topic",
+            "front_text",
+            "back_text",
+            "front_html",
+            "back_html",
+            "preview",
+            "good_one",
+            "created_at",
+            "updated_at",
+        ]
+        select_related = {"group": "group", "topic": "topic"}
+
+
+class PerformanceSerializer(ReadSerializer):
+    card = serializers.SlugRelatedField(slug_field="unique_id", read_only=True)
+
+    class Meta(ReadSerializer.Meta):
+        model = Performance
+        fields = [
+            "unique_id",
+            "card",
+            "is_paused",
+            "priority",
+            "recall_trials",
+            "recall_score",
+            "learn_trials",
+            "learn_score",
+            "data",
+            "created_at",
+            "updated_at",
+        ]
+        select_related = {"card": "card"}
@@ -0,0 +1,301 @@
+import datetime
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from flashcards.models import TOMBSTONE_RETENTION, Card, Performance, Tombstone, Topic
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet, ReadOnlyModelViewSet
+from studygroups.models import Membership, StudyGroup
+from utils.pagination import (
+    KeysetCursorPagination,
+    KeysetPaginator,
+    decode_cursor,
+    encode_cursor,
+)
+from utils.views import parse_uuid
+
+from .serializers import (
+    CardSerializer,
+    CardSyncSerializer,
+    MembershipSyncSerializer,
+    PerformanceSerializer,
+    PerformanceSyncSerializer,
+    ReviewSerializer,
+    StudyGroupSerializer,
+    TombstoneSerializer,
+    TopicSerializer,
+    TopicSyncSerializer,
+)
+
+# Start of the oldest transaction in flight of the other client sessions
+OLDEST_TRANSACTION_SQL = """
+SELECT min(xact_start) FROM pg_stat_activity
+WHERE datname = current_database()
+AND backend_type = 'client backend'
+AND pid <> pg_backend_pid()
+"""
+
+
+@method_decorator(gzip_page, name="dispatch")
+class SyncViewSet(GenericViewSet):
+    """
+    Delta sync: the rows changed since a cursor, oldest change first
+
+    GET ?cursor=<cursor of the last response> (none: everything)
+        &group=<group unique_id> (optional: only this group, e.g. when a
+        membership got approved and the group has to be fetched completely)
+    Returns {"results": [...], "cursor": "...", "has_more": bool}. Clients
+    keep the cursor and repeat while has_more is true.
+    """
+
+    page_size = 500
+    sync_field = "updated_at"
+    # clock skew allowed between the app and the database servers
+    settle_time = datetime.timedelta(seconds=2)
+
+    def get_group_ids(self):
+        # returns the ids of the groups synced for the user
+        group_ids = Membership.objects.get_approved_group_ids(self.request.user)
+        group = self.request.query_params.get("group")
+        if group:
+            return list(
+                Membership.objects.filter(
+                    group_id__in=group_ids, group__unique_id=parse_uuid(group)
+                ).values_list("group_id", flat=True)[:1]
+            )
+        return group_ids
+
+    def get_oldest_transaction_start(self):
+        # returns the start of the oldest transaction of another session in
+        # flight (None if there is none)
+        with connection.cursor() as cursor:
+            cursor.execute(OLDEST_TRANSACTION_SQL)
+            return cursor.fetchone()[0]
+
+    def get_synced_until(self):
+        """Returns the time the rows are synced up to
+        The sync stamps (updated_at, deleted_at) are written before their
+        transaction commits, possibly long before (e.g. a batch of reviews in
+        one request). A transaction in flight stamps its rows after it started,
+        so the cursor stops before the oldest one and never passes rows that
+        are not visible yet. A long transaction holds the cursor back until it
+        ends; the rows changed meanwhile are synced then. settle_time covers
+        the clock skew between the stamps of the app and of the database.
+        """
+        now = timezone.now()
+        oldest = self.get_oldest_transaction_start()
+        return min(now, oldest or now) - self.settle_time
+
+    def list(self, request, *args, **kwargs):
+        synced_until = self.get_synced_until()
+        queryset = self.get_queryset().filter(
+            **{"%s__lte" % self.sync_field: synced_until}
+        )
+        paginator = KeysetPaginator(queryset, (self.sync_field, "pk"), self.page_size)
+        page = paginator.get_page(request.query_params.get("cursor"))
+        if page.has_next():
+            cursor = paginator.get_cursor(page.object_list[-1])
+        else:
+            # Up to date: the cursor records the sync time (pk 0: rows changed
+            # at that very time are returned again), so it advances even if
+            # nothing changed
+            cursor = encode_cursor([synced_until, 0])
+        serializer = self.get_serializer(page.object_list, many=True)
+        return Response(
+            {"results": serializer.data, "cursor": cursor, "has_more": page.has_next()}
+        )
+
+
+class MembershipSyncViewSet(SyncViewSet):
+    serializer_class = MembershipSyncSerializer
+
+    def get_queryset(self):
+        return Membership.objects.filter(member=self.request.user).select_related(
+            "group"
+        )
+
+
+class TopicSyncViewSet(SyncViewSet):
+    serializer_class = TopicSyncSerializer
+
+    def get_queryset(self):
+        return Topic.objects.filter(group_id__in=self.get_group_ids()).select_related(
+            "group"
+        )
+
+
+class CardSyncViewSet(SyncViewSet):
+    serializer_class = CardSyncSerializer
+
+    def get_queryset(self):
+        return Card.objects.filter(group_id__in=self.get_group_ids()).select_related(
+            "group", "topic"
+        )
+
+
+class PerformanceSyncViewSet(SyncViewSet):
+    serializer_class = PerformanceSyncSerializer
+
+    def get_queryset(self):
+        return Performance.objects.filter(
+            owner=self.request.user, card__group_id__in=self.get_group_ids()
+        ).select_related("card")
+
+
+class TombstoneSyncViewSet(SyncViewSet):
+    serializer_class = TombstoneSerializer
+    sync_field = "deleted_at"
+    # Older tombstones are pruned (flashcards.tasks.prune_tombstones)
+    retention = TOMBSTONE_RETENTION
+
+    def get_queryset(self):
+        return Tombstone.objects.visible_to(self.request.user, self.get_group_ids())
+
+    def list(self, request, *args, **kwargs):
+        values = decode_cursor(request.query_params.get("cursor", ""))
+        deleted_at = parse_datetime(values[0]) if values else None
+        if deleted_at and deleted_at < timezone.now() - self.retention:
+            # Deletions may be missing: the client has to sync from scratch
+            return Response(
+                {"detail": "Cursor expired, a full sync is required."},
+                status=status.HTTP_410_GONE,
+            )
+        return super().list(request, *args, **kwargs)
+
+
+class ReviewViewSet(GenericViewSet):
+    """
+    Batch upload of review events (e.g. of an offline session)
+
+    POST [{"client_id", "performance", "mode", "outcome_int", "duration_sec",
+    "reviewed_at"}, ...]
+    Returns {"results": [{"client_id", "status"(, "errors")}, ...]} in the order
+    of the events; status is applied, duplicate (already uploaded), not_found
+    or invalid. Uploads are idempotent, so failed ones can simply be retried.
+    """
+
+    serializer_class = ReviewSerializer
+    max_batch_size = 1000
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return Response(
+                {"detail": "Expected a list of reviews."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(request.data) > self.max_batch_size:
+            return Response(
+                {"detail": "At most %d reviews per request." % self.max_batch_size},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        items = []
+        reviews = []
+        for data in request.data:
+            serializer = self.get_serializer(data=data)
+            if serializer.is_valid():
+                reviews.append(serializer.validated_data)
+                items.append({"client_id": str(serializer.validated_data["client_id"])})
+            else:
+                client_id = data.get("client_id") if isinstance(data, dict) else None
+                items.append(
+                    {
+                        "client_id": client_id,
+                        "status": "invalid",
+                        "errors": serializer.errors,
+                    }
+                )
+        statuses = iter(Performance.objects.apply_reviews(request.user, reviews))
+        for item in items:
+            if "status" not in item:
+                item["status"] = next(statuses)
+        return Response({"results": items})
+
+
+class ReadViewSet(ReadOnlyModelViewSet):
+    """
+    Read api of the user's groups, topics, cards and performances
+
+    GET ?fields=<comma separated field names> (optional: sparse fieldset)
+        &cursor=<cursor of the next link>
+    Only the relations of the requested fields are joined (see
+    ReadSerializer.get_relations). Lists return {"next": url, "results": [...]}.
+    Subclasses set the queryset and the group_lookup of its rows.
+    """
+
+    lookup_field = "unique_id"
+    pagination_class = KeysetCursorPagination
+    ordering = ("-created_at", "pk")
+    # lookup of the group id of a row (rows of the user's groups are read)
+    group_lookup = "group_id"
+
+    def get_requested_fields(self):
+        # returns the valid field names of ?fields= (None: all fields)
+        fields = self.request.query_params.get("fields")
+        if not fields:
+            return None
+        available = self.get_serializer_class().Meta.fields
+        return [name for name in fields.split(",") if name in available] or None
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"] = self.get_requested_fields()
+        return context
+
+    def get_queryset(self):
+        serializer_class = self.get_serializer_class()
+        select_related, prefetch_related = serializer_class.get_relations(
+            self.get_requested_fields()
+        )
+        return (
+            super()
+            .get_queryset()
+            .filter(**{"%s__in" % self.group_lookup: self.get_group_ids()})
+            .select_related(*select_related)
+            .prefetch_related(*prefetch_related)
+        )
+
+    def get_group_ids(self):
+        # returns the ids of the user's groups (?group=: only this group)
+        group_ids = Membership.objects.get_approved_group_ids(self.request.user)
+        group = self.request.query_params.get("group")
+        if group:
+            return StudyGroup.objects.filter(
+                pk__in=group_ids, unique_id=parse_uuid(group)
+            ).values_list("pk", flat=True)
+        return group_ids
+
+
+class StudyGroupViewSet(ReadViewSet):
+    queryset = StudyGroup.objects.all()
+    serializer_class = StudyGroupSerializer
+    group_lookup = "pk"
+
+
+class TopicViewSet(ReadViewSet):
+    queryset = Topic.objects.all()
+    serializer_class = TopicSerializer
+
+
+class CardViewSet(ReadViewSet):
+    queryset = Card.objects.all()
+    serializer_class = CardSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        topic = self.request.query_params.get("topic")
+        if topic:
+            queryset = queryset.filter(topic__unique_id=parse_uuid(topic))
+        return queryset
+
+
+class PerformanceViewSet(ReadViewSet):
+    queryset = Performance.objects.all()
+    serializer_class = PerformanceSerializer
+    group_lookup = "card__group_id"
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
@@ -0,0 +1,11 @@
+from flashcards.models import Performance
+
+
+def due_cards(request):
+    """Due card count of the user (navbar badge), read from the cache when
+    a template uses it."""
+    if not request.user.is_authenticated:
+        return {}
+    return {
+        "due_card_count": lambda: Performance.objects.get_due_count(request.user.pk)
+    }
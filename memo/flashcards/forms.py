@@ -64,6 +64,7 @@ class CardSearchForm(forms.Form):
             ("no_sort", _("No Sort")),
             ("asc", _("Ascending")),
             ("dsc", _("Descending")),
+            ("title", _("Title")),
         )
     )
 
@@ -85,9 +86,9 @@ class CardSearchForm(forms.Form):
             InlineField(
                 "priority", css_class="custom-select", title=_("Filter by priority")
             ),
-            HTML("<small>Sort Score:</small>"),
+            HTML("<small>Sort:</small>"),
             InlineField(
-                "score_sort", css_class="custom-select", title=_("Sort by score")
+                "score_sort", css_class="custom-select", title=_("Sort cards")
             ),
             Submit("submit_filter", _("Filter"), css_class="btn-primary"),
             Submit("submit_reset", _("Clear"), css_class="btn-secondary"),
@@ -0,0 +1,96 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from flashcards.analytics import ReviewHistory
+from flashcards.memory import fit_user
+from flashcards.models import MemoryParameters, Performance, make_aware_due_at
+
+
+class Command(BaseCommand):
+    """
+    Fits the memory model weights of the users (flashcards.memory)
+    Histories are loaded in chunks of users and fitted in a process pool. The
+    weights and due dates are written per chunk, so an interrupted run resumes
+    with the users not fitted since their last review.
+    """
+
+    help = "Fits the memory model weights of the users on their review history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of users loaded and fitted at once",
+        )
+        parser.add_argument(
+            "--refit",
+            action="store_true",
+            help="Fit all users (default: users with reviews since their fit)",
+        )
+
+    def handle(self, *args, **options):
+        owner_ids = list(
+            MemoryParameters.objects.get_owner_ids_to_fit(refit=options["refit"])
+        )
+        self.stdout.write("Fitting %d users" % len(owner_ids))
+        chunk_size = options["chunk_size"]
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            for start in range(0, len(owner_ids), chunk_size):
+                end = start + chunk_size
+                self.fit_chunk(executor, owner_ids[start:end])
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Fitted %d users in %.1fs"
+                % (len(owner_ids), time.perf_counter() - started)
+            )
+        )
+
+    def fit_chunk(self, executor, owner_ids):
+        # Loads the histories of owner_ids (one query), fits and stores them
+        fitted_at = timezone.now()
+        histories = ReviewHistory.load(
+            Performance.objects.filter(owner_id__in=owner_ids)
+        ).split_by_owner()
+        empty = ReviewHistory.from_rows([])
+        results = executor.map(
+            fit_user,
+            owner_ids,
+            [histories.get(owner_id, empty) for owner_id in owner_ids],
+        )
+        for result in results:
+            self.save_result(result, fitted_at)
+            self.stdout.write(
+                "user %(owner_id)d: %(reviews)d reviews, %(seconds).2fs, "
+                "weights %(weights)s" % result
+            )
+
+    def save_result(self, result, fitted_at):
+        MemoryParameters.objects.save_fit(
+            result["owner_id"],
+            result["weights"],
+            result["loss"],
+            result["reviews"],
+            fitted_at,
+        )
+        performance_ids, due = result["due"]
+        # performances answered since the histories were loaded keep the due
+        # date of their save() (and are fitted again on the next run)
+        Performance.objects.filter(updated_at__lte=fitted_at).bulk_update(
+            [
+                Performance(pk=pk, due_at=make_aware_due_at(due_at))
+                for pk, due_at in zip(performance_ids.tolist(), due.tolist())
+            ],
+            ["due_at"],
+            batch_size=1000,
+        )
@@ -0,0 +1,147 @@
+#
+# Memory model (FSRS style power forgetting curve)
+# R = (1 + FACTOR * t / S) ** DECAY is the probability to recall a card t days
+# after its last review, S is the stability of the card in days (R = 0.9 at
+# t = S). S starts at w0 and is multiplied by w1 for every successful and by w2
+# for every failed recall of the card:
+#     log S = log w0 + successes * log w1 + failures * log w2
+# The weights are fitted per user on the user's recall history
+# (fit_memory_parameters command) and give the personalized due dates.
+import time
+
+import numpy as np
+
+DECAY = -0.5
+FACTOR = 19 / 81
+DEFAULT_WEIGHTS = (1.0, 2.5, 0.5)
+# retention at which a card is due
+TARGET_RETENTION = 0.9
+# normalized recall outcome (3 of 5) from which a recall counts as successful
+SUCCESS_OUTCOME = 0.6
+# recalls needed to fit the weights of a user (defaults below)
+MIN_REVIEWS = 30
+MAX_INTERVAL_DAYS = 365
+# candidate weights (w0, w1, w2) of the grid search
+GRID = (
+    np.geomspace(0.1, 30, 24),
+    np.geomspace(1.05, 6, 24),
+    np.geomspace(0.05, 1, 16),
+)
+# grid points x reviews evaluated at once (bounds the memory of a fit)
+GRID_BATCH_ELEMENTS = 4 * 1024 * 1024
+
+
+def retrievability(days, stability):
+    return (1 + FACTOR * days / stability) ** DECAY
+
+
+def stability(weights, successes, failures):
+    w0, w1, w2 = weights
+    return w0 * np.power(w1, successes) * np.power(w2, failures)
+
+
+def interval_days(stability, retention=TARGET_RETENTION):
+    # days until the retrievability drops to retention
+    days = stability / FACTOR * (retention ** (1 / DECAY) - 1)
+    return np.clip(days, 0, MAX_INTERVAL_DAYS)
+
+
+def grouped_count_before(values, group_start):
+    # number of True values before each row within its group (rows are sorted)
+    counts = np.cumsum(values) - values
+    starts = np.flatnonzero(group_start)
+    offsets = np.repeat(counts[starts], np.diff(np.append(starts, len(values))))
+    return counts - offsets
+
+
+def recall_counts(history):
+    # (successes, failures) of the recalls before each data point of its card
+    success = history.recall & (history.outcome >= SUCCESS_OUTCOME)
+    failure = history.recall & ~success
+    group_start = np.append(True, history.performance[1:] != history.performance[:-1])
+    group_start = group_start[: len(history)]
+    return (
+        grouped_count_before(success, group_start),
+        grouped_count_before(failure, group_start),
+    )
+
+
+def review_features(history):
+    """Returns (days, successes, failures, recalled) of the recalls that follow
+    an earlier review of the same card: days since that review, recalls of the
+    card before and whether the card was recalled
+    """
+    successes, failures = recall_counts(history)
+    follows = np.append(False, history.performance[1:] == history.performance[:-1])
+    follows = follows[: len(history)]
+    mask = follows & history.recall
+    days = np.zeros(len(history))
+    days[1:] = (history.reviewed_at[1:] - history.reviewed_at[:-1]) / np.timedelta64(
+        1, "D"
+    )
+    return (
+        days[mask],
+        successes[mask],
+        failures[mask],
+        history.outcome[mask] >= SUCCESS_OUTCOME,
+    )
+
+
+def log_loss(predicted, recalled):
+    predicted = np.clip(predicted, 1e-6, 1 - 1e-6)
+    return -np.mean(
+        np.where(recalled, np.log(predicted), np.log(1 - predicted)), axis=-1
+    )
+
+
+def fit_weights(days, successes, failures, recalled):
+    # returns the (weights, loss) of the grid point with the smallest log loss
+    w0, w1, w2 = (grid.ravel() for grid in np.meshgrid(*GRID, indexing="ij"))
+    log_s = np.log(w0)[:, None], np.log(w1)[:, None], np.log(w2)[:, None]
+    batch = max(1, GRID_BATCH_ELEMENTS // max(len(days), 1))
+    losses = np.empty(len(w0))
+    for start in range(0, len(w0), batch):
+        end = start + batch
+        s = np.exp(
+            log_s[0][start:end]
+            + successes * log_s[1][start:end]
+            + failures * log_s[2][start:end]
+        )
+        losses[start:end] = log_loss(retrievability(days, s), recalled)
+    best = int(np.argmin(losses))
+    return (float(w0[best]), float(w1[best]), float(w2[best])), float(losses[best])
+
+
+def due_dates(history, weights):
+    # returns (performance ids, due datetime64) after the last review of each card
+    if not len(history):
+        return np.array([], dtype=np.int64), np.array([], dtype="datetime64[s]")
+    successes, failures = recall_counts(history)
+    success = history.recall & (history.outcome >= SUCCESS_OUTCOME)
+    failure = history.recall & ~success
+    last = np.append(history.performance[1:] != history.performance[:-1], True)
+    s = stability(
+        weights, successes[last] + success[last], failures[last] + failure[last]
+    )
+    seconds = np.round(interval_days(s) * 86400).astype("timedelta64[s]")
+    return history.performance[last], history.reviewed_at[last] + seconds
+
+
+def fit_user(owner_id, history):
+    """Fits the weights of a user (process pool worker, no database access)
+    Returns a dict of owner_id, weights, loss, reviews, due (performance ids
+    and due dates) and seconds
+    """
+    started = time.perf_counter()
+    days, successes, failures, recalled = review_features(history)
+    weights, loss = DEFAULT_WEIGHTS, None
+    if len(days) >= MIN_REVIEWS:
+        weights, loss = fit_weights(days, successes, failures, recalled)
+    return {
+        "owner_id": owner_id,
+        "weights": weights,
+        "loss": loss,
+        "reviews": len(days),
+        "due": due_dates(history, weights),
+        "seconds": time.perf_counter() - started,
+    }
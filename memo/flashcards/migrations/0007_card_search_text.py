@@ -0,0 +1,38 @@
+# Generated by Django 3.0.11 on 2026-10-19 09:12
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+from utils.search import normalize_search_text
+
+
+def fill_search_text(apps, schema_editor):
+    Card = apps.get_model('flashcards', 'Card')
+    cards = list(Card.objects.only('id', 'front_text', 'back_text'))
+    for card in cards:
+        card.search_text = normalize_search_text(card.front_text, card.back_text)
+    Card.objects.bulk_update(cards, ['search_text'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studygroups', '0011_studygroup_name_trgm_idx'),
+        ('flashcards', '0006_card_good_one'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Search Text'),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='card',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='card_search_text_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='topic_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
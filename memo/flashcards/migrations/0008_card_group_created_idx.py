@@ -0,0 +1,17 @@
+# Generated by Django 3.0.11 on 2026-10-19 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0007_card_search_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['group', '-created_at', '-id'], name='card_group_created_idx'),
+        ),
+    ]
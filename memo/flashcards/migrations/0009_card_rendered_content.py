@@ -0,0 +1,56 @@
+# Generated by Django 3.0.11 on 2026-10-19 14:05
+
+from django.db import migrations, models
+from utils.richtext import plain_text, preview, sanitize_html
+
+
+def fill_rendered_content(apps, schema_editor):
+    Card = apps.get_model('flashcards', 'Card')
+    cards = list(Card.objects.only('id', 'front_text', 'back_text'))
+    for card in cards:
+        card.front_html = sanitize_html(card.front_text)
+        card.back_html = sanitize_html(card.back_text)
+        card.front_plain = plain_text(card.front_html)
+        card.back_plain = plain_text(card.back_html)
+        card.preview = preview(card.front_plain)
+    Card.objects.bulk_update(
+        cards,
+        ['front_html', 'back_html', 'front_plain', 'back_plain', 'preview'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0008_card_group_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='front_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Frontside HTML'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='back_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Backside HTML'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='front_plain',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Frontside Plain Text'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='back_plain',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Backside Plain Text'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='preview',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Preview'),
+        ),
+        migrations.RunPython(fill_rendered_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.0.11 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0009_card_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('card', 'Card'), ('topic', 'Topic'), ('membership', 'Membership'), ('performance', 'Performance')], max_length=20, verbose_name='Kind')),
+                ('unique_id', models.UUIDField(verbose_name='Unique ID of the deleted object')),
+                ('group_id', models.IntegerField(blank=True, null=True, verbose_name='Group ID')),
+                ('user_id', models.IntegerField(blank=True, null=True, verbose_name='User ID')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Deleted at')),
+            ],
+            options={
+                'verbose_name': 'Tombstone',
+                'verbose_name_plural': 'Tombstones',
+                'ordering': ('deleted_at', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['group', 'updated_at', 'id'], name='card_group_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='performance',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='performance_owner_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['group', 'updated_at', 'id'], name='topic_group_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['group_id', 'deleted_at', 'id'], name='tombstone_group_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user_id', 'deleted_at', 'id'], name='tombstone_user_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.0.11 on 2026-10-19 16:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('flashcards', '0010_tombstone_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedReview',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.UUIDField(verbose_name='Client ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('owner', models.ForeignKey(help_text='User of the review', on_delete=django.db.models.deletion.CASCADE, related_name='processed_reviews', to=settings.AUTH_USER_MODEL)),
+                ('performance', models.ForeignKey(help_text='Performance the review was added to', on_delete=django.db.models.deletion.CASCADE, related_name='processed_reviews', to='flashcards.Performance')),
+            ],
+            options={
+                'verbose_name': 'Processed Review',
+                'verbose_name_plural': 'Processed Reviews',
+                'unique_together': {('owner', 'client_id')},
+            },
+        ),
+    ]
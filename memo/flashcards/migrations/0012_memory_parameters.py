@@ -0,0 +1,45 @@
+# Generated by Django 3.0.11 on 2026-10-19 17:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('flashcards', '0011_processed_review'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemoryParameters',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weights', jsonfield.fields.JSONField(default=list, verbose_name='Weights')),
+                ('loss', models.FloatField(blank=True, null=True, verbose_name='Log loss of the fit')),
+                ('reviews', models.PositiveIntegerField(default=0, verbose_name='Reviews of the fit')),
+                ('fitted_at', models.DateTimeField(verbose_name='Fitted at')),
+            ],
+            options={
+                'verbose_name': 'Memory Parameters',
+                'verbose_name_plural': 'Memory Parameters',
+            },
+        ),
+        migrations.AddField(
+            model_name='performance',
+            name='due_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Next review of the card (memory model of the user)', null=True, verbose_name='Due at'),
+        ),
+        migrations.AddIndex(
+            model_name='performance',
+            index=models.Index(fields=['owner', 'due_at'], name='performance_owner_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='memoryparameters',
+            name='owner',
+            field=models.OneToOneField(help_text='User of the memory parameters', on_delete=django.db.models.deletion.CASCADE, related_name='memory_parameters', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
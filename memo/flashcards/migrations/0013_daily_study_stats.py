@@ -0,0 +1,50 @@
+# Generated by Django 3.0.11 on 2026-10-19 17:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studygroups', '0013_member_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('flashcards', '0012_memory_parameters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStudyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('reviews', models.PositiveIntegerField(default=0, verbose_name='Reviews')),
+                ('correct', models.PositiveIntegerField(default=0, verbose_name='Correct reviews')),
+                ('seconds', models.PositiveIntegerField(default=0, verbose_name='Seconds studied')),
+                ('group', models.ForeignKey(help_text='Group of the reviewed cards', on_delete=django.db.models.deletion.CASCADE, related_name='daily_study_stats', to='studygroups.StudyGroup')),
+                ('topic', models.ForeignKey(blank=True, help_text='Topic of the reviewed cards (optional)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_study_stats', to='flashcards.Topic')),
+                ('user', models.ForeignKey(help_text='User of the reviews', on_delete=django.db.models.deletion.CASCADE, related_name='daily_study_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Study Stats',
+                'verbose_name_plural': 'Daily Study Stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailystudystats',
+            index=models.Index(fields=['user', 'date'], name='daily_stats_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailystudystats',
+            index=models.Index(fields=['group', 'date'], name='daily_stats_group_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailystudystats',
+            constraint=models.UniqueConstraint(fields=('user', 'group', 'topic', 'date'), name='daily_stats_unique_topic_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailystudystats',
+            constraint=models.UniqueConstraint(condition=models.Q(topic__isnull=True), fields=('user', 'group', 'date'), name='daily_stats_unique_no_topic_day'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.11 on 2026-10-19 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0013_daily_study_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='performance',
+            index=models.Index(condition=models.Q(is_paused=False), fields=['due_at', 'owner'], name='performance_due_owner_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.0.11 on 2026-10-19 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0014_performance_due_owner_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='performance',
+            index=models.Index(fields=['owner', '-recall_score', '-id'], name='performance_changelist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='performance',
+            index=models.Index(condition=models.Q(is_paused=True), fields=['owner', '-recall_score', '-id'], name='performance_paused_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='performance',
+            index=models.Index(condition=models.Q(_negated=True, priority='normal'), fields=['priority', 'owner', '-recall_score', '-id'], name='performance_priority_list_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Tombstones of deleted rows (delta sync), one INSERT per DELETE statement:
+# statement level triggers reading the deleted rows from the transition table
+# (table, tombstone kind, tombstone column, column of the deleted row)
+TOMBSTONE_TRIGGERS = (
+    ("flashcards_card", "card", "group_id", "group_id"),
+    ("flashcards_topic", "topic", "group_id", "group_id"),
+    ("studygroups_membership", "membership", "user_id", "member_id"),
+    ("flashcards_performance", "performance", "user_id", "owner_id"),
+)
+
+CREATE_TRIGGER = """
+CREATE FUNCTION %(kind)s_tombstones() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO flashcards_tombstone (kind, unique_id, %(column)s, deleted_at)
+    SELECT '%(kind)s', unique_id, %(source)s, clock_timestamp() FROM deleted_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER %(kind)s_tombstones AFTER DELETE ON %(table)s
+REFERENCING OLD TABLE AS deleted_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE %(kind)s_tombstones();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER %(kind)s_tombstones ON %(table)s;
+DROP FUNCTION %(kind)s_tombstones();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0015_performance_changelist_idx'),
+        ('studygroups', '0013_member_progress'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            CREATE_TRIGGER % params,
+            reverse_sql=DROP_TRIGGER % params,
+        )
+        for params in (
+            {"table": table, "kind": kind, "column": column, "source": source}
+            for table, kind, column, source in TOMBSTONE_TRIGGERS
+        )
+    ]
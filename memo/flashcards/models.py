@@ -1,14 +1,25 @@
 import datetime
 import random
+from collections import defaultdict
 
 from ckeditor.fields import RichTextField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.core.cache import cache
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, FilteredRelation, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import ugettext_lazy as _
+from flashcards.analytics import MAX_OUTCOME, ReviewHistory
+from flashcards.memory import DEFAULT_WEIGHTS, SUCCESS_OUTCOME, due_dates
 from jsonfield import JSONField
-from studygroups.models import StudyGroup
+from studygroups.models import MemberProgress, StudyGroup
 from utils.abstract_models import TimestampMixin, UUIDMixin
+from utils.richtext import plain_text, preview, sanitize_html
+from utils.search import TrigramWordSimilarity, closest_term, normalize_search_text
 
 User = get_user_model()
 
@@ -26,8 +37,27 @@ LEARNING_PRIORITIES = (
 INITIAL_PERFORMANCE_DATA = {"learning": [], "recalling": []}
 
 
+def make_aware_due_at(due_at):
+    # returns the aware due date of a naive one in local time (like the data
+    # points); a time skipped or repeated by a DST change is taken as standard
+    # time instead of raising
+    return timezone.make_aware(due_at, is_dst=False)
+
+
 class TopicManager(models.Manager):
-    pass
+    def similar_to(self, query, user, group=None, limit=5):
+        # returns the topics of the user's groups with a title most similar to query
+        query = normalize_search_text(query)
+        qs = self.filter(
+            title__trigram_word_similar=query,
+            group__memberships__member=user,
+            group__memberships__approved=True,
+            group__memberships__blocked=False,
+        )
+        if group:
+            qs = qs.filter(group=group)
+        qs = qs.annotate(similarity=TrigramWordSimilarity("title", query))
+        return qs.select_related("group").order_by("-similarity", "title")[:limit]
 
 
 class Topic(UUIDMixin, TimestampMixin, models.Model):
@@ -36,6 +66,17 @@ class Topic(UUIDMixin, TimestampMixin, models.Model):
         verbose_name_plural = _("Topics")
         unique_together = ["group", "title"]
         ordering = ("group", "title")
+        indexes = [
+            GinIndex(
+                name="topic_title_trgm_idx",
+                fields=["title"],
+                opclasses=["gin_trgm_ops"],
+            ),
+            # Delta sync of the group's topics
+            models.Index(
+                name="topic_group_updated_idx", fields=["group", "updated_at", "id"]
+            ),
+        ]
 
     group = models.ForeignKey(
         StudyGroup,
@@ -61,7 +102,74 @@ class Topic(UUIDMixin, TimestampMixin, models.Model):
 
 
 class CardManager(models.Manager):
-    pass
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(): render the content of the cards here
+        objs = list(objs)
+        for card in objs:
+            card.render_content()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def similar_to(self, query, user, group=None, limit=5):
+        # returns the cards of the user's groups with a text most similar to query
+        query = normalize_search_text(query)
+        qs = self.filter(
+            search_text__trigram_word_similar=query,
+            group__memberships__member=user,
+            group__memberships__approved=True,
+            group__memberships__blocked=False,
+        )
+        if group:
+            qs = qs.filter(group=group)
+        qs = qs.annotate(similarity=TrigramWordSimilarity("search_text", query))
+        qs = qs.select_related("group")
+        return qs.order_by("-similarity", "-created_at")[:limit]
+
+    def suggest_term(self, query, group, limit=3):
+        # returns a "did you mean" search term for the group's cards or None
+        # (not restricted by the similarity threshold, the group bounds the scan)
+        query = normalize_search_text(query)
+        if not query:
+            return None
+        texts = (
+            self.filter(group=group)
+            .annotate(similarity=TrigramWordSimilarity("search_text", query))
+            .filter(similarity__gt=0.3)
+            .order_by("-similarity")
+            .values_list("search_text", flat=True)[:limit]
+        )
+        return closest_term(query, texts)
+
+    def filter_for(self, user, topic=None, search=None, paused=None, priority=None):
+        """Cards joined exactly once with the user's performance
+        The join is aliased "user_performance" (FilteredRelation on the owner),
+        so the paused/priority filters and the "user_recall_score" sort all use
+        the same join and cards are not duplicated across group members.
+        """
+        qs = self.annotate(
+            user_performance=FilteredRelation(
+                "performances", condition=Q(performances__owner=user)
+            )
+        )
+        # All filters go into one filter() call before the score annotation:
+        # every further filter() on the (multi-valued) alias would add another
+        # join, while annotations reuse the existing one
+        filters = {}
+        if topic:
+            filters["topic__unique_id"] = topic
+        if search:
+            # ILIKE on the normalized text is supported by the trigram index
+            filters["search_text__icontains"] = normalize_search_text(search)
+        if paused not in (None, "", "all"):
+            filters["user_performance__is_paused"] = paused
+        if priority not in (None, "", "all"):
+            filters["user_performance__priority"] = priority
+        return qs.filter(**filters).annotate(
+            user_recall_score=Coalesce(
+                "user_performance__recall_score",
+                Value(0),
+                output_field=models.DecimalField(max_digits=4, decimal_places=1),
+            )
+        )
 
 
 class Card(UUIDMixin, TimestampMixin, models.Model):
@@ -74,6 +182,21 @@ class Card(UUIDMixin, TimestampMixin, models.Model):
         verbose_name_plural = _("Cards")
         unique_together = ["group", "front_text"]
         ordering = ("group", "-topic", "front_text")
+        indexes = [
+            # Keyset pagination of the group's cards by creation (newest first)
+            models.Index(
+                name="card_group_created_idx", fields=["group", "-created_at", "-id"]
+            ),
+            GinIndex(
+                name="card_search_text_trgm_idx",
+                fields=["search_text"],
+                opclasses=["gin_trgm_ops"],
+            ),
+            # Delta sync of the group's cards
+            models.Index(
+                name="card_group_updated_idx", fields=["group", "updated_at", "id"]
+            ),
+        ]
 
     group = models.ForeignKey(
         StudyGroup,
@@ -114,21 +237,158 @@ class Card(UUIDMixin, TimestampMixin, models.Model):
     # TODO: automatic Google text-to-speech sync for front/back text
     # TODO: audio-pair, image-pair
 
+    # Normalized plain text of front and back (fuzzy search), set on save
+    search_text = models.TextField(
+        _("Search Text"), editable=False, blank=True, default=""
+    )
+    # Rendered content (sanitized html, plain text & preview), set on save
+    front_html = models.TextField(
+        _("Frontside HTML"), editable=False, blank=True, default=""
+    )
+    back_html = models.TextField(
+        _("Backside HTML"), editable=False, blank=True, default=""
+    )
+    front_plain = models.TextField(
+        _("Frontside Plain Text"), editable=False, blank=True, default=""
+    )
+    back_plain = models.TextField(
+        _("Backside Plain Text"), editable=False, blank=True, default=""
+    )
+    preview = models.CharField(
+        _("Preview"), max_length=255, editable=False, blank=True, default=""
+    )
+
     objects = CardManager()
 
+    RENDERED_FIELDS = (
+        "search_text",
+        "front_html",
+        "back_html",
+        "front_plain",
+        "back_plain",
+        "preview",
+    )
+
     def __str__(self):
-        return "%s: %s" % (self._meta.verbose_name, self.front_text)
+        return "%s: %s" % (self._meta.verbose_name, self.preview or self.front_text)
 
     def get_absolute_url(self):
         # Returns path to update-view
         # return reverse("memocard_update_view", kwargs={"unique_id": self.unique_id})
         pass
 
+    def render_content(self):
+        # sets the rendered content fields from front_text and back_text
+        self.front_html = sanitize_html(self.front_text)
+        self.back_html = sanitize_html(self.back_text)
+        self.front_plain = plain_text(self.front_html)
+        self.back_plain = plain_text(self.back_html)
+        self.preview = preview(self.front_plain)
+        self.search_text = normalize_search_text(self.front_text, self.back_text)
+
     def save(self, *args, **kwargs):
+        self.render_content()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"front_text", "back_text"} & set(
+            update_fields
+        ):
+            kwargs["update_fields"] = set(update_fields) | set(self.RENDERED_FIELDS)
         return super(Card, self).save(*args, **kwargs)
 
 
+# Due cards per user (navbar badge and digests), kept in the cache: refreshed
+# for all users by flashcards.tasks.refresh_due_counts and adjusted on answers
+DUE_COUNT_CACHE_KEY = "due_count:%s"
+DUE_COUNT_TIMEOUT = 60 * 60
+
+
 class PerformanceManager(models.Manager):
+    def due(self, now=None):
+        # returns the due performances (due date passed and not paused)
+        return self.filter(due_at__lte=now or timezone.now(), is_paused=False)
+
+    def get_due_counts(self, min_count=1, now=None):
+        # returns {owner id: due cards} of the owners with at least min_count
+        # due cards (one grouped query)
+        return dict(
+            self.due(now)
+            .order_by()
+            .values("owner")
+            .annotate(count=Count("pk"))
+            .filter(count__gte=min_count)
+            .values_list("owner", "count")
+        )
+
+    def refresh_due_counts(self, chunk_size=10000):
+        # caches the due count of every user (0 if none); returns the number of
+        # users with due cards
+        counts = self.get_due_counts()
+        user_ids = (
+            User.objects.order_by().values_list("pk", flat=True).iterator(chunk_size)
+        )
+        chunk = {}
+        for user_id in user_ids:
+            chunk[DUE_COUNT_CACHE_KEY % user_id] = counts.get(user_id, 0)
+            if len(chunk) >= chunk_size:
+                cache.set_many(chunk, DUE_COUNT_TIMEOUT)
+                chunk = {}
+        cache.set_many(chunk, DUE_COUNT_TIMEOUT)
+        return len(counts)
+
+    def get_due_count(self, owner_id):
+        # returns the (cached) number of due cards of owner
+        key = DUE_COUNT_CACHE_KEY % owner_id
+        count = cache.get(key)
+        if count is None:
+            count = self.due().filter(owner_id=owner_id).count()
+            cache.set(key, count, DUE_COUNT_TIMEOUT)
+        return max(count, 0)
+
+    def adjust_due_count(self, owner_id, delta):
+        # adds delta to the cached due count of owner (if cached)
+        try:
+            cache.incr(DUE_COUNT_CACHE_KEY % owner_id, delta)
+        except ValueError:  # not cached: counted on the next read
+            pass
+
+    def reset_data(self, queryset):
+        """Resets the data, scores and due dates of the performances of queryset
+        in one UPDATE; save() and its signals are bypassed, so the progress of
+        the owners is rebuilt and their due counts adjusted here
+        Returns the number of reset performances
+        """
+        queryset = queryset.order_by()
+        pairs = set(queryset.values_list("owner_id", "card__group_id").distinct())
+        due_counts = list(
+            self.due()
+            .filter(pk__in=queryset.values("pk"))
+            .order_by()
+            .values("owner")
+            .annotate(count=Count("pk"))
+            .values_list("owner", "count")
+        )
+        with transaction.atomic():
+            count = queryset.update(
+                data=INITIAL_PERFORMANCE_DATA,
+                recall_score=0,
+                recall_trials=0,
+                recall_total_time=0,
+                learn_score=0,
+                learn_trials=0,
+                learn_total_time=0,
+                due_at=None,
+                updated_at=timezone.now(),
+            )
+            MemberProgress.objects.rebuild(
+                MemberProgress.objects.filter(
+                    member__in={owner_id for owner_id, group_id in pairs},
+                    group__in={group_id for owner_id, group_id in pairs},
+                )
+            )
+        for owner_id, due in due_counts:
+            self.adjust_due_count(owner_id, -due)
+        return count
+
     def get_random_object_for(self, user):
         # returns a random card performance object
         return self.filter(owner=user, is_paused=False).order_by("?").first()
@@ -150,7 +410,8 @@ class PerformanceManager(models.Manager):
             qs = qs.filter(card__group=group)
         if topic:
             qs = qs.filter(card__topic=topic)
-        qs = qs.order_by("priority", "recall_score")  # ASC , "-priority",
+        # Due cards first (personalized intervals, see flashcards.memory)
+        qs = qs.order_by("priority", F("due_at").asc(nulls_first=True), "recall_score")
         return qs
 
     def get_performance_object_for(self, owner, mode, topic=None, group=None, limit=7):
@@ -168,6 +429,109 @@ class PerformanceManager(models.Manager):
             return random.choice(qs[0:limit])
         return qs
 
+    def apply_reviews(self, owner, reviews):
+        """Applies review events of owner (e.g. an offline session) at once.
+        reviews: validated dicts of client_id, performance (unique_id), mode,
+        outcome_int, duration_sec and reviewed_at
+        Returns the status of each review ("applied", "duplicate" or
+        "not_found"); replayed client ids are skipped, so uploads can be
+        retried safely.
+        """
+        results = []
+        with transaction.atomic():
+            # Lock the performances: concurrent uploads are applied one by one
+            performances = {
+                performance.unique_id: performance
+                for performance in self.select_for_update().filter(
+                    owner=owner,
+                    unique_id__in={review["performance"] for review in reviews},
+                )
+            }
+            processed = set(
+                ProcessedReview.objects.filter(
+                    owner=owner,
+                    client_id__in=[review["client_id"] for review in reviews],
+                ).values_list("client_id", flat=True)
+            )
+            grouped = defaultdict(list)
+            for review in reviews:
+                client_id = review["client_id"]
+                if client_id in processed:
+                    results.append("duplicate")
+                elif review["performance"] not in performances:
+                    results.append("not_found")
+                else:
+                    processed.add(client_id)
+                    grouped[review["performance"]].append(review)
+                    results.append("applied")
+            # One update (and score calculation) per performance
+            for unique_id, performance_reviews in grouped.items():
+                performance = performances[unique_id]
+                performance_reviews.sort(key=lambda review: review["reviewed_at"])
+                for review in performance_reviews:
+                    # data points are stored in local time like the live ones
+                    performance.add_datapoint(
+                        review["mode"],
+                        review["outcome_int"],
+                        review["duration_sec"],
+                        timezone.make_naive(review["reviewed_at"]),
+                    )
+                performance.save()
+            ProcessedReview.objects.bulk_create(
+                [
+                    ProcessedReview(
+                        owner=owner,
+                        client_id=review["client_id"],
+                        performance=performances[unique_id],
+                    )
+                    for unique_id, performance_reviews in grouped.items()
+                    for review in performance_reviews
+                ]
+            )
+        return results
+
+    def iter_review_history(self, owner, since=None, until=None, chunk_size=500):
+        """Returns an iterator of the data points of owner's performances as
+        dicts of performance, card, mode, outcome_int, duration_sec and
+        reviewed_at.
+        Rows are read through a server side cursor in chunks, so memory does not
+        grow with the history. since/until: naive local datetimes (until is
+        exclusive), checked here before the first row is read
+        """
+        queryset = self.filter(owner=owner)
+        if since:
+            # A performance is saved whenever a data point is added (a time
+            # skipped or repeated by a DST change: the earlier bound)
+            queryset = queryset.filter(
+                updated_at__gte=timezone.make_aware(since, is_dst=True)
+            )
+        rows = (
+            queryset.order_by("pk")
+            .values_list("unique_id", "card__unique_id", "data")
+            .iterator(chunk_size=chunk_size)
+        )
+
+        def points():
+            for unique_id, card_id, data in rows:
+                for mode, key in (("train", "learning"), ("recall", "recalling")):
+                    for timestamp, outcome_int, duration_sec in data.get(key, []):
+                        if isinstance(timestamp, str):
+                            timestamp = parse_datetime(timestamp)
+                        if (since and timestamp < since) or (
+                            until and timestamp >= until
+                        ):
+                            continue
+                        yield {
+                            "performance": unique_id,
+                            "card": card_id,
+                            "mode": mode,
+                            "outcome_int": outcome_int,
+                            "duration_sec": duration_sec,
+                            "reviewed_at": timestamp,
+                        }
+
+        return points()
+
 
 class Performance(UUIDMixin, TimestampMixin, models.Model):
     """
@@ -182,6 +546,37 @@ class Performance(UUIDMixin, TimestampMixin, models.Model):
             "owner",
             "-recall_score",
         )
+        indexes = [
+            # Delta sync of the user's performances
+            models.Index(
+                name="performance_owner_updated_idx",
+                fields=["owner", "updated_at", "id"],
+            ),
+            # Due cards of the user
+            models.Index(name="performance_owner_due_idx", fields=["owner", "due_at"]),
+            # Due counts of all users (grouped by owner)
+            models.Index(
+                name="performance_due_owner_idx",
+                fields=["due_at", "owner"],
+                condition=Q(is_paused=False),
+            ),
+            # Admin changelist (default ordering, owner/pk ties) and its
+            # filters on the rare paused and non-normal priority performances
+            models.Index(
+                name="performance_changelist_idx",
+                fields=["owner", "-recall_score", "-id"],
+            ),
+            models.Index(
+                name="performance_paused_list_idx",
+                fields=["owner", "-recall_score", "-id"],
+                condition=Q(is_paused=True),
+            ),
+            models.Index(
+                name="performance_priority_list_idx",
+                fields=["priority", "owner", "-recall_score", "-id"],
+                condition=~Q(priority="normal"),
+            ),
+        ]
 
     owner = models.ForeignKey(
         User,
@@ -258,6 +653,13 @@ class Performance(UUIDMixin, TimestampMixin, models.Model):
         default=0.0,
         validators=[MinValueValidator(0.0), MaxValueValidator(100.0)],
     )
+    due_at = models.DateTimeField(
+        _("Due at"),
+        help_text=_("Next review of the card (memory model of the user)"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     objects = PerformanceManager()
 
@@ -328,17 +730,449 @@ class Performance(UUIDMixin, TimestampMixin, models.Model):
         if recall_trials > 0:
             self.recall_score = float(recall_total_outcome / recall_trials) * 100
 
-    def add_training_datapoint(self, outcome_int, duration_sec):
+    def add_training_datapoint(self, outcome_int, duration_sec, timestamp=None):
         # Adds a learning data point; .save() must be called separately
-        timestamp = datetime.datetime.now()
+        timestamp = timestamp or timezone.make_naive(timezone.now())
         self.data["learning"].append((timestamp, outcome_int, duration_sec))
+        self.track_datapoint("learning", timestamp, outcome_int, duration_sec)
 
-    def add_recalling_datapoint(self, outcome_int, duration_sec):
+    def add_recalling_datapoint(self, outcome_int, duration_sec, timestamp=None):
         # Adds a learning data point; .save() must be called separately
-        timestamp = datetime.datetime.now()
+        timestamp = timestamp or timezone.make_naive(timezone.now())
         self.data["recalling"].append((timestamp, outcome_int, duration_sec))
+        self.track_datapoint("recalling", timestamp, outcome_int, duration_sec)
+
+    def track_datapoint(self, mode, timestamp, outcome_int, duration_sec):
+        # Remembers the data points added since the last save (DailyStudyStats)
+        if not hasattr(self, "new_datapoints"):
+            self.new_datapoints = []
+        self.new_datapoints.append((mode, timestamp, outcome_int, duration_sec))
+
+    def pop_new_datapoints(self):
+        # returns and forgets the data points added since the last save
+        datapoints = getattr(self, "new_datapoints", [])
+        self.new_datapoints = []
+        return datapoints
+
+    def add_datapoint(self, mode, outcome_int, duration_sec, timestamp=None):
+        # Adds a data point of mode (train|recall); .save() must be called separately
+        if mode == "train":
+            self.add_training_datapoint(outcome_int, duration_sec, timestamp)
+        elif mode == "recall":
+            self.add_recalling_datapoint(outcome_int, duration_sec, timestamp)
+
+    def recalculate_due_at(self, weights=None):
+        # Sets the due date by the memory model of the owner (flashcards.memory)
+        weights = weights or MemoryParameters.objects.get_weights(self.owner_id)
+        history = ReviewHistory.from_rows(
+            [(self.pk or 0, self.owner_id, None, self.data)]
+        )
+        performance_ids, due = due_dates(history, weights)
+        self.due_at = None
+        if len(due):
+            self.due_at = make_aware_due_at(due[0].astype(datetime.datetime))
 
     def save(self, *args, **kwargs):
-        # Calculates all scores on save
+        # Calculates all scores and the due date on save
         self.recalculate_scores()
+        self.recalculate_due_at()
         return super(Performance, self).save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembers the loaded scores for the incremental member progress
+        loaded = dict(zip(field_names, values))
+        if {"recall_score", "recall_trials", "learn_trials"} <= set(loaded):
+            instance.loaded_progress_state = (
+                loaded["recall_score"],
+                loaded["recall_trials"] + loaded["learn_trials"],
+            )
+        # and whether it was due for the cached due counts
+        if {"due_at", "is_paused"} <= set(loaded):
+            instance.loaded_is_due = instance.is_due()
+        return instance
+
+    def is_due(self, now=None):
+        # True if the due date has passed (see PerformanceManager.due)
+        now = now or timezone.now()
+        return self.due_at is not None and self.due_at <= now and not self.is_paused
+
+    def get_progress_state(self):
+        # returns (recall_score, trials) as tracked by studygroups.MemberProgress
+        return (self.recall_score, self.recall_trials + self.learn_trials)
+
+
+class ProcessedReview(models.Model):
+    """
+    A review event uploaded by a client (client_id deduplicates replays)
+    """
+
+    class Meta:
+        verbose_name = _("Processed Review")
+        verbose_name_plural = _("Processed Reviews")
+        unique_together = ["owner", "client_id"]
+
+    owner = models.ForeignKey(
+        User,
+        help_text=_("User of the review"),
+        related_name="processed_reviews",
+        on_delete=models.CASCADE,
+    )
+    client_id = models.UUIDField(_("Client ID"))
+    performance = models.ForeignKey(
+        Performance,
+        help_text=_("Performance the review was added to"),
+        related_name="processed_reviews",
+        on_delete=models.CASCADE,
+    )
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+
+    def __str__(self):
+        return "%s" % (self.client_id)
+
+
+# Fitted weights of a user (flashcards.memory), cached for Performance.save()
+MEMORY_WEIGHTS_CACHE_KEY = "flashcards:memory_weights:%s"
+MEMORY_WEIGHTS_TIMEOUT = 60 * 60 * 24
+
+
+class MemoryParametersManager(models.Manager):
+    def get_weights(self, owner_id):
+        # returns the fitted (or default) weights of the user (cached)
+        key = MEMORY_WEIGHTS_CACHE_KEY % owner_id
+        weights = cache.get(key)
+        if weights is None:
+            weights = tuple(
+                self.filter(owner_id=owner_id).values_list("weights", flat=True).first()
+                or DEFAULT_WEIGHTS
+            )
+            cache.set(key, weights, MEMORY_WEIGHTS_TIMEOUT)
+        return weights
+
+    def save_fit(self, owner_id, weights, loss, reviews, fitted_at):
+        # stores the weights fitted on the history until fitted_at
+        self.update_or_create(
+            owner_id=owner_id,
+            defaults={
+                "weights": list(weights),
+                "loss": loss,
+                "reviews": reviews,
+                "fitted_at": fitted_at,
+            },
+        )
+        cache.set(
+            MEMORY_WEIGHTS_CACHE_KEY % owner_id, tuple(weights), MEMORY_WEIGHTS_TIMEOUT
+        )
+
+    def get_owner_ids_to_fit(self, refit=False):
+        # returns the ids of the users with reviews since their last fit (or all)
+        owners = User.objects.annotate(
+            last_change=Max("performances__updated_at")
+        ).filter(last_change__isnull=False)
+        if not refit:
+            owners = owners.filter(
+                Q(memory_parameters__isnull=True)
+                | Q(memory_parameters__fitted_at__lt=F("last_change"))
+            )
+        return owners.order_by("pk").values_list("pk", flat=True)
+
+
+class MemoryParameters(models.Model):
+    """
+    Weights of the memory model of a user (fitted on the review history)
+    """
+
+    class Meta:
+        verbose_name = _("Memory Parameters")
+        verbose_name_plural = _("Memory Parameters")
+
+    owner = models.OneToOneField(
+        User,
+        help_text=_("User of the memory parameters"),
+        related_name="memory_parameters",
+        on_delete=models.CASCADE,
+    )
+    weights = JSONField(_("Weights"), default=list)
+    loss = models.FloatField(_("Log loss of the fit"), null=True, blank=True)
+    reviews = models.PositiveIntegerField(_("Reviews of the fit"), default=0)
+    fitted_at = models.DateTimeField(_("Fitted at"))
+
+    objects = MemoryParametersManager()
+
+    def __str__(self):
+        return "%s: %s" % (self.owner, self.weights)
+
+
+# a DailyStudyStats row per key, summing the totals
+DAILY_STATS_KEY = ("user_id", "group_id", "topic_id", "date")
+DAILY_STATS_TOTALS = ("reviews", "correct", "seconds")
+# weeks of the activity heatmap and group progress series
+ACTIVITY_WEEKS = 53
+
+
+class DailyStudyStatsManager(models.Manager):
+    def get_totals(self, datapoints):
+        """Sums data points by day
+        datapoints: (mode, timestamp, outcome_int, duration_sec) tuples, mode is
+        "learning" or "recalling" and timestamp a naive local datetime (or ISO
+        string); returns {date: [reviews, correct, seconds]}
+        """
+        totals = defaultdict(lambda: [0, 0, 0])
+        for mode, timestamp, outcome_int, duration_sec in datapoints:
+            if isinstance(timestamp, str):
+                timestamp = parse_datetime(timestamp)
+            day = totals[timestamp.date()]
+            day[0] += 1
+            day[1] += outcome_int / MAX_OUTCOME[mode] >= SUCCESS_OUTCOME
+            day[2] += int(round(duration_sec))
+        return totals
+
+    def add(self, user_id, group_id, topic_id, date, reviews, correct, seconds):
+        # adds the totals to the row of the day (created if missing)
+        key = dict(zip(DAILY_STATS_KEY, (user_id, group_id, topic_id, date)))
+        totals = dict(zip(DAILY_STATS_TOTALS, (reviews, correct, seconds)))
+        row = self.filter(**key)
+        increments = {name: F(name) + value for name, value in totals.items()}
+        if row.update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                self.create(**key, **totals)
+        except IntegrityError:  # created concurrently
+            row.update(**increments)
+
+    def record(self, performance, datapoints):
+        # Adds the data points answered on performance to the rollups
+        card = performance.card
+        for date, totals in self.get_totals(datapoints).items():
+            self.add(performance.owner_id, card.group_id, card.topic_id, date, *totals)
+
+    def detach_topic(self, topic):
+        # Moves the rows of topic (about to be deleted) to its cards' "no topic"
+        for row in self.filter(topic=topic):
+            self.add(
+                row.user_id,
+                row.group_id,
+                None,
+                row.date,
+                row.reviews,
+                row.correct,
+                row.seconds,
+            )
+        return self.filter(topic=topic).delete()
+
+    def rebuild(self, since=None):
+        """Recalculates the rollups from the performances' data
+        since: date of the first day to recalculate (default: all days); the
+        days of the users with performances changed since then are rebuilt
+        """
+        performances = Performance.objects.all()
+        if since:
+            start = datetime.datetime.combine(since, datetime.time.min)
+            performances = performances.filter(
+                updated_at__gte=timezone.make_aware(start)
+            )
+        rows = performances.values_list(
+            "owner_id", "card__group_id", "card__topic_id", "data"
+        ).iterator(chunk_size=2000)
+        totals = defaultdict(lambda: [0, 0, 0])
+        users = set()
+        for user_id, group_id, topic_id, data in rows:
+            users.add(user_id)
+            datapoints = [
+                (mode, *datapoint)
+                for mode in MAX_OUTCOME
+                for datapoint in data.get(mode, [])
+            ]
+            for date, values in self.get_totals(datapoints).items():
+                if since and date < since:
+                    continue
+                day = totals[(user_id, group_id, topic_id, date)]
+                for i, value in enumerate(values):
+                    day[i] += value
+        with transaction.atomic():
+            stale = (
+                self.all()
+                if since is None
+                else self.filter(user_id__in=users, date__gte=since)
+            )
+            stale.delete()
+            rollups = self.bulk_create(
+                [
+                    DailyStudyStats(
+                        **dict(zip(DAILY_STATS_KEY, key)),
+                        **dict(zip(DAILY_STATS_TOTALS, values)),
+                    )
+                    for key, values in totals.items()
+                ],
+                batch_size=1000,
+            )
+        return len(rollups)
+
+    def filter_for(self, user=None, groups=None, since=None):
+        # returns the rows of user and/or the groups from since (date)
+        rows = self.all()
+        if user is not None:
+            rows = rows.filter(user=user)
+        if groups is not None:
+            rows = rows.filter(group__in=groups)
+        if since:
+            rows = rows.filter(date__gte=since)
+        return rows
+
+    def per_day(self, user=None, groups=None, since=None):
+        # returns the totals (and active users) per date of filter_for
+        return (
+            self.filter_for(user, groups, since)
+            .values("date")
+            .annotate(
+                reviews=Sum("reviews"),
+                correct=Sum("correct"),
+                seconds=Sum("seconds"),
+                users=Count("user", distinct=True),
+            )
+            .order_by("date")
+        )
+
+    def get_version(self, user=None, groups=None, since=None):
+        # returns the summed totals and days of filter_for (reviews only grow)
+        return self.filter_for(user, groups, since).aggregate(
+            reviews=Sum("reviews"),
+            seconds=Sum("seconds"),
+            rows=Count("pk"),
+            last_date=Max("date"),
+        )
+
+    def get_activity_start(self, today, weeks=ACTIVITY_WEEKS):
+        # returns the monday weeks - 1 weeks before the week of today
+        return today - datetime.timedelta(days=today.weekday(), weeks=weeks - 1)
+
+    def get_series(self, since, user=None, groups=None, fields=DAILY_STATS_TOTALS):
+        """Returns the totals per day from since as compact arrays
+        {"start": since, "days": [offset of the day from start, ...],
+        field: [total of the day, ...] for field in fields}; days without
+        reviews are left out
+        """
+        series = {"start": since.isoformat(), "days": []}
+        series.update({field: [] for field in fields})
+        for day in self.per_day(user, groups, since):
+            series["days"].append((day["date"] - since).days)
+            for field in fields:
+                series[field].append(day[field])
+        return series
+
+
+class DailyStudyStats(models.Model):
+    """
+    Reviews of a user per day, group and topic (rollup of Performance.data)
+    Rows are added to whenever answers are saved (see flashcards.signals) and
+    recalculated nightly, so charts per day read one row per day instead of
+    every data point. Days are local dates of the data points.
+    """
+
+    class Meta:
+        verbose_name = _("Daily Study Stats")
+        verbose_name_plural = _("Daily Study Stats")
+        constraints = [
+            models.UniqueConstraint(
+                name="daily_stats_unique_topic_day",
+                fields=["user", "group", "topic", "date"],
+            ),
+            models.UniqueConstraint(
+                name="daily_stats_unique_no_topic_day",
+                fields=["user", "group", "date"],
+                condition=Q(topic__isnull=True),
+            ),
+        ]
+        indexes = [
+            models.Index(name="daily_stats_user_date_idx", fields=["user", "date"]),
+            models.Index(name="daily_stats_group_date_idx", fields=["group", "date"]),
+        ]
+
+    user = models.ForeignKey(
+        User,
+        help_text=_("User of the reviews"),
+        related_name="daily_study_stats",
+        on_delete=models.CASCADE,
+    )
+    group = models.ForeignKey(
+        StudyGroup,
+        help_text=_("Group of the reviewed cards"),
+        related_name="daily_study_stats",
+        on_delete=models.CASCADE,
+    )
+    topic = models.ForeignKey(
+        Topic,
+        help_text=_("Topic of the reviewed cards (optional)"),
+        related_name="daily_study_stats",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+    )
+    date = models.DateField(_("Date"))
+    reviews = models.PositiveIntegerField(_("Reviews"), default=0)
+    correct = models.PositiveIntegerField(_("Correct reviews"), default=0)
+    seconds = models.PositiveIntegerField(_("Seconds studied"), default=0)
+
+    objects = DailyStudyStatsManager()
+
+    def __str__(self):
+        return "%s: %s %s" % (self.user, self.date, self.reviews)
+
+
+# Tombstones older than this are pruned (clients have to sync from scratch)
+TOMBSTONE_RETENTION = datetime.timedelta(days=90)
+
+TOMBSTONE_KINDS = (
+    ("card", _("Card")),
+    ("topic", _("Topic")),
+    ("membership", _("Membership")),
+    ("performance", _("Performance")),
+)
+
+
+class TombstoneManager(models.Manager):
+    def visible_to(self, user, group_ids):
+        # returns the tombstones of the groups (group_ids) and of user
+        return self.filter(Q(group_id__in=group_ids) | Q(user_id=user.pk))
+
+    def prune(self, before):
+        # deletes the tombstones older than before (datetime)
+        return self.filter(deleted_at__lt=before).delete()
+
+
+class Tombstone(models.Model):
+    """
+    Marks a deleted card, topic, membership or performance for the delta sync
+    The rows are inserted by statement level AFTER DELETE triggers on those
+    tables (migration 0016), one INSERT per DELETE statement, so cascading
+    deletes stay set-based.
+    """
+
+    class Meta:
+        verbose_name = _("Tombstone")
+        verbose_name_plural = _("Tombstones")
+        ordering = ("deleted_at", "id")
+        indexes = [
+            models.Index(
+                name="tombstone_group_deleted_idx",
+                fields=["group_id", "deleted_at", "id"],
+            ),
+            models.Index(
+                name="tombstone_user_deleted_idx",
+                fields=["user_id", "deleted_at", "id"],
+            ),
+        ]
+
+    kind = models.CharField(_("Kind"), max_length=20, choices=TOMBSTONE_KINDS)
+    unique_id = models.UUIDField(_("Unique ID of the deleted object"))
+    # Plain ids: the group or user may be deleted as well
+    group_id = models.IntegerField(_("Group ID"), null=True, blank=True)
+    user_id = models.IntegerField(_("User ID"), null=True, blank=True)
+    deleted_at = models.DateTimeField(_("Deleted at"), auto_now_add=True)
+
+    objects = TombstoneManager()
+
+    def __str__(self):
+        return "%s %s deleted at %s" % (self.kind, self.unique_id, self.deleted_at)
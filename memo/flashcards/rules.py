@@ -9,7 +9,7 @@ from studygroups.rules import is_group_member_admin, is_group_member_editor
 def can_manage_performance(user, performance):
     # user is owner of performance object
     if performance:
-        return performance.owner == user
+        return performance.owner_id == user.pk
     return False
 
 
@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from flashcards.models import Card, Performance
+from flashcards.models import Card, DailyStudyStats, Performance, Topic
+from studygroups.models import MemberProgress
 
 
 # CARD CREATION (post save)
@@ -12,3 +13,42 @@ def card_created(sender, instance, **kwargs):
             p, c = Performance.objects.get_or_create(
                 owner=membership.member, card=instance
             )
+
+
+# PERFORMANCE CHANGES (post save & delete): progress of the member in the group,
+# the daily study stats of the answers and the due card counts
+@receiver(post_save, sender=Performance)
+def performance_saved(sender, instance, created, **kwargs):
+    MemberProgress.objects.record(
+        instance,
+        old=getattr(instance, "loaded_progress_state", None),
+        created=created,
+    )
+    instance.loaded_progress_state = instance.get_progress_state()
+    datapoints = instance.pop_new_datapoints()
+    if datapoints:
+        DailyStudyStats.objects.record(instance, datapoints)
+    # cached due count of the owner (unknown previous state: left to the refresh)
+    if created or hasattr(instance, "loaded_is_due"):
+        was_due = not created and instance.loaded_is_due
+        is_due = instance.is_due()
+        if is_due != was_due:
+            Performance.objects.adjust_due_count(instance.owner_id, 1 if is_due else -1)
+        instance.loaded_is_due = is_due
+
+
+# TOPIC DELETION (pre delete): keeps the daily study stats of its cards
+@receiver(pre_delete, sender=Topic)
+def topic_deleting(sender, instance, **kwargs):
+    DailyStudyStats.objects.detach_topic(instance)
+
+
+# PERFORMANCE DELETION (post delete); the tombstones of deleted cards, topics,
+# memberships and performances are written by database triggers (Tombstone)
+@receiver(post_delete, sender=Performance)
+def performance_deleted(sender, instance, **kwargs):
+    MemberProgress.objects.record(
+        instance, old=instance.get_progress_state(), deleted=True
+    )
+    if instance.is_due():
+        Performance.objects.adjust_due_count(instance.owner_id, -1)
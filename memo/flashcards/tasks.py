@@ -0,0 +1,82 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from flashcards.models import (
+    TOMBSTONE_RETENTION,
+    DailyStudyStats,
+    Performance,
+    Tombstone,
+)
+
+from config import celery_app
+
+User = get_user_model()
+
+# due cards from which a user gets the digest and users per digest task
+DUE_DIGEST_THRESHOLD = 10
+DUE_DIGEST_CHUNK_SIZE = 500
+
+
+@celery_app.task()
+def prune_tombstones():
+    """Deletes the tombstones clients no longer sync (see the sync API)."""
+    deleted, per_model = Tombstone.objects.prune(timezone.now() - TOMBSTONE_RETENTION)
+    return deleted
+
+
+@celery_app.task()
+def rebuild_daily_study_stats(days=2):
+    """Recalculates the daily study stats of the last days (days=None: all)."""
+    since = None
+    if days is not None:
+        since = timezone.localdate() - datetime.timedelta(days=days - 1)
+    return DailyStudyStats.objects.rebuild(since)
+
+
+@celery_app.task()
+def refresh_due_counts():
+    """Caches the due card count of every user (navbar badge)."""
+    return Performance.objects.refresh_due_counts()
+
+
+@celery_app.task()
+def send_due_digests(threshold=DUE_DIGEST_THRESHOLD, chunk_size=DUE_DIGEST_CHUNK_SIZE):
+    """Queues the due card digests of the users with at least threshold due
+    cards, chunk_size users per task (counted in one grouped query)."""
+    counts = sorted(Performance.objects.get_due_counts(min_count=threshold).items())
+    for start in range(0, len(counts), chunk_size):
+        end = start + chunk_size
+        send_due_digest_chunk.delay(counts[start:end])
+    return len(counts)
+
+
+@celery_app.task()
+def send_due_digest_chunk(counts):
+    """Sends the due card digests of counts ([(user id, due cards), ...])
+    over one mail connection."""
+    counts = dict(counts)
+    site = Site.objects.get_current()
+    url = "https://%s%s" % (site.domain, reverse("flashcards:brain_gain_view"))
+    users = User.objects.filter(pk__in=counts, is_active=True).exclude(email="")
+    messages = []
+    for user in users.only("pk", "username", "email"):
+        context = {
+            "user": user,
+            "due_count": counts[user.pk],
+            "url": url,
+            "current_site": site,
+        }
+        subject = render_to_string("flashcards/email/due_digest_subject.txt", context)
+        messages.append(
+            EmailMessage(
+                " ".join(subject.split()),
+                render_to_string("flashcards/email/due_digest_message.txt", context),
+                to=[user.email],
+            )
+        )
+    return get_connection().send_messages(messages) or 0
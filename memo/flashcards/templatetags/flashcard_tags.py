@@ -1,17 +1,100 @@
+import hashlib
+
 from ckeditor.widgets import CKEditorWidget
 from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.translation import get_language
 from flashcards.forms import CardForm, PerformanceForm
+from utils.cache import count_cache_access
 
 register = template.Library()
 
+CARD_TILE_CACHE_TIMEOUT = 24 * 60 * 60
+# bump when a template included by the card tile changes (the source of the
+# cached block itself is part of the key)
+CARD_TILE_VERSION = 1
+
 
 @register.simple_tag()
 def card_performance(user, card):
     # returns the card performance for this user or None
     # return Performance.objects.filter(owner=user, card=card).first()
+    if hasattr(card, "user_performances"):
+        # prefetched for the request user (group detail view)
+        return card.user_performances[0] if card.user_performances else None
     return card.performances.filter(owner=user).first()
 
 
+def card_tile_cache_key(card, performance, can_manage_card, template_version=""):
+    # versioned key: any card or performance save (or template change) leads
+    # to a new key
+    return make_template_fragment_key(
+        "card_tile",
+        [
+            CARD_TILE_VERSION,
+            template_version,
+            card.pk,
+            card.updated_at.isoformat(),
+            performance.pk if performance else None,
+            performance.updated_at.isoformat() if performance else None,
+            bool(can_manage_card),
+            get_language(),
+        ],
+    )
+
+
+def template_version(nodelist):
+    # returns a hash of the template source of nodelist
+    source = "".join(
+        node.token.contents
+        for node in nodelist.get_nodes_by_type(template.Node)
+        if node.token is not None
+    )
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+class CardTileCacheNode(template.Node):
+    def __init__(self, nodelist, card, performance, can_manage_card):
+        self.nodelist = nodelist
+        self.card = card
+        self.performance = performance
+        self.can_manage_card = can_manage_card
+        self.template_version = template_version(nodelist)
+
+    def render(self, context):
+        key = card_tile_cache_key(
+            self.card.resolve(context),
+            self.performance.resolve(context),
+            self.can_manage_card.resolve(context),
+            self.template_version,
+        )
+        content = cache.get(key)
+        count_cache_access("card_tile", content is not None)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, CARD_TILE_CACHE_TIMEOUT)
+        return content
+
+
+@register.tag
+def card_tile_cache(parser, token):
+    """
+    Caches the enclosed card tile until card or performance change
+    {% card_tile_cache card card_performance can_manage_card %} ... {% endcard_tile_cache %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 4:
+        raise template.TemplateSyntaxError(
+            "'%s' takes card, performance and can_manage_card" % bits[0]
+        )
+    nodelist = parser.parse(("endcard_tile_cache",))
+    parser.delete_first_token()
+    return CardTileCacheNode(
+        nodelist, *[parser.compile_filter(bit) for bit in bits[1:]]
+    )
+
+
 @register.inclusion_tag("flashcards/templatetags/_card_icon.html")
 def card_icon(performance, max_height=35):
     # Add a group icon
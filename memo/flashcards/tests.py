@@ -1,3 +1,922 @@
-# from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import timeit
+import uuid
 
-# Create your tests here.
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.template import Context, Template
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from flashcards import memory
+from flashcards.analytics import NO_TOPIC, ReviewHistory
+from flashcards.api.views import (
+    CardSyncViewSet,
+    CardViewSet,
+    ReviewViewSet,
+    StudyGroupViewSet,
+    SyncViewSet,
+    TombstoneSyncViewSet,
+)
+from flashcards.management.commands import fit_memory_parameters
+from flashcards.models import (
+    TOMBSTONE_RETENTION,
+    Card,
+    DailyStudyStats,
+    MemoryParameters,
+    Performance,
+    Tombstone,
+    Topic,
+)
+from flashcards.tasks import send_due_digests
+from flashcards.views import CreateTopicView, UpdateDeleteCardView
+from rest_framework.test import APIRequestFactory, force_authenticate
+from studygroups.models import MemberProgress, Membership
+from utils.admin import get_search_condition
+from utils.cache import get_cache_stats
+from utils.pagination import decode_cursor
+
+from memo.users.tests.factories import UserFactory
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+def query_plan_nodes(plan):
+    # yields all nodes of an EXPLAIN (FORMAT JSON) plan
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from query_plan_nodes(child)
+
+
+class TestCardFilter:
+    def test_joins_user_performance_once(self, user: User):
+        group = user.get_main_user_group()
+        card_list = group.cards.filter_for(
+            user, search="question", paused="False", priority="high"
+        ).order_by("-user_recall_score", "pk")
+
+        assert str(card_list.query).count('JOIN "flashcards_performance"') == 1
+
+    def test_no_duplicates_across_members(self, user: User):
+        group = user.get_main_user_group()
+        Membership.objects.create(group=group, member=UserFactory(), approved=True)
+        card = Card.objects.create(
+            group=group, creator=user, front_text="Question", back_text="Answer"
+        )
+
+        assert Performance.objects.filter(card=card).count() == 2
+        assert list(group.cards.filter_for(user, paused="False")) == [card]
+        assert list(group.cards.filter_for(user).order_by("user_recall_score")) == [
+            card
+        ]
+
+    @pytest.mark.skipif(
+        "MEMO_QUERY_PLAN_TESTS" not in os.environ,
+        reason="Loads 1M performance rows (set MEMO_QUERY_PLAN_TESTS to run)",
+    )
+    def test_query_plan_at_1m_performance_rows(self, user: User):
+        group = user.get_main_user_group()
+        owners = [user] + User.objects.bulk_create(
+            [User(username="member-%d" % i) for i in range(999)]
+        )
+        cards = Card.objects.bulk_create(
+            [
+                Card(group=group, creator=user, front_text="Question %d" % i)
+                for i in range(1000)
+            ]
+        )
+        for owner in owners:
+            Performance.objects.bulk_create(
+                [Performance(owner=owner, card=card) for card in cards]
+            )
+        card_list = group.cards.filter_for(
+            user, paused="False", priority="normal"
+        ).order_by("-user_recall_score", "pk")[:9]
+        sql, params = card_list.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE flashcards_performance")
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cursor.fetchone()[0][0]["Plan"]
+
+        performance_scans = [
+            node
+            for node in query_plan_nodes(plan)
+            if node.get("Relation Name") == "flashcards_performance"
+        ]
+        assert len(performance_scans) == 1
+        assert performance_scans[0]["Node Type"] != "Seq Scan"
+
+
+class TestViewQueries:
+    # Rows are loaded once per request (request scoped identity map)
+
+    def test_update_delete_card_view(
+        self, user: User, rf: RequestFactory, django_assert_num_queries
+    ):
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        view = UpdateDeleteCardView()
+        request = rf.post("/fake-url/", {"delete": ""})
+        request.user = user
+        view.setup(request, unique_id=card.unique_id)
+
+        # card with group + membership
+        with django_assert_num_queries(2):
+            assert view.has_permission()
+            assert view.get_object() == card
+            assert view.get_permission_object().group == group
+            assert view.get_success_url() == group.get_absolute_url()
+
+    def test_create_topic_view(
+        self, user: User, rf: RequestFactory, django_assert_num_queries
+    ):
+        group = user.get_main_user_group()
+        view = CreateTopicView()
+        request = rf.get("/fake-url/")
+        request.user = user
+        view.setup(request, unique_group_id=group.unique_id)
+
+        # group + membership
+        with django_assert_num_queries(2):
+            assert view.has_permission()
+            assert view.get_initial()["group"] == group
+            assert view.get_success_url() == group.get_absolute_url()
+
+
+class TestCardTileCache:
+    def render(self, card, performance, tile="{{ card.front_text }}"):
+        template = Template(
+            "{% load flashcard_tags %}"
+            "{% card_tile_cache card performance True %}"
+            + tile
+            + " {{ performance.recall_score }}"
+            "{% endcard_tile_cache %}"
+        )
+        return template.render(Context({"card": card, "performance": performance}))
+
+    def test_versioned_by_card_and_performance(self, user: User):
+        cache.clear()
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        performance = card.performances.get(owner=user)
+        assert self.render(card, performance) == "Question 0.0"
+
+        # unsaved changes are not visible (cache hit)
+        card.front_text = "Changed"
+        assert self.render(card, performance) == "Question 0.0"
+
+        card.save()
+        assert self.render(card, performance) == "Changed 0.0"
+
+        performance.recall_score = 50
+        performance.save()
+        assert self.render(card, performance) == "Changed 50"
+
+        assert get_cache_stats("card_tile") == {
+            "hits": 1,
+            "misses": 3,
+            "hit_rate": 0.25,
+        }
+
+    def test_versioned_by_template(self, user: User):
+        cache.clear()
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        assert self.render(card, performance) == "Question 0.0"
+        tile = "<b>{{ card.front_text }}</b>"
+        assert self.render(card, performance, tile) == "<b>Question</b> 0.0"
+
+
+class TestCardContent:
+    def test_rendered_on_save(self, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(),
+            creator=user,
+            front_text="<p>What is <b>2 &amp; 2</b>?</p><script>alert(1)</script>",
+            back_text='<p onclick="x()">Four</p>',
+        )
+
+        assert card.front_html == "<p>What is <b>2 &amp; 2</b>?</p>alert(1)"
+        assert card.back_html == "<p>Four</p>"
+        assert card.front_plain == "What is 2 & 2?alert(1)"
+        assert card.back_plain == "Four"
+        assert card.preview == "What is 2 & 2?alert(1)"
+
+    def test_rendered_on_bulk_create(self, user: User):
+        (card,) = Card.objects.bulk_create(
+            [
+                Card(
+                    group=user.get_main_user_group(),
+                    creator=user,
+                    front_text="<p>%s</p>" % ("word " * 40),
+                )
+            ]
+        )
+
+        assert card.front_html.startswith("<p>word word")
+        assert len(card.preview) == 80
+        assert card.preview.endswith("…")
+
+
+class TestSyncApi:
+    @pytest.fixture(autouse=True)
+    def no_settle_time(self, monkeypatch):
+        monkeypatch.setattr(SyncViewSet, "settle_time", datetime.timedelta(0))
+
+    def sync(self, viewset, user, **params):
+        request = APIRequestFactory().get("/fake-url/", params)
+        force_authenticate(request, user=user)
+        return viewset.as_view({"get": "list"})(request).data
+
+    def test_cards_changed_since_cursor(self, user: User):
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+
+        data = self.sync(CardSyncViewSet, user)
+        assert [row["unique_id"] for row in data["results"]] == [str(card.unique_id)]
+        assert not data["has_more"]
+
+        assert self.sync(CardSyncViewSet, user, cursor=data["cursor"])["results"] == []
+
+        card.back_text = "Answer"
+        card.save()
+        data = self.sync(CardSyncViewSet, user, cursor=data["cursor"])
+        assert [row["back_text"] for row in data["results"]] == ["Answer"]
+
+    def test_cursor_stops_before_transactions_in_flight(self, user: User, monkeypatch):
+        assert SyncViewSet().get_oldest_transaction_start() is None
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        # another request wrote before the card and commits later
+        started = card.updated_at - datetime.timedelta(minutes=5)
+        monkeypatch.setattr(
+            SyncViewSet, "get_oldest_transaction_start", lambda self: started
+        )
+
+        data = self.sync(CardSyncViewSet, user)
+        assert data["results"] == []
+        assert decode_cursor(data["cursor"])[0] == started.isoformat()
+
+        monkeypatch.setattr(
+            SyncViewSet, "get_oldest_transaction_start", lambda self: None
+        )
+        data = self.sync(CardSyncViewSet, user, cursor=data["cursor"])
+        assert [row["unique_id"] for row in data["results"]] == [str(card.unique_id)]
+
+    def test_cards_of_other_groups_are_not_synced(self, user: User):
+        other = UserFactory()
+        Card.objects.create(
+            group=other.get_main_user_group(), creator=other, front_text="Question"
+        )
+
+        assert self.sync(CardSyncViewSet, user)["results"] == []
+
+    def test_blocked_members_are_not_synced(self, user: User):
+        group = user.get_main_user_group()
+        Card.objects.create(group=group, creator=user, front_text="Question")
+        blocked = UserFactory()
+        Membership.objects.create(
+            group=group, member=blocked, approved=True, blocked=True
+        )
+
+        assert self.sync(CardSyncViewSet, blocked)["results"] == []
+
+    def test_deletions_as_tombstones(self, user: User):
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        unique_ids = {str(card.unique_id), str(card.performances.get().unique_id)}
+        assert self.sync(TombstoneSyncViewSet, user)["results"] == []
+
+        card.delete()
+
+        data = self.sync(TombstoneSyncViewSet, user)
+        assert {row["unique_id"] for row in data["results"]} == unique_ids
+
+    def test_tombstones_of_cascades(self, user: User):
+        group = user.get_main_user_group()
+        for member in UserFactory.create_batch(3):
+            Membership.objects.create(group=group, member=member, approved=True)
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        unique_ids = {str(card.unique_id)} | {
+            str(unique_id)
+            for unique_id in card.performances.values_list("unique_id", flat=True)
+        }
+
+        with CaptureQueriesContext(connection) as context:
+            card.delete()
+        # written by the delete statements' triggers
+        assert not [
+            query for query in context if "flashcards_tombstone" in query["sql"]
+        ]
+        assert {
+            str(unique_id)
+            for unique_id in Tombstone.objects.values_list("unique_id", flat=True)
+        } == unique_ids
+        assert len(unique_ids) == 5
+
+    def test_quiet_group_cursor_does_not_expire(self, user: User, monkeypatch):
+        data = self.sync(TombstoneSyncViewSet, user)
+        now = timezone.now()
+        # weekly syncs of a group without deletions beyond the retention
+        for day in range(7, TOMBSTONE_RETENTION.days + 14, 7):
+            later = now + datetime.timedelta(days=day)
+            monkeypatch.setattr(timezone, "now", lambda: later)
+            data = self.sync(TombstoneSyncViewSet, user, cursor=data["cursor"])
+            assert data["results"] == []
+
+
+class TestReadApi:
+    def get(self, viewset, user, **params):
+        request = APIRequestFactory().get("/fake-url/", params)
+        force_authenticate(request, user=user)
+        return viewset.as_view({"get": "list"})(request).data
+
+    def test_sparse_fieldset_and_cursor(
+        self, user: User, monkeypatch, django_assert_num_queries
+    ):
+        cache.clear()
+        monkeypatch.setattr(CardViewSet.pagination_class, "page_size", 2)
+        group = user.get_main_user_group()
+        cards = [
+            Card.objects.create(group=group, creator=user, front_text="Question %d" % i)
+            for i in range(3)
+        ]
+
+        # membership map + cards (no join for unrequested relations)
+        with django_assert_num_queries(2):
+            data = self.get(CardViewSet, user, fields="unique_id,preview")
+        assert data["results"] == [
+            {"unique_id": str(card.unique_id), "preview": card.preview}
+            for card in cards[:0:-1]
+        ]
+
+        cursor = data["next"].split("cursor=")[1]
+        data = self.get(CardViewSet, user, fields="preview", cursor=cursor)
+        assert data == {"next": None, "results": [{"preview": "Question 0"}]}
+
+    def test_payloads_are_versioned_by_updated_at(self, user: User):
+        cache.clear()
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        self.get(CardViewSet, user)
+        assert self.get(CardViewSet, user)["results"][0]["front_text"] == "Question"
+        assert get_cache_stats("api_payload")["hits"] == 1
+
+        card.front_text = "Changed"
+        card.save()
+        assert self.get(CardViewSet, user)["results"][0]["front_text"] == "Changed"
+
+        Topic.objects.create(group=group, title="Topic")
+        (payload,) = self.get(StudyGroupViewSet, user)["results"]
+        assert len(payload["topics"]) == 1
+
+
+class TestReviewUpload:
+    def upload(self, user, reviews):
+        request = APIRequestFactory().post("/fake-url/", reviews, format="json")
+        force_authenticate(request, user=user)
+        response = ReviewViewSet.as_view({"post": "create"})(request)
+        return [item["status"] for item in response.data["results"]]
+
+    def review(self, performance, **kwargs):
+        review = {
+            "client_id": str(uuid.uuid4()),
+            "performance": str(performance.unique_id),
+            "mode": "recall",
+            "outcome_int": 5,
+            "duration_sec": 3,
+            "reviewed_at": "2021-01-20T10:00:00Z",
+        }
+        review.update(kwargs)
+        return review
+
+    def test_replays_are_applied_once(self, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        reviews = [
+            self.review(performance, reviewed_at="2021-01-20T10:01:00Z"),
+            self.review(performance, outcome_int=0),
+            self.review(performance, mode="train", outcome_int=2),
+            self.review(card, mode="train", outcome_int=1),
+        ]
+
+        assert self.upload(user, reviews) == [
+            "applied",
+            "applied",
+            "invalid",
+            "not_found",
+        ]
+        performance.refresh_from_db()
+        assert performance.recall_trials == 2
+        assert performance.recall_score == 50
+        # sorted by the time of review
+        assert [point[1] for point in performance.data["recalling"]] == [0, 5]
+
+        assert self.upload(user, reviews[:2] + reviews[:1]) == ["duplicate"] * 3
+        performance.refresh_from_db()
+        assert performance.recall_trials == 2
+
+    def test_performances_of_other_users_are_not_found(self, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        review = self.review(card.performances.get(owner=user))
+
+        assert self.upload(UserFactory(), [review]) == ["not_found"]
+
+
+class TestReviewHistory:
+    def test_streams_data_points_in_range(self, user: User, client):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        for day in (1, 2, 3):
+            performance.add_recalling_datapoint(
+                day, 10, datetime.datetime(2021, 1, day, 12)
+            )
+        performance.add_training_datapoint(1, 5, datetime.datetime(2021, 1, 2, 8))
+        performance.save()
+        client.force_login(user)
+
+        response = client.get(
+            reverse("flashcards:review_history_view"),
+            {"since": "2021-01-02", "until": "2021-01-03"},
+        )
+        assert response["Content-Type"] == "application/x-ndjson"
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {
+                "performance": str(performance.unique_id),
+                "card": str(card.unique_id),
+                "mode": mode,
+                "outcome_int": outcome_int,
+                "duration_sec": duration_sec,
+                "reviewed_at": reviewed_at,
+            }
+            for mode, outcome_int, duration_sec, reviewed_at in [
+                ("train", 1, 5, "2021-01-02T08:00:00"),
+                ("recall", 2, 10, "2021-01-02T12:00:00"),
+            ]
+        ]
+
+    def test_bounds_checked_before_streaming(self, user: User, client):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        performance.add_recalling_datapoint(5, 10, datetime.datetime(2021, 3, 28, 4))
+        performance.save()
+        client.force_login(user)
+        url = reverse("flashcards:review_history_view")
+
+        response = client.get(url, {"since": "2021-02-30"})
+        assert response.status_code == 400
+        # skipped by the DST change in Europe/Berlin
+        response = client.get(url, {"since": "2021-03-28T02:30:00"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        assert [json.loads(line)["outcome_int"] for line in lines] == [5]
+
+
+def synthetic_history(members, cards, reviews_per_card, seed=0):
+    # returns a ReviewHistory of members x cards performances (no database)
+    rng = np.random.default_rng(seed)
+    size = members * cards * reviews_per_card
+    performance = np.repeat(np.arange(members * cards), reviews_per_card)
+    start = np.datetime64("2021-01-01T00:00:00")
+    return ReviewHistory(
+        performance=performance,
+        owner=performance // cards,
+        topic=performance % cards % 50,
+        recall=rng.random(size) < 0.7,
+        outcome=rng.integers(0, 6, size) / 5,
+        duration=rng.integers(1, 60, size).astype(np.float64),
+        reviewed_at=start + rng.integers(0, 365 * 86400, size).astype("timedelta64[s]"),
+    )
+
+
+class TestAnalytics:
+    rows = [
+        (
+            1,
+            10,
+            3,
+            {
+                "learning": [["2021-01-01T10:00:00.123", 1, 5]],
+                "recalling": [
+                    ["2021-01-05T10:00:00", 2, 4],
+                    ["2021-01-02T10:00:00", 5, 3],
+                ],
+            },
+        ),
+        (2, 10, None, {"learning": [], "recalling": [["2021-01-03T10:00:00", 4, 3]]}),
+        (3, 10, 3, {"learning": [], "recalling": []}),
+    ]
+
+    def test_metrics(self):
+        history = ReviewHistory.from_rows(self.rows)
+
+        assert len(history) == 4
+        # (5/5 + 2/5) / 2 and 4/5 per performance
+        assert history.score() == pytest.approx(75)
+        assert history.topic_mastery() == {NO_TOPIC: (1, 1), 3: (1, 0)}
+        curve = history.retention_curve()
+        assert curve[0] == (1, 1.0, 1)
+        assert curve[2] == (4, pytest.approx(0.4), 1)
+        assert history.time_on_task() == [
+            (datetime.date(2021, 1, 1), 5),
+            (datetime.date(2021, 1, 2), 3),
+            (datetime.date(2021, 1, 3), 3),
+            (datetime.date(2021, 1, 5), 4),
+        ]
+        assert history.streaks(datetime.date(2021, 1, 6)) == (1, 3)
+        assert history.streaks(datetime.date(2021, 1, 7)) == (0, 3)
+
+    def test_empty(self):
+        history = ReviewHistory.from_rows([])
+
+        assert history.score() == 0
+        assert history.topic_mastery() == {}
+        assert history.time_on_task() == []
+        assert history.streaks(datetime.date(2021, 1, 1)) == (0, 0)
+
+    def test_membership_score(self, user: User):
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        performance = card.performances.get(owner=user)
+        performance.add_recalling_datapoint(4, 10)
+        performance.save()
+
+        assert group.membership_for(user).get_score() == "80 %"
+
+    def test_statistics_view_ignores_malformed_group(self, user: User, client):
+        client.force_login(user)
+        url = reverse("flashcards:statistics_view")
+        response = client.get(url, {"group": "not-a-uuid"})
+        assert response.status_code == 200
+        assert response.context["group"] is None
+
+    @pytest.mark.skipif(
+        "MEMO_BENCHMARK_TESTS" not in os.environ,
+        reason="Timing benchmark (set MEMO_BENCHMARK_TESTS to run)",
+    )
+    def test_benchmark_group_of_1000_members_and_5000_cards(self):
+        history = synthetic_history(members=1000, cards=5000, reviews_per_card=2)
+        metrics = {
+            "score": history.score,
+            "topic_mastery": history.topic_mastery,
+            "retention_curve": history.retention_curve,
+            "time_on_task": history.time_on_task,
+            "streaks": lambda: history.streaks(datetime.date(2022, 1, 1)),
+        }
+        # 10M reviews: each metric well below 5s (about 0.2-1.5s measured)
+        for name, metric in metrics.items():
+            seconds = timeit.timeit(metric, number=1)
+            assert seconds < 5, "%s of %d reviews: %.2fs" % (
+                name,
+                len(history),
+                seconds,
+            )
+
+
+def simulated_history(weights, cards=100, reviews_per_card=8, seed=1):
+    # returns a ReviewHistory of recalls drawn from the memory model (no database)
+    rng = np.random.default_rng(seed)
+    rows = []
+    for card in range(cards):
+        reviewed_at = datetime.datetime(2021, 1, 1)
+        points = {"learning": [(reviewed_at, 1, 5)], "recalling": []}
+        successes = failures = 0
+        for i in range(reviews_per_card):
+            stability = memory.stability(weights, successes, failures)
+            days = rng.uniform(0.2, 2.5) * stability
+            reviewed_at += datetime.timedelta(days=days)
+            recalled = rng.random() < memory.retrievability(days, stability)
+            points["recalling"].append((reviewed_at, 5 if recalled else 1, 5))
+            successes, failures = successes + recalled, failures + (not recalled)
+        rows.append((card, 1, None, points))
+    return ReviewHistory.from_rows(rows)
+
+
+class TestMemoryModel:
+    def test_fit_recovers_weights(self):
+        result = memory.fit_user(1, simulated_history((2.0, 3.0, 0.3)))
+
+        assert result["reviews"] == 800
+        w0, w1, w2 = result["weights"]
+        assert 1 < w0 < 4 and 2 < w1 < 4.5 and 0.15 < w2 < 0.6
+        assert len(result["due"][0]) == 100
+
+    def test_due_at_on_save(self, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        assert performance.due_at is None
+
+        performance.add_recalling_datapoint(5, 3, datetime.datetime(2021, 1, 1, 12))
+        performance.save()
+        # default weights: stability w0 * w1 = 2.5 days after one recall
+        assert timezone.make_naive(performance.due_at) == datetime.datetime(
+            2021, 1, 4, 0
+        )
+
+    def test_due_at_in_dst_gap(self, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        # due at 2021-03-28 02:30, skipped in Europe/Berlin: taken as standard time
+        performance.add_recalling_datapoint(
+            5, 3, datetime.datetime(2021, 3, 25, 14, 30)
+        )
+        performance.save()
+        gap_due_at = datetime.datetime(2021, 3, 28, 1, 30, tzinfo=timezone.utc)
+        assert performance.due_at == gap_due_at
+
+        result = {
+            "owner_id": user.pk,
+            "weights": memory.DEFAULT_WEIGHTS,
+            "loss": None,
+            "reviews": 1,
+            "due": (
+                np.array([performance.pk]),
+                np.array(["2021-10-31T02:30:00"], dtype="datetime64[s]"),
+            ),
+        }
+        fit_memory_parameters.Command().save_result(result, timezone.now())
+        performance.refresh_from_db()
+        # repeated hour: standard time as well
+        assert performance.due_at == datetime.datetime(
+            2021, 10, 31, 1, 30, tzinfo=timezone.utc
+        )
+
+    def test_fit_command_resumes(self, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        performance.add_recalling_datapoint(5, 3, datetime.datetime(2021, 1, 1, 12))
+        performance.save()
+
+        call_command("fit_memory_parameters", workers=1, stdout=io.StringIO())
+        parameters = MemoryParameters.objects.get(owner=user)
+        assert tuple(parameters.weights) == memory.DEFAULT_WEIGHTS
+        assert list(MemoryParameters.objects.get_owner_ids_to_fit()) == []
+
+    def test_fit_keeps_due_dates_of_answers_during_the_run(self, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        performance.add_recalling_datapoint(5, 3, datetime.datetime(2021, 1, 1, 12))
+        performance.save()
+        due_at = performance.due_at
+        result = {
+            "owner_id": user.pk,
+            "weights": memory.DEFAULT_WEIGHTS,
+            "loss": None,
+            "reviews": 1,
+            "due": (
+                np.array([performance.pk]),
+                np.array(["2030-01-01T00:00:00"], dtype="datetime64[s]"),
+            ),
+        }
+        command = fit_memory_parameters.Command()
+
+        # answered after the load of the chunk
+        command.save_result(result, performance.updated_at - datetime.timedelta(1))
+        performance.refresh_from_db()
+        assert performance.due_at == due_at
+
+        command.save_result(result, timezone.now())
+        performance.refresh_from_db()
+        assert timezone.make_naive(performance.due_at).year == 2030
+
+
+class TestDailyStudyStats:
+    def rollups(self, user):
+        return list(
+            DailyStudyStats.objects.filter(user=user)
+            .order_by(F("topic__title").asc(nulls_first=True), "date")
+            .values_list("topic__title", "date", "reviews", "correct", "seconds")
+        )
+
+    def test_recorded_and_rebuilt(self, user: User):
+        group = user.get_main_user_group()
+        topic = Topic.objects.create(group=group, title="Topic")
+        cards = [
+            Card.objects.create(
+                group=group, creator=user, topic=topic, front_text="Question"
+            ),
+            Card.objects.create(group=group, creator=user, front_text="Question"),
+        ]
+        day = datetime.datetime(2021, 1, 1, 12)
+        for card in cards:
+            performance = card.performances.get(owner=user)
+            performance.add_recalling_datapoint(5, 10, day)
+            performance.add_recalling_datapoint(1, 20, day)
+            performance.add_training_datapoint(1, 5, day + datetime.timedelta(days=1))
+            performance.save()
+        recorded = [
+            (None, day.date(), 2, 1, 30),
+            (None, day.date() + datetime.timedelta(days=1), 1, 1, 5),
+            ("Topic", day.date(), 2, 1, 30),
+            ("Topic", day.date() + datetime.timedelta(days=1), 1, 1, 5),
+        ]
+        assert self.rollups(user) == recorded
+
+        DailyStudyStats.objects.rebuild()
+        assert self.rollups(user) == recorded
+        DailyStudyStats.objects.rebuild(since=day.date() + datetime.timedelta(days=1))
+        assert self.rollups(user) == recorded
+
+        topic.delete()
+        assert self.rollups(user) == [
+            (None, day.date(), 4, 2, 60),
+            (None, day.date() + datetime.timedelta(days=1), 2, 2, 10),
+        ]
+
+    def test_per_day(self, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        performance.add_recalling_datapoint(4, 60, datetime.datetime(2021, 1, 1, 9))
+        performance.add_recalling_datapoint(5, 60, datetime.datetime(2021, 1, 1, 20))
+        performance.save()
+
+        assert list(DailyStudyStats.objects.per_day(user)) == [
+            {
+                "date": datetime.date(2021, 1, 1),
+                "reviews": 2,
+                "correct": 2,
+                "seconds": 120,
+                "users": 1,
+            }
+        ]
+
+
+class TestDueCounts:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        cache.clear()
+
+    def review(self, performance, days_ago):
+        # recalls performance days_ago (due 2.5 days later with default weights)
+        reviewed_at = datetime.datetime.now() - datetime.timedelta(days=days_ago)
+        performance.add_recalling_datapoint(5, 10, reviewed_at)
+        performance.save()
+
+    def test_adjusted_on_answers(self, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = Performance.objects.get(owner=user, card=card)
+        assert Performance.objects.get_due_count(user.pk) == 0
+
+        self.review(performance, days_ago=10)
+        assert Performance.objects.get_due_count(user.pk) == 1
+
+        performance = Performance.objects.get(pk=performance.pk)
+        self.review(performance, days_ago=0)
+        assert Performance.objects.get_due_count(user.pk) == 0
+
+        Performance.objects.filter(pk=performance.pk).update(
+            due_at=timezone.now() - datetime.timedelta(days=1)
+        )
+        assert Performance.objects.get_due_count(user.pk) == 0  # cached
+        assert Performance.objects.refresh_due_counts() == 1
+        assert Performance.objects.get_due_count(user.pk) == 1
+
+    def test_digests(self, user: User, settings):
+        settings.CELERY_TASK_ALWAYS_EAGER = True
+        other = UserFactory()
+        for owner in (user, other):
+            card = Card.objects.create(
+                group=owner.get_main_user_group(), creator=owner, front_text="Question"
+            )
+            self.review(Performance.objects.get(owner=owner, card=card), days_ago=10)
+        Performance.objects.filter(owner=other).update(is_paused=True)
+
+        assert send_due_digests(threshold=1, chunk_size=1) == 1
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == [user.email]
+        assert mail.outbox[0].subject == "1 card is due for review"
+
+
+class TestPerformanceAdmin:
+    def changelist_queries(self, client):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse("admin:flashcards_performance_changelist"))
+        assert response.status_code == 200
+        return len(context)
+
+    def test_changelist_query_count(self, admin_client, user: User):
+        group = user.get_main_user_group()
+        Card.objects.create(group=group, creator=user, front_text="Question")
+        queries = self.changelist_queries(admin_client)
+        for i in range(5):
+            Card.objects.create(group=group, creator=user, front_text="Question %d" % i)
+        assert self.changelist_queries(admin_client) == queries
+
+    def test_reset_data(self, admin_client, user: User):
+        cache.clear()
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        performance = card.performances.get(owner=user)
+        reviewed_at = datetime.datetime.now() - datetime.timedelta(days=10)
+        performance.add_recalling_datapoint(5, 10, reviewed_at)
+        performance.save()
+        assert Performance.objects.get_due_count(user.pk) == 1
+
+        response = admin_client.post(
+            reverse("admin:flashcards_performance_changelist"),
+            {"action": "reset_data", "_selected_action": [performance.pk]},
+        )
+        assert response.status_code == 302
+        performance.refresh_from_db()
+        assert performance.data == {"learning": [], "recalling": []}
+        assert (performance.recall_score, performance.recall_trials) == (0, 0)
+        assert performance.due_at is None
+        assert Performance.objects.get_due_count(user.pk) == 0
+        progress = MemberProgress.objects.get(member=user, group=group)
+        assert (progress.recall_score, progress.cards_mastered) == (0, 0)
+
+
+class TestAdminSearch:
+    def search(self, client, url_name, term):
+        response = client.get(reverse(url_name), {"q": term})
+        assert response.status_code == 200
+        return list(response.context["cl"].result_list)
+
+    def test_card_search(self, admin_client, user: User):
+        group = user.get_main_user_group()
+        topic = Topic.objects.create(group=group, title="Anatomy")
+        card = Card.objects.create(
+            group=group, creator=user, topic=topic, front_text="<p>Femur</p>"
+        )
+        Card.objects.create(group=group, creator=user, front_text="Tibia")
+        url_name = "admin:flashcards_card_changelist"
+        assert self.search(admin_client, url_name, "femu") == [card]
+        assert self.search(admin_client, url_name, "anatomy") == [card]
+        assert len(self.search(admin_client, url_name, group.name)) == 2
+        assert self.search(admin_client, url_name, "anatomy tibia") == []
+
+    def test_quoted_phrase_search(self, admin_client, user: User):
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Cell wall")
+        Card.objects.create(group=group, creator=user, front_text="Wall of a cell")
+        url_name = "admin:flashcards_card_changelist"
+        assert self.search(admin_client, url_name, '"cell wall"') == [card]
+        assert len(self.search(admin_client, url_name, "cell wall")) == 2
+
+    def test_search_across_relations(self, user: User):
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        condition = get_search_condition(Performance, "card__group__name", group.name)
+        performances = Performance.objects.filter(condition)
+        assert str(performances.query).count("IN (SELECT") == 2
+        assert list(performances) == [card.performances.get(owner=user)]
+        with pytest.raises(ValueError):
+            get_search_condition(Performance, "card__front_text__name", "question")
+
+    def test_user_prefix_search(self, admin_client, user: User):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performances = self.search(
+            admin_client,
+            "admin:flashcards_performance_changelist",
+            user.username[:3].upper(),
+        )
+        assert card.performances.get(owner=user) in performances
+        assert (
+            self.search(
+                admin_client,
+                "admin:flashcards_performance_changelist",
+                "zz" + user.username,
+            )
+            == []
+        )
+
+        response = admin_client.get(
+            reverse("admin:users_user_autocomplete"), {"term": user.username[:3]}
+        )
+        assert str(user.pk) in [result["id"] for result in response.json()["results"]]
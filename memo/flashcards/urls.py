@@ -2,9 +2,12 @@ from django.urls import path
 
 from memo.flashcards.views import (  # performance_update_view, card_delete_view,    card_update_view,
     brain_gain_view,
+    cache_stats_view,
     card_create_view,
     card_update_delete_view,
     performance_update_view,
+    review_history_view,
+    statistics_view,
     topic_create_view,
     topic_update_delete_view,
 )
@@ -50,4 +53,22 @@ urlpatterns = [
         view=performance_update_view,
         name="performance_update_view",
     ),
+    # Learning statistics
+    path(
+        "statistics",
+        view=statistics_view,
+        name="statistics_view",
+    ),
+    # Review history export (NDJSON)
+    path(
+        "history/export",
+        view=review_history_view,
+        name="review_history_view",
+    ),
+    # Cache statistics (staff)
+    path(
+        "manage/cache-stats",
+        view=cache_stats_view,
+        name="cache_stats_view",
+    ),
 ]
@@ -1,19 +1,35 @@
-import rules
+import datetime
+import json
+
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.urls import reverse, reverse_lazy  # what is the difference?
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.decorators import method_decorator
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import (  # DetailView, ListView;DeleteView,UpdateView,
     CreateView,
     FormView,
+    TemplateView,
     UpdateView,
+    View,
 )
+from flashcards.analytics import NO_TOPIC, ReviewHistory
 from flashcards.forms import BrainGainForm, CardForm, PerformanceForm, TopicForm
-from flashcards.models import Card, Performance, Topic
-from studygroups.models import StudyGroup
-from utils.views import CustomRulesPermissionRequiredMixin
+from flashcards.models import Card, DailyStudyStats, Performance, Topic
+from studygroups.models import Membership, StudyGroup
+from studygroups.permissions import check_group_rule
+from utils.cache import get_cache_stats
+from utils.views import CustomRulesPermissionRequiredMixin, parse_uuid
 
 # from django.shortcuts import render
 
@@ -25,21 +41,23 @@ class CreateTopicView(CustomRulesPermissionRequiredMixin, CreateView):
     permission_required = "studygroups.manage_studygroup_topic"
     template_name = "flashcards/topic_create_form.html"
 
+    def get_group(self):
+        return self.memoize(
+            "group",
+            lambda: StudyGroup.objects.get(unique_id=self.kwargs["unique_group_id"]),
+        )
+
     def get_permission_object(self):
-        return StudyGroup.objects.get(
-            unique_id=self.kwargs["unique_group_id"]
-        ).membership_for(self.request.user)
+        return self.get_membership(self.get_group())
 
     def get_initial(self):
         return {
             "creator": self.request.user,
-            "group": StudyGroup.objects.get(unique_id=self.kwargs["unique_group_id"]),
+            "group": self.get_group(),
         }
 
     def get_success_url(self):
-        return StudyGroup.objects.get(
-            unique_id=self.kwargs["unique_group_id"]
-        ).get_absolute_url()
+        return self.get_group().get_absolute_url()
 
 
 topic_create_view = CreateTopicView.as_view()
@@ -54,8 +72,11 @@ class UpdateDeleteTopicView(CustomRulesPermissionRequiredMixin, UpdateView):
     permission_required = "studygroups.manage_studygroup_topic"
     template_name = "flashcards/topic_update_form.html"
 
+    def get_queryset(self):
+        return super().get_queryset().select_related("group")
+
     def get_permission_object(self):
-        return self.get_object().group.membership_for(self.request.user)
+        return self.get_membership(self.get_object().group)
 
     def form_valid(self, form):
         if "delete" in form.data:
@@ -115,12 +136,15 @@ class UpdateDeleteCardView(CustomRulesPermissionRequiredMixin, UpdateView):
     permission_required = "studygroups.manage_studygroup_card"
     template_name = "flashcards/card_update_form.html"
 
+    def get_queryset(self):
+        return super().get_queryset().select_related("group")
+
     def get_permission_object(self):
-        return self.get_object().group.membership_for(self.request.user)
+        return self.get_membership(self.get_object().group)
 
     def form_valid(self, form):
         if "delete" in form.data:
-            if rules.test_rule(
+            if check_group_rule(
                 "can_delete_card", self.request.user, self.get_permission_object()
             ):
                 self.object = self.get_object()
@@ -279,3 +303,122 @@ class BrainGainView(FormView):
 
 
 brain_gain_view = BrainGainView.as_view()
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class CacheStatsView(View):
+    """Hit rates of the card tile and api payload caches (staff only)"""
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(
+            {
+                "card_tile": get_cache_stats("card_tile"),
+                "api_payload": get_cache_stats("api_payload"),
+            }
+        )
+
+
+cache_stats_view = CacheStatsView.as_view()
+
+
+def parse_history_bound(value):
+    # returns the naive local datetime of an ISO date or datetime (None if empty)
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError("Invalid date: %s" % value)
+        moment = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_aware(moment):
+        moment = timezone.make_naive(moment)
+    return moment
+
+
+@method_decorator(login_required, name="dispatch")
+class ReviewHistoryView(View):
+    """
+    The user's review history as NDJSON (one JSON object per line)
+    GET ?since=<date or datetime>&until=<date or datetime (exclusive)>
+    Streamed from a server side cursor, so memory stays constant.
+    """
+
+    def get(self, request, *args, **kwargs):
+        # invalid bounds are answered before the streaming response starts
+        try:
+            since = parse_history_bound(request.GET.get("since"))
+            until = parse_history_bound(request.GET.get("until"))
+            history = Performance.objects.iter_review_history(
+                request.user, since=since, until=until
+            )
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        response = StreamingHttpResponse(
+            (json.dumps(point, cls=DjangoJSONEncoder) + "\n" for point in history),
+            content_type="application/x-ndjson",
+        )
+        response["Content-Disposition"] = 'attachment; filename="review-history.ndjson"'
+        return response
+
+
+review_history_view = ReviewHistoryView.as_view()
+
+
+@method_decorator(login_required, name="dispatch")
+class StatisticsView(TemplateView):
+    """Learning statistics of the user (all groups or ?group=<unique_id>)"""
+
+    template_name = "flashcards/statistics_view.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user = self.request.user
+        groups = StudyGroup.objects.filter(
+            pk__in=Membership.objects.get_approved_group_ids(user)
+        ).order_by("name")
+        # malformed or missing ?group=: all groups
+        group = groups.filter(
+            unique_id=parse_uuid(self.request.GET.get("group"))
+        ).first()
+        performances = Performance.objects.filter(
+            owner=user, card__group__in=[group] if group else groups
+        )
+        history = ReviewHistory.load(performances)
+        mastery = history.topic_mastery()
+        topics = Topic.objects.in_bulk(list(mastery))
+        current_streak, longest_streak = history.streaks(timezone.localdate())
+        days = list(DailyStudyStats.objects.per_day(user, [group] if group else groups))
+        context.update(
+            {
+                "groups": groups,
+                "group": group,
+                "reviews": len(history),
+                "score": history.score(),
+                "current_streak": current_streak,
+                "longest_streak": longest_streak,
+                "total_minutes": sum(day["seconds"] for day in days) // 60,
+                "recent_days": [
+                    (
+                        day["date"],
+                        day["reviews"],
+                        day["correct"] * 100 // day["reviews"],
+                        day["seconds"] // 60,
+                    )
+                    for day in days[-14:]
+                ],
+                "retention_curve": history.retention_curve(),
+                "topic_mastery": [
+                    (
+                        topics.get(topic_id) if topic_id != NO_TOPIC else None,
+                        cards,
+                        mastered,
+                    )
+                    for topic_id, (cards, mastered) in mastery.items()
+                ],
+            }
+        )
+        return context
+
+
+statistics_view = StatisticsView.as_view()
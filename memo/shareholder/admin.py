@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import StringAgg
 from shareholder.models import Assignment, Review, Task
 
 User = get_user_model()
@@ -15,6 +16,9 @@ class AssignmentsInline(admin.TabularInline):
     extra = 0
     fields = ("collaborator", "workload_share", "notes")
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("collaborator", "task")
+
 
 class ReviewInline(admin.StackedInline):
     model = Review
@@ -29,6 +33,10 @@ class ReviewInline(admin.StackedInline):
         ("workload", "start_date", "closing_date"),
     )
 
+    def get_queryset(self, request):
+        # start_date, closing_date and __str__ read the task
+        return super().get_queryset(request).select_related("reviewer", "task")
+
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
@@ -45,6 +53,7 @@ class TaskAdmin(admin.ModelAdmin):
     )
     list_editable = ("status",)
     list_display_links = ("title",)
+    list_select_related = ("creator",)
     list_filter = ("status",)
     readonly_fields = [
         "id",
@@ -103,14 +112,27 @@ class TaskAdmin(admin.ModelAdmin):
         ),
     )
 
+    def get_queryset(self, request):
+        # Usernames of the assignments aggregated in the list query
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                workforce=StringAgg(
+                    "assignments__collaborator__username",
+                    delimiter=", ",
+                    distinct=True,
+                    ordering="assignments__collaborator__username",
+                )
+            )
+        )
+
     def get_assigned_shareholder(self, obj):
         # PR-060421: display assignments usernames
-        workforce = ""
-        for assignment in obj.assignments.all():
-            workforce += assignment.collaborator.username + ", "
-        return workforce  # trip_tags(obj.card.front_text)[:30]
+        return obj.workforce or ""
 
     get_assigned_shareholder.short_description = "Workforce"
+    get_assigned_shareholder.admin_order_field = "workforce"
 
     def get_form(self, request, obj=None, **kwargs):
         # PR-060421: set datetime by default
@@ -124,7 +146,7 @@ class TaskAdmin(admin.ModelAdmin):
     def changelist_view(self, request, extra_context=None):
         # PR-060421: Make default list filter set to 'active' per default
         # See: https://stackoverflow.com/a/3783930/2257930
-        test = request.META["HTTP_REFERER"].split(request.META["PATH_INFO"])
+        test = request.META.get("HTTP_REFERER", "").split(request.META["PATH_INFO"])
         if test[-1] and not test[-1].startswith("?"):
             if "status__exact" not in request.GET:
                 q = request.GET.copy()
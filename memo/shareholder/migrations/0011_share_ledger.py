@@ -0,0 +1,93 @@
+# Generated by Django 3.0.11 on 2026-10-19 17:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def book_completed_tasks(apps, schema_editor):
+    # Opening entries: the shares of the tasks completed so far
+    from decimal import Decimal
+
+    from django.utils import timezone
+
+    Task = apps.get_model('shareholder', 'Task')
+    ShareLedgerEntry = apps.get_model('shareholder', 'ShareLedgerEntry')
+    entries = []
+    for task in Task.objects.filter(status='completed').prefetch_related('assignments', 'reviews'):
+        booked_on = timezone.localdate(task.closing_date)
+        assignments = list(task.assignments.all())
+        total = sum(assignment.workload_share for assignment in assignments)
+        for assignment in assignments:
+            shares = (task.workload * assignment.workload_share / total).quantize(Decimal('0.0001'))
+            entries.append(ShareLedgerEntry(
+                shareholder_id=assignment.collaborator_id, task=task, kind='task', shares=shares, booked_on=booked_on
+            ))
+        for review in task.reviews.all():
+            entries.append(ShareLedgerEntry(
+                shareholder_id=review.reviewer_id, task=task, kind='review', shares=review.workload, booked_on=booked_on
+            ))
+    ShareLedgerEntry.objects.bulk_create([entry for entry in entries if entry.shares])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('shareholder', '0010_dividends_incomeperiod'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='incomeperiod',
+            name='total_shares',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, help_text='Shares booked in the period (derived from the share ledger)', max_digits=12, verbose_name='Total Shares at reporting time'),
+        ),
+        migrations.CreateModel(
+            name='ShareLedgerEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task', 'Task'), ('review', 'Review')], help_text="Shares for the task's work or its review", max_length=20, verbose_name='Kind')),
+                ('shares', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Shares')),
+                ('booked_on', models.DateField(verbose_name='Booked on')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('shareholder', models.ForeignKey(help_text='Shareholder of the shares', on_delete=django.db.models.deletion.CASCADE, related_name='share_ledger_entries', to=settings.AUTH_USER_MODEL)),
+                ('task', models.ForeignKey(db_constraint=False, help_text='Task the shares are granted for', on_delete=django.db.models.deletion.DO_NOTHING, related_name='share_ledger_entries', to='shareholder.Task')),
+            ],
+            options={
+                'verbose_name': 'Share Ledger Entry',
+                'verbose_name_plural': 'Share Ledger',
+                'ordering': ('booked_on', 'pk'),
+            },
+        ),
+        migrations.CreateModel(
+            name='ShareBalanceSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Year')),
+                ('month', models.PositiveSmallIntegerField(choices=[(1, 'January'), (2, 'February'), (3, 'March'), (4, 'April'), (5, 'May'), (6, 'June'), (7, 'Juli'), (8, 'August'), (9, 'September'), (10, 'October'), (11, 'November'), (12, 'December')], verbose_name='Month')),
+                ('balance', models.DecimalField(decimal_places=4, help_text='Shares held at the end of the month', max_digits=12, verbose_name='Balance')),
+                ('period_shares', models.DecimalField(decimal_places=4, help_text='Shares booked in the month', max_digits=12, verbose_name='Period Shares')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('shareholder', models.ForeignKey(help_text='Shareholder of the shares', on_delete=django.db.models.deletion.CASCADE, related_name='share_balance_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Share Balance Snapshot',
+                'verbose_name_plural': 'Share Balance Snapshots',
+                'ordering': ('-year', '-month', '-balance'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shareledgerentry',
+            index=models.Index(fields=['booked_on', 'shareholder'], name='ledger_booked_on_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shareledgerentry',
+            index=models.Index(fields=['task', 'shareholder'], name='ledger_task_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sharebalancesnapshot',
+            unique_together={('shareholder', 'year', 'month')},
+        ),
+        migrations.RunPython(book_completed_tasks, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
-from datetime import timedelta
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from utils.abstract_models import TimestampMixin, UUIDMixin
 
@@ -28,6 +32,9 @@ REVIEW_RATING = (
 )
 TASK_STANDARD_WORKLOAD = 1.0
 REVIEW_RATING_STANDARD_WORKLOAD = 0.5
+# shares and amounts are stored with two decimals
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
 
 
 class Task(UUIDMixin, TimestampMixin, models.Model):
@@ -101,6 +108,15 @@ class Task(UUIDMixin, TimestampMixin, models.Model):
     def __str__(self):
         return "%s" % (self.title)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembers the loaded closing date (a moved task is booked again)
+        loaded = dict(zip(field_names, values))
+        if "closing_date" in loaded:
+            instance.loaded_closing_date = loaded["closing_date"]
+        return instance
+
 
 class Assignment(UUIDMixin, TimestampMixin, models.Model):
     """
@@ -238,6 +254,11 @@ MONTH_CHOICE = (
 )
 
 
+def month_range(year, month):
+    # returns the first day of the month and of the next month
+    return date(year, month, 1), date(year + month // 12, month % 12 + 1, 1)
+
+
 class IncomePeriod(UUIDMixin, TimestampMixin, models.Model):
     class Meta:
         verbose_name = _("Income Period")
@@ -267,11 +288,125 @@ class IncomePeriod(UUIDMixin, TimestampMixin, models.Model):
 
     total_shares = models.DecimalField(
         _("Total Shares at reporting time"),
+        help_text=_("Shares booked in the period (derived from the share ledger)"),
         max_digits=12,
         decimal_places=2,
         default=0.0,
+        editable=False,
     )
 
+    def __str__(self):
+        return "%s/%s" % (self.month, self.year)
+
+    def get_date_range(self):
+        # returns the (start, end) datetimes of the period's month (end exclusive)
+        start, end = month_range(self.year, self.month)
+        return (
+            timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(end, time.min)),
+        )
+
+    def get_tasks(self):
+        # returns the tasks completed in the period (by their closing date)
+        start, end = self.get_date_range()
+        return Task.objects.filter(
+            status="completed", closing_date__gte=start, closing_date__lt=end
+        )
+
+
+def allocate(amount, weights):
+    """Splits amount proportionally to weights ({key: weight}) in cents
+    The cents lost by rounding down go to the largest remainders, so the
+    parts add up to amount (all 0 if the weights are 0); weights must not be
+    negative.
+    """
+    total = sum(weights.values(), ZERO)
+    if not total:
+        return {key: ZERO for key in weights}
+    cents = int(amount / CENT)
+    exact = {key: cents * weight / total for key, weight in weights.items()}
+    parts = {key: int(value) for key, value in exact.items()}
+    missing = cents - sum(parts.values())
+    for key in sorted(exact, key=lambda key: (parts[key] - exact[key], key))[:missing]:
+        parts[key] += 1
+    return {key: part * CENT for key, part in parts.items()}
+
+
+class DividendsManager(models.Manager):
+    def compute(self, income_period):
+        """Computes the dividends of income_period
+        Every shareholder gets the task and review shares booked in the
+        period (see ShareLedgerEntry) and a part of its surplus_total
+        proportional to them (nothing for negative period shares, see
+        ShareLedgerManager.book). The dividends are created or updated in bulk in
+        one transaction; running it again gives the same rows. The balance
+        snapshot of the period's month is taken along.
+        """
+        with transaction.atomic():
+            # serializes concurrent computations of the period
+            period = IncomePeriod.objects.select_for_update().get(pk=income_period.pk)
+            ShareLedgerEntry.objects.book(
+                period.get_tasks().values_list("pk", flat=True)
+            )
+            start, end = month_range(period.year, period.month)
+            booked = ShareLedgerEntry.objects.get_shares(start, end)
+            task_shares = {
+                pk: shares for (pk, kind), shares in booked.items() if kind == "task"
+            }
+            review_shares = {
+                pk: shares for (pk, kind), shares in booked.items() if kind == "review"
+            }
+            existing = {
+                dividend.shareholder_id: dividend
+                for dividend in self.filter(income_period=period)
+            }
+            shareholder_ids = (
+                set(
+                    User.objects.filter(
+                        groups__name=SHAREHOLDER_PERM_GROUP
+                    ).values_list("pk", flat=True)
+                )
+                | set(task_shares)
+                | set(review_shares)
+                | set(existing)
+            )
+            shares = {
+                pk: (
+                    task_shares.get(pk, ZERO).quantize(CENT),
+                    review_shares.get(pk, ZERO).quantize(CENT),
+                )
+                for pk in shareholder_ids
+            }
+            # corrections can outweigh the shares booked in the period: the
+            # shareholder gets no part of it then
+            weights = {
+                pk: max(task + review, ZERO) for pk, (task, review) in shares.items()
+            }
+            amounts = allocate(period.surplus_total, weights)
+            now = timezone.now()
+            created, updated = [], []
+            for pk in sorted(shareholder_ids):
+                dividend = existing.get(pk)
+                if dividend is None:
+                    dividend = Dividends(shareholder_id=pk, income_period=period)
+                    created.append(dividend)
+                else:
+                    updated.append(dividend)
+                dividend.task_share, dividend.review_share = shares[pk]
+                dividend.amount = amounts[pk]
+                dividend.updated_at = now
+            self.bulk_create(created)
+            self.bulk_update(
+                updated, ["task_share", "review_share", "amount", "updated_at"]
+            )
+            total_shares = sum(weights.values(), ZERO)
+            IncomePeriod.objects.filter(pk=period.pk).update(
+                total_shares=total_shares, updated_at=now
+            )
+            ShareBalanceSnapshot.objects.take(period.year, period.month)
+        income_period.total_shares = total_shares
+        return created + updated
+
 
 class Dividends(UUIDMixin, TimestampMixin, models.Model):
     class Meta:
@@ -318,3 +453,258 @@ class Dividends(UUIDMixin, TimestampMixin, models.Model):
         decimal_places=2,
         default=0.0,
     )
+
+    objects = DividendsManager()
+
+    def __str__(self):
+        return "%s: %s" % (self.shareholder, self.amount)
+
+
+LEDGER_KINDS = (
+    ("task", _("Task")),
+    ("review", _("Review")),
+)
+# ledger entries keep the shares of split workloads more precisely
+SHARE_PRECISION = Decimal("0.0001")
+
+
+class ShareLedgerManager(models.Manager):
+    def get_current_shares(self, task_ids):
+        """Returns {(task id, shareholder id, kind): shares} granted by the
+        completed tasks of task_ids (one query for assignments and reviews each)
+        The workload of a task is split by the workload shares of its
+        assignments; reviewers get the workload of their review.
+        """
+        tasks = Task.objects.filter(pk__in=task_ids, status="completed")
+        task_share_total = Subquery(
+            Assignment.objects.filter(task=OuterRef("task"))
+            .order_by()
+            .values("task")
+            .annotate(total=Sum("workload_share"))
+            .values("total")
+        )
+        task_share = ExpressionWrapper(
+            F("task__workload") * F("workload_share") / task_share_total,
+            output_field=DecimalField(),
+        )
+        assignments = (
+            Assignment.objects.filter(task__in=tasks)
+            .annotate(shares=task_share)
+            .values_list("task", "collaborator", "shares")
+        )
+        reviews = Review.objects.filter(task__in=tasks).values_list(
+            "task", "reviewer", "workload"
+        )
+        shares = {}
+        for kind, rows in (("task", assignments), ("review", reviews)):
+            for task_id, shareholder_id, value in rows:
+                shares[(task_id, shareholder_id, kind)] = value
+        return shares
+
+    def get_booked_shares(self, task_ids):
+        # returns {(task id, shareholder id, kind): shares} booked for task_ids
+        rows = (
+            self.filter(task_id__in=task_ids)
+            .order_by()
+            .values("task", "shareholder", "kind")
+            .annotate(shares=Sum("shares"))
+            .values_list("task", "shareholder", "kind", "shares")
+        )
+        return {
+            (task, shareholder, kind): shares
+            for task, shareholder, kind, shares in rows
+        }
+
+    def book(self, task_ids, moved_task_ids=()):
+        """Appends the entries that bring the booked shares of task_ids to the
+        shares they grant now; returns the new entries.
+        Entries are booked on the day they are made (e.g. a task's completion,
+        a changed workload, a reverted completion or a deleted task), the
+        first entries of a task on its closing date if that is still to come.
+        Nothing is ever booked before today, so the months whose dividends and
+        snapshots are taken never change.
+        moved_task_ids: tasks whose closing date changed; their booked shares
+        are reversed today and booked again for the new closing date.
+        """
+        task_ids = list(task_ids)
+        with transaction.atomic():
+            # serializes concurrent bookings of the tasks
+            closing_dates = dict(
+                Task.objects.select_for_update()
+                .filter(pk__in=task_ids)
+                .values_list("pk", "closing_date")
+            )
+            current = self.get_current_shares(task_ids)
+            booked = self.get_booked_shares(task_ids)
+            booked_task_ids = {task_id for task_id, _, _ in booked}
+            today = timezone.localdate()
+            entries = []
+            for key in sorted(set(current) | set(booked)):
+                task_id, shareholder_id, kind = key
+                shares = current.get(key, ZERO).quantize(SHARE_PRECISION)
+                if task_id not in booked_task_ids or task_id in moved_task_ids:
+                    # a new or moved task: (re)booked for its closing date
+                    closing_day = timezone.localdate(closing_dates[task_id])
+                    deltas = [
+                        (-booked.get(key, ZERO), today),
+                        (shares, max(closing_day, today)),
+                    ]
+                else:
+                    deltas = [(shares - booked.get(key, ZERO), today)]
+                entries.extend(
+                    ShareLedgerEntry(
+                        task_id=task_id,
+                        shareholder_id=shareholder_id,
+                        kind=kind,
+                        shares=delta,
+                        booked_on=booked_on,
+                    )
+                    for delta, booked_on in deltas
+                    if delta
+                )
+            return self.bulk_create(entries)
+
+    def get_shares(self, start=None, end=None):
+        # returns {(shareholder id, kind): shares} booked from start until end
+        # (dates, end exclusive) in one range sum
+        entries = self.all()
+        if start:
+            entries = entries.filter(booked_on__gte=start)
+        if end:
+            entries = entries.filter(booked_on__lt=end)
+        rows = (
+            entries.order_by()
+            .values("shareholder", "kind")
+            .annotate(shares=Sum("shares"))
+            .values_list("shareholder", "kind", "shares")
+        )
+        return {(shareholder, kind): shares for shareholder, kind, shares in rows}
+
+    def get_balances(self, until):
+        # returns {shareholder id: shares} held as of until (date, exclusive)
+        balances = defaultdict(lambda: ZERO)
+        for (shareholder_id, kind), shares in self.get_shares(end=until).items():
+            balances[shareholder_id] += shares
+        return dict(balances)
+
+
+class ShareLedgerEntry(models.Model):
+    """
+    Shares booked for a shareholder (append only)
+    Completing a task books the shares of its assignments and reviews;
+    later changes append correcting entries, so the balance of a shareholder
+    at any date is the sum of the entries booked before.
+    """
+
+    class Meta:
+        verbose_name = _("Share Ledger Entry")
+        verbose_name_plural = _("Share Ledger")
+        ordering = ("booked_on", "pk")
+        indexes = [
+            models.Index(
+                name="ledger_booked_on_idx", fields=["booked_on", "shareholder"]
+            ),
+            models.Index(name="ledger_task_idx", fields=["task", "shareholder"]),
+        ]
+
+    shareholder = models.ForeignKey(
+        User,
+        help_text=_("Shareholder of the shares"),
+        related_name="share_ledger_entries",
+        on_delete=models.CASCADE,
+    )
+    # the entries of deleted tasks stay in the ledger (no constraint)
+    task = models.ForeignKey(
+        Task,
+        help_text=_("Task the shares are granted for"),
+        related_name="share_ledger_entries",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    kind = models.CharField(
+        _("Kind"),
+        help_text=_("Shares for the task's work or its review"),
+        max_length=20,
+        choices=LEDGER_KINDS,
+    )
+    shares = models.DecimalField(_("Shares"), max_digits=12, decimal_places=4)
+    booked_on = models.DateField(_("Booked on"))
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+
+    objects = ShareLedgerManager()
+
+    def __str__(self):
+        return "%s: %s %s" % (self.booked_on, self.shareholder, self.shares)
+
+
+class ShareBalanceSnapshotManager(models.Manager):
+    def take(self, year, month):
+        """Stores the balance of every shareholder as of the end of the month
+        and the shares booked in the month; taking it again replaces the rows
+        """
+        start, end = month_range(year, month)
+        balances = ShareLedgerEntry.objects.get_balances(end)
+        booked = defaultdict(lambda: ZERO)
+        for (shareholder_id, kind), shares in ShareLedgerEntry.objects.get_shares(
+            start, end
+        ).items():
+            booked[shareholder_id] += shares
+        with transaction.atomic():
+            self.filter(year=year, month=month).delete()
+            return self.bulk_create(
+                [
+                    ShareBalanceSnapshot(
+                        shareholder_id=shareholder_id,
+                        year=year,
+                        month=month,
+                        balance=balance,
+                        period_shares=booked[shareholder_id],
+                    )
+                    for shareholder_id, balance in sorted(balances.items())
+                ]
+            )
+
+    def get_balances(self, year, month):
+        # returns {shareholder id: balance} of the month's snapshot
+        return dict(
+            self.filter(year=year, month=month).values_list("shareholder", "balance")
+        )
+
+
+class ShareBalanceSnapshot(models.Model):
+    """
+    Shares held by a shareholder at the end of a month (from the ledger)
+    """
+
+    class Meta:
+        verbose_name = _("Share Balance Snapshot")
+        verbose_name_plural = _("Share Balance Snapshots")
+        ordering = ("-year", "-month", "-balance")
+        unique_together = ("shareholder", "year", "month")
+
+    shareholder = models.ForeignKey(
+        User,
+        help_text=_("Shareholder of the shares"),
+        related_name="share_balance_snapshots",
+        on_delete=models.CASCADE,
+    )
+    year = models.PositiveSmallIntegerField(_("Year"))
+    month = models.PositiveSmallIntegerField(_("Month"), choices=MONTH_CHOICE)
+    balance = models.DecimalField(
+        _("Balance"),
+        help_text=_("Shares held at the end of the month"),
+        max_digits=12,
+        decimal_places=4,
+    )
+    period_shares = models.DecimalField(
+        _("Period Shares"),
+        help_text=_("Shares booked in the month"),
+        max_digits=12,
+        decimal_places=4,
+    )
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+
+    objects = ShareBalanceSnapshotManager()
+
+    def __str__(self):
+        return "%s/%s: %s %s" % (self.month, self.year, self.shareholder, self.balance)
@@ -1,26 +1,39 @@
-# from django.db.models.signals import post_save
-# from django.dispatch import receiver
-from django.contrib.auth import get_user_model
-from shareholder.models import SHAREHOLDER_PERM_GROUP, Dividends  # IncomePeriod
-
-User = get_user_model()
-
-
-# IncomePeriod CREATION (post save)
-# @receiver(post_save, sender=IncomePeriod)
-def income_period_created(sender, instance, **kwargs):
-    if kwargs["created"]:
-        for shareholder in User.objects.filter(groups_in=SHAREHOLDER_PERM_GROUP):
-            d, c = Dividends.objects.get_or_create(
-                shareholder=shareholder, income_period=instance
-            )
-
-
-# Dividends CREATION (post save)
-# @receiver(post_save, sender=Dividends)
-def dividend_created(sender, instance, **kwargs):
-    if kwargs["created"]:
-        for task in instance.shareholder.assignments.filter(""):
-            pass
-        for review in instance.shareholder.reviews_made.all():
-            pass
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from shareholder.models import (
+    Assignment,
+    Dividends,
+    IncomePeriod,
+    Review,
+    ShareLedgerEntry,
+    Task,
+)
+
+
+# IncomePeriod CHANGES (post save): (re)computes the dividends of the period
+@receiver(post_save, sender=IncomePeriod)
+def income_period_saved(sender, instance, **kwargs):
+    Dividends.objects.compute(instance)
+
+
+# TASK CHANGES (post save & delete): books the changed shares in the ledger,
+# a changed closing date moves the booked shares
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, **kwargs):
+    loaded = getattr(instance, "loaded_closing_date", instance.closing_date)
+    moved = [instance.pk] if loaded != instance.closing_date else []
+    ShareLedgerEntry.objects.book([instance.pk], moved_task_ids=moved)
+    instance.loaded_closing_date = instance.closing_date
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    ShareLedgerEntry.objects.book([instance.pk])
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def task_contribution_changed(sender, instance, **kwargs):
+    ShareLedgerEntry.objects.book([instance.task_id])
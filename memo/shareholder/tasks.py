@@ -0,0 +1,16 @@
+import datetime
+
+from django.utils import timezone
+from shareholder.models import ShareBalanceSnapshot
+
+from config import celery_app
+
+
+@celery_app.task()
+def take_share_snapshots():
+    """Takes the share balance snapshots of the current and the last month."""
+    today = timezone.localdate()
+    last_month = today.replace(day=1) - datetime.timedelta(days=1)
+    snapshots = ShareBalanceSnapshot.objects.take(today.year, today.month)
+    snapshots += ShareBalanceSnapshot.objects.take(last_month.year, last_month.month)
+    return len(snapshots)
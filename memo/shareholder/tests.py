@@ -1,3 +1,274 @@
-# from django.test import TestCase
+import datetime
+from decimal import Decimal
 
-# Create your tests here.
+import pytest
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from shareholder.models import (
+    SHAREHOLDER_PERM_GROUP,
+    Assignment,
+    Dividends,
+    IncomePeriod,
+    Review,
+    ShareBalanceSnapshot,
+    ShareLedgerEntry,
+    Task,
+)
+
+from memo.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def create_task(creator, workload, closing_date, status="completed"):
+    closing_date = timezone.make_aware(closing_date)
+    return Task.objects.create(
+        creator=creator,
+        status=status,
+        workload=workload,
+        start_date=closing_date - datetime.timedelta(days=5),
+        closing_date=closing_date,
+        description="Task",
+    )
+
+
+@pytest.fixture
+def set_today(monkeypatch):
+    # sets the day of timezone.localdate(), the booking day of the ledger
+    localdate = timezone.localdate
+
+    def set_today(day):
+        monkeypatch.setattr(
+            timezone,
+            "localdate",
+            lambda value=None, **kwargs: localdate(value, **kwargs) if value else day,
+        )
+
+    return set_today
+
+
+class TestDividends:
+    def dividends(self, period):
+        return [
+            (d.shareholder, d.task_share, d.review_share, d.amount)
+            for d in Dividends.objects.filter(income_period=period).order_by(
+                "shareholder"
+            )
+        ]
+
+    def test_computed_for_period(self, set_today):
+        group = Group.objects.create(name=SHAREHOLDER_PERM_GROUP)
+        a, b, c, idle = UserFactory.create_batch(4)
+        group.user_set.add(a, b, c, idle)
+        set_today(datetime.date(2021, 5, 20))
+        task = create_task(a, "2.00", datetime.datetime(2021, 5, 15), status="review")
+        Assignment.objects.create(task=task, collaborator=a, workload_share=100)
+        Assignment.objects.create(task=task, collaborator=b, workload_share=100)
+        Review.objects.create(task=task, reviewer=c, rating="well", workload="0.50")
+        half = create_task(
+            a, "2.00", datetime.datetime(2021, 5, 31, 23), status="review"
+        )
+        Assignment.objects.create(task=half, collaborator=a, workload_share=50)
+        Assignment.objects.create(task=half, collaborator=b, workload_share=50)
+        for other in (
+            create_task(a, "5.00", datetime.datetime(2021, 6, 1, 1)),
+            create_task(a, "5.00", datetime.datetime(2021, 5, 20), status="working"),
+        ):
+            Assignment.objects.create(task=other, collaborator=a)
+        for completed in (task, half):
+            completed.status = "completed"
+            completed.save()
+
+        period = IncomePeriod.objects.create(
+            year=2021, month=5, surplus_total=Decimal("100.00")
+        )
+        expected = [
+            (a, Decimal("2.00"), Decimal("0.00"), Decimal("40.00")),
+            (b, Decimal("2.00"), Decimal("0.00"), Decimal("40.00")),
+            (c, Decimal("0.00"), Decimal("0.50"), Decimal("10.00")),
+            (idle, Decimal("0.00"), Decimal("0.00"), Decimal("0.00")),
+        ]
+        assert period.total_shares == Decimal("4.50")
+        assert self.dividends(period) == [
+            (a, Decimal("2.00"), Decimal("0.00"), Decimal("44.45")),
+            (b, Decimal("2.00"), Decimal("0.00"), Decimal("44.44")),
+            (c, Decimal("0.00"), Decimal("0.50"), Decimal("11.11")),
+            (idle, Decimal("0.00"), Decimal("0.00"), Decimal("0.00")),
+        ]
+
+        period.surplus_total = Decimal("90.00")
+        period.save()
+        assert self.dividends(period) == expected
+        Dividends.objects.compute(period)
+        assert self.dividends(period) == expected
+
+    def test_negative_period_shares(self, set_today):
+        a, b = UserFactory.create_batch(2)
+        set_today(datetime.date(2021, 5, 20))
+        task = create_task(a, "4.00", datetime.datetime(2021, 5, 15), status="review")
+        Assignment.objects.create(task=task, collaborator=a, workload_share=50)
+        Assignment.objects.create(task=task, collaborator=b, workload_share=50)
+        task.status = "completed"
+        task.save()
+
+        # b's correction in june outweighs b's shares booked in june
+        set_today(datetime.date(2021, 6, 10))
+        Assignment.objects.filter(task=task, collaborator=b).delete()
+        other = create_task(a, "1.00", datetime.datetime(2021, 6, 5), status="review")
+        Assignment.objects.create(task=other, collaborator=b)
+        other.status = "completed"
+        other.save()
+        period = IncomePeriod.objects.create(
+            year=2021, month=6, surplus_total=Decimal("100.00")
+        )
+        assert period.total_shares == Decimal("2.00")
+        assert self.dividends(period) == [
+            (a, Decimal("2.00"), Decimal("0.00"), Decimal("100.00")),
+            (b, Decimal("-1.00"), Decimal("0.00"), Decimal("0.00")),
+        ]
+
+
+class TestShareLedger:
+    def test_booked_and_corrected(self, set_today):
+        a, b = UserFactory.create_batch(2)
+        task = create_task(a, "3.00", datetime.datetime(2021, 5, 15), status="review")
+        Assignment.objects.create(task=task, collaborator=a, workload_share=100)
+        Assignment.objects.create(task=task, collaborator=b, workload_share=50)
+        Review.objects.create(task=task, reviewer=b, rating="well", workload="0.50")
+        assert not ShareLedgerEntry.objects.exists()
+
+        set_today(datetime.date(2021, 5, 20))
+        task.status = "completed"
+        task.save()
+        june = datetime.date(2021, 6, 1)
+        assert ShareLedgerEntry.objects.get_balances(june) == {
+            a.pk: Decimal("2.0000"),
+            b.pk: Decimal("1.5000"),
+        }
+        assert ShareLedgerEntry.objects.get_balances(datetime.date(2021, 5, 20)) == {}
+
+        # corrections are booked on the day they are made
+        set_today(datetime.date(2021, 6, 10))
+        task.workload = Decimal("6.00")
+        task.save()
+        task.save()
+        Review.objects.filter(task=task).delete()
+        assert ShareLedgerEntry.objects.filter(shareholder=a).count() == 2
+        assert ShareLedgerEntry.objects.get_shares(start=june) == {
+            (a.pk, "task"): Decimal("2.0000"),
+            (b.pk, "task"): Decimal("1.0000"),
+            (b.pk, "review"): Decimal("-0.5000"),
+        }
+        assert ShareLedgerEntry.objects.get_balances(datetime.date(2021, 7, 1)) == {
+            a.pk: Decimal("4.0000"),
+            b.pk: Decimal("2.0000"),
+        }
+
+    def test_completed_after_month_closed(self, set_today):
+        a = UserFactory()
+        task = create_task(a, "3.00", datetime.datetime(2021, 5, 15), status="review")
+        Assignment.objects.create(task=task, collaborator=a)
+        ShareBalanceSnapshot.objects.take(2021, 5)
+
+        set_today(datetime.date(2021, 6, 3))
+        task.status = "completed"
+        task.save()
+        june = datetime.date(2021, 6, 1)
+        assert ShareLedgerEntry.objects.get_balances(june) == {}
+        assert ShareLedgerEntry.objects.get_shares(start=june) == {
+            (a.pk, "task"): Decimal("3.0000")
+        }
+
+    def test_edited_after_month_closed(self, set_today):
+        a, b = UserFactory.create_batch(2)
+        task = create_task(a, "3.00", datetime.datetime(2021, 5, 15), status="review")
+        Assignment.objects.create(task=task, collaborator=a, workload_share=100)
+        Assignment.objects.create(task=task, collaborator=b, workload_share=50)
+        set_today(datetime.date(2021, 5, 20))
+        task.status = "completed"
+        task.save()
+        ShareBalanceSnapshot.objects.take(2021, 5)
+
+        set_today(datetime.date(2021, 6, 10))
+        task.workload = Decimal("6.00")
+        task.save()
+        Assignment.objects.filter(task=task, collaborator=b).delete()
+        ShareBalanceSnapshot.objects.take(2021, 5)
+        assert ShareBalanceSnapshot.objects.get_balances(2021, 5) == {
+            a.pk: Decimal("2.0000"),
+            b.pk: Decimal("1.0000"),
+        }
+        assert ShareLedgerEntry.objects.get_balances(datetime.date(2021, 7, 1)) == {
+            a.pk: Decimal("6.0000"),
+            b.pk: Decimal("0.0000"),
+        }
+
+    def test_deleted_completed_task(self, set_today):
+        a, b = UserFactory.create_batch(2)
+        task = create_task(a, "3.00", datetime.datetime(2021, 5, 15), status="review")
+        Assignment.objects.create(task=task, collaborator=a)
+        Review.objects.create(task=task, reviewer=b, rating="well", workload="0.50")
+        set_today(datetime.date(2021, 5, 20))
+        task.status = "completed"
+        task.save()
+
+        set_today(datetime.date(2021, 6, 10))
+        task.delete()
+        june = datetime.date(2021, 6, 1)
+        assert ShareLedgerEntry.objects.get_balances(june) == {
+            a.pk: Decimal("3.0000"),
+            b.pk: Decimal("0.5000"),
+        }
+        assert ShareLedgerEntry.objects.get_balances(datetime.date(2021, 7, 1)) == {
+            a.pk: Decimal("0.0000"),
+            b.pk: Decimal("0.0000"),
+        }
+
+    def test_closing_date_moved(self, set_today):
+        a = UserFactory()
+        set_today(datetime.date(2021, 5, 10))
+        task = create_task(a, "3.00", datetime.datetime(2021, 5, 15), status="review")
+        Assignment.objects.create(task=task, collaborator=a)
+        task.status = "completed"
+        task.save()
+        task = Task.objects.get(pk=task.pk)
+        june, july = datetime.date(2021, 6, 1), datetime.date(2021, 7, 1)
+        assert ShareLedgerEntry.objects.get_balances(june) == {a.pk: Decimal("3.0000")}
+
+        task.closing_date = timezone.make_aware(datetime.datetime(2021, 6, 20))
+        task.save()
+        assert ShareLedgerEntry.objects.get_balances(june) == {a.pk: Decimal("0.0000")}
+        assert ShareLedgerEntry.objects.get_balances(july) == {a.pk: Decimal("3.0000")}
+
+        # a past closing date: the shares stay where they are
+        set_today(datetime.date(2021, 7, 5))
+        task.closing_date = timezone.make_aware(datetime.datetime(2021, 6, 25))
+        task.save()
+        assert ShareLedgerEntry.objects.get_shares(start=july) == {
+            (a.pk, "task"): Decimal("0.0000")
+        }
+        assert ShareLedgerEntry.objects.get_balances(july) == {a.pk: Decimal("3.0000")}
+
+
+class TestTaskAdmin:
+    def changelist_queries(self, client):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse("admin:shareholder_task_changelist"))
+        assert response.status_code == 200
+        return len(context), response
+
+    def test_changelist_query_count(self, admin_client):
+        a, b = UserFactory.create_batch(2)
+        task = create_task(a, "1.00", datetime.datetime(2021, 5, 15))
+        Assignment.objects.create(task=task, collaborator=a)
+        Assignment.objects.create(task=task, collaborator=b)
+        queries, response = self.changelist_queries(admin_client)
+        assert ", ".join(sorted([a.username, b.username])) in response.content.decode()
+
+        for i in range(5):
+            task = create_task(a, "1.00", datetime.datetime(2021, 5, i + 1))
+            Assignment.objects.create(task=task, collaborator=b)
+        assert self.changelist_queries(admin_client)[0] == queries
@@ -8,3 +8,71 @@ temporary_alert_fade_ms = 4500;
 $(".temporary-alert").fadeTo(temporary_alert_fade_ms, 500).slideUp(500, function(){
     $(".alert").slideUp(500);
 });
+
+/*
+Infinite scroll for keyset (cursor) paginated lists:
+When the "More" link of a .js-paginator scrolls into view, the next page is
+fetched and its .js-page-item elements are appended after the last item.
+*/
+function loadNextPage(link) {
+    $(link).closest(".js-paginator").addClass("invisible");
+    $.get(link.href, function(html) {
+        var page = $("<div>").append($.parseHTML(html));
+        $(".js-page-item").last().after(page.find(".js-page-item"));
+        $(".js-paginator").replaceWith(page.find(".js-paginator"));
+        observeNextPage();
+    });
+}
+
+function observeNextPage() {
+    var link = $(".js-next-page").get(0);
+    if (!link || !("IntersectionObserver" in window)) {
+        return;
+    }
+    var observer = new IntersectionObserver(function(entries) {
+        if (entries[0].isIntersecting) {
+            observer.disconnect();
+            loadNextPage(link);
+        }
+    });
+    observer.observe(link);
+}
+
+observeNextPage();
+
+/*
+Activity heatmaps:
+A .js-activity-heatmap element is filled with one cell per day (weeks as
+columns) from the json of its data-url ({"start", "days": [offsets],
+<data-field>: [counts]}), shaded by the count of the day.
+*/
+function renderHeatmap(element, series) {
+    var field = $(element).data("field") || "reviews";
+    var counts = {};
+    var max = 1;
+    $.each(series.days, function(i, offset) {
+        counts[offset] = series[field][i];
+        max = Math.max(max, series[field][i]);
+    });
+    var start = new Date(series.start + "T00:00:00");
+    var today = new Date();
+    var grid = $("<div>").addClass("heatmap");
+    for (var offset = 0, day = new Date(start); day <= today; offset++) {
+        var count = counts[offset] || 0;
+        $("<div>")
+            .addClass("heatmap-day")
+            .css("opacity", count ? 0.25 + 0.75 * count / max : 1)
+            .toggleClass("heatmap-empty", !count)
+            .attr("title", day.toLocaleDateString() + ": " + count)
+            .appendTo(grid);
+        day.setDate(day.getDate() + 1);
+    }
+    $(element).empty().append(grid);
+}
+
+$(".js-activity-heatmap").each(function() {
+    var element = this;
+    $.getJSON($(element).data("url"), function(series) {
+        renderHeatmap(element, series);
+    });
+});
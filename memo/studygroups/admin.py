@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.translation import ugettext_lazy as _
 from flashcards.models import Card, Topic
 from studygroups.models import Membership, StudyGroup
+from utils.admin import IndexedSearchMixin
 
 
 class TopicsInline(admin.TabularInline):
@@ -113,7 +114,7 @@ class StudyGroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Membership)
-class MembershipAdmin(admin.ModelAdmin):
+class MembershipAdmin(IndexedSearchMixin, admin.ModelAdmin):
     save_on_top = True
     list_display = (
         "group",
@@ -135,7 +136,7 @@ class MembershipAdmin(admin.ModelAdmin):
         "updated_at",
     ]
     search_fields = [
-        "group",
-        "member",
+        "group__name",
+        "^member__username",
     ]
     autocomplete_fields = ["group", "member"]
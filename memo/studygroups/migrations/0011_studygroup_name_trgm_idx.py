@@ -0,0 +1,20 @@
+# Generated by Django 3.0.11 on 2026-10-19 09:12
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studygroups', '0010_auto_20210102_0627'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='studygroup',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='studygroup_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
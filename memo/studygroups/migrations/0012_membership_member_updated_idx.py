@@ -0,0 +1,17 @@
+# Generated by Django 3.0.11 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studygroups', '0011_studygroup_name_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['member', 'updated_at', 'id'], name='membership_member_updated_idx'),
+        ),
+    ]
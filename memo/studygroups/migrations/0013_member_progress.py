@@ -0,0 +1,78 @@
+# Generated by Django 3.0.11 on 2026-10-19 17:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, IntegerField, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_member_progress(apps, schema_editor):
+    # One progress row per membership, aggregated from the performances
+    Membership = apps.get_model('studygroups', 'Membership')
+    MemberProgress = apps.get_model('studygroups', 'MemberProgress')
+    Performance = apps.get_model('flashcards', 'Performance')
+    MemberProgress.objects.bulk_create(
+        [
+            MemberProgress(membership_id=pk, group_id=group_id, member_id=member_id)
+            for pk, group_id, member_id in Membership.objects.values_list('pk', 'group_id', 'member_id')
+        ],
+        batch_size=1000,
+    )
+    performances = Performance.objects.filter(
+        owner=OuterRef('member_id'), card__group=OuterRef('group_id')
+    ).order_by().values('owner')
+
+    def aggregate(expression, output_field):
+        return Subquery(performances.annotate(aggregate=expression).values('aggregate'), output_field=output_field)
+
+    MemberProgress.objects.update(
+        cards=Coalesce(aggregate(Count('pk'), IntegerField()), 0),
+        cards_mastered=Coalesce(aggregate(Count('pk', filter=Q(recall_score__gte=80)), IntegerField()), 0),
+        recall_score_total=Coalesce(aggregate(Sum('recall_score'), FloatField()), 0),
+        recall_score=Coalesce(aggregate(Avg('recall_score'), FloatField()), 0),
+        last_active_at=aggregate(
+            Max('updated_at', filter=Q(recall_trials__gt=0) | Q(learn_trials__gt=0)), models.DateTimeField()
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('studygroups', '0012_membership_member_updated_idx'),
+        ('flashcards', '0011_processed_review'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('cards', models.PositiveIntegerField(default=0, verbose_name='Cards')),
+                ('cards_mastered', models.PositiveIntegerField(default=0, verbose_name='Cards mastered')),
+                ('recall_score_total', models.FloatField(default=0, verbose_name='Total recall score')),
+                ('recall_score', models.FloatField(default=0, verbose_name='Average recall score')),
+                ('last_active_at', models.DateTimeField(blank=True, null=True, verbose_name='Last active at')),
+                ('group', models.ForeignKey(help_text='Study Group of the progress', on_delete=django.db.models.deletion.CASCADE, related_name='member_progress', to='studygroups.StudyGroup')),
+                ('member', models.ForeignKey(help_text='User of the progress', on_delete=django.db.models.deletion.CASCADE, related_name='progress', to=settings.AUTH_USER_MODEL)),
+                ('membership', models.OneToOneField(help_text='Membership of the progress', on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='studygroups.Membership')),
+            ],
+            options={
+                'verbose_name': 'Member Progress',
+                'verbose_name_plural': 'Member Progress',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='memberprogress',
+            index=models.Index(fields=['group', '-cards_mastered', '-recall_score'], name='progress_group_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memberprogress',
+            index=models.Index(fields=['member', 'group'], name='progress_member_group_idx'),
+        ),
+        migrations.RunPython(fill_member_progress, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,31 @@
 from ckeditor.fields import RichTextField
+from django.apps import apps
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import (
+    Avg,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    IntegerField,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Coalesce, Greatest
 from django.template.defaultfilters import slugify
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
+from flashcards.analytics import ReviewHistory
 from utils.abstract_models import TimestampMixin, UUIDMixin
+from utils.search import TrigramWordSimilarity, normalize_search_text
 
 User = get_user_model()
 
@@ -15,8 +36,126 @@ STUDYGROUP_ROLES = (
 )
 
 
+# Directory: ordered list of (group_id, number_active_members, number_cards)
+# of all public groups, refreshed periodically (studygroups.tasks)
+PUBLIC_CATALOGUE_CACHE_KEY = "studygroups:public_catalogue"
+PUBLIC_CATALOGUE_TIMEOUT = 60 * 60
+
+
+def aggregate_subquery(queryset, field, aggregate, output_field):
+    # Returns the aggregate of queryset rows per OuterRef("pk") of field
+    return Subquery(
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(aggregate=aggregate)
+        .values("aggregate"),
+        output_field=output_field,
+    )
+
+
+def count_subquery(queryset, field):
+    # Returns a (0 defaulting) count of queryset rows per OuterRef("pk") of field
+    return Coalesce(aggregate_subquery(queryset, field, Count("pk"), IntegerField()), 0)
+
+
+def max_updated_subquery(queryset, field):
+    # Returns the last updated_at of queryset rows per OuterRef("pk") of field
+    return aggregate_subquery(
+        queryset, field, Max("updated_at"), models.DateTimeField()
+    )
+
+
 class StudyGroupManager(models.Manager):
-    pass
+    def build_public_catalogue(self):
+        # returns the directory entries of all public groups ordered by name
+        return list(
+            self.filter(is_publicly_available=True)
+            .annotate(
+                member_count=count_subquery(
+                    Membership.objects.filter(approved=True, blocked=False), "group"
+                ),
+                card_count=count_subquery(
+                    apps.get_model("flashcards", "Card").objects, "group"
+                ),
+            )
+            .order_by("name", "pk")
+            .values_list("pk", "member_count", "card_count")
+        )
+
+    def refresh_public_catalogue(self):
+        catalogue = self.build_public_catalogue()
+        cache.set(PUBLIC_CATALOGUE_CACHE_KEY, catalogue, PUBLIC_CATALOGUE_TIMEOUT)
+        return catalogue
+
+    def get_public_catalogue(self):
+        # returns the cached directory entries (rebuilt if missing)
+        catalogue = cache.get(PUBLIC_CATALOGUE_CACHE_KEY)
+        if catalogue is None:
+            catalogue = self.refresh_public_catalogue()
+        return catalogue
+
+    def invalidate_public_catalogue(self):
+        cache.delete(PUBLIC_CATALOGUE_CACHE_KEY)
+
+    def get_public_version(self):
+        # returns the last change and number of public groups
+        return self.filter(is_publicly_available=True).aggregate(
+            updated_at=Max("updated_at"), count=Count("pk")
+        )
+
+    def get_version(self, group, user):
+        # returns the last changes (and counts, to notice deletions) of group, its
+        # topics, cards, memberships and the user's performances in one query
+        Card = apps.get_model("flashcards", "Card")
+        Topic = apps.get_model("flashcards", "Topic")
+        Performance = apps.get_model("flashcards", "Performance")
+        return (
+            self.filter(pk=group.pk)
+            .annotate(
+                topics_updated_at=max_updated_subquery(Topic.objects, "group"),
+                topic_count=count_subquery(Topic.objects, "group"),
+                cards_updated_at=max_updated_subquery(Card.objects, "group"),
+                card_count=count_subquery(Card.objects, "group"),
+                memberships_updated_at=max_updated_subquery(
+                    Membership.objects, "group"
+                ),
+                membership_count=count_subquery(Membership.objects, "group"),
+                performances_updated_at=max_updated_subquery(
+                    Performance.objects.filter(owner_id=user.pk), "card__group"
+                ),
+                progress_updated_at=max_updated_subquery(
+                    MemberProgress.objects, "group"
+                ),
+            )
+            .values(
+                "updated_at",
+                "topics_updated_at",
+                "topic_count",
+                "cards_updated_at",
+                "card_count",
+                "memberships_updated_at",
+                "membership_count",
+                "performances_updated_at",
+                "progress_updated_at",
+            )
+            .first()
+        )
+
+    def similar_to(self, query, user, limit=5):
+        # returns the public or own groups with a name most similar to query
+        query = normalize_search_text(query)
+        return (
+            self.filter(name__trigram_word_similar=query)
+            .annotate(
+                user_is_member=Exists(
+                    Membership.objects.filter(group=OuterRef("pk"), member=user)
+                ),
+                similarity=TrigramWordSimilarity("name", query),
+            )
+            .filter(Q(is_publicly_available=True) | Q(user_is_member=True))
+            .order_by("-similarity", "name")[:limit]
+        )
 
 
 class StudyGroup(UUIDMixin, TimestampMixin, models.Model):
@@ -30,6 +169,13 @@ class StudyGroup(UUIDMixin, TimestampMixin, models.Model):
         verbose_name = _("Study Group")
         verbose_name_plural = _("Study Groups")
         ordering = ("-is_main_user_group", "name")
+        indexes = [
+            GinIndex(
+                name="studygroup_name_trgm_idx",
+                fields=["name"],
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     name = models.CharField(
         _("Group Title"),
@@ -77,15 +223,26 @@ class StudyGroup(UUIDMixin, TimestampMixin, models.Model):
 
     def is_member(self, user):
         # TODO: Refactor, determine usage, where?
-        return self.memberships.filter(member=user).exists()
+        if not user.is_authenticated:
+            return False
+        return self.pk in Membership.objects.get_membership_map(user)
 
     def membership_for(self, user):
-        return self.memberships.filter(member=user).first()
+        # returns the membership of user from the membership cache (or None)
+        if not user.is_authenticated:
+            return None
+        return Membership.objects.get_cached(user, self)
 
     def number_active_members(self):
+        # member_count is set by the directory from the public catalogue
+        if hasattr(self, "member_count"):
+            return self.member_count
         return self.memberships.filter(approved=True, blocked=False).count()
 
     def number_cards(self):
+        # card_count is set by the directory from the public catalogue
+        if hasattr(self, "card_count"):
+            return self.card_count
         return self.cards.count()
 
     def get_invite_url(self):
@@ -102,8 +259,68 @@ class StudyGroup(UUIDMixin, TimestampMixin, models.Model):
         return super().save(*args, **kwargs)
 
 
+# Membership map: {group_id: membership field values} of a user, cached per
+# user and invalidated by the Membership save & delete signals
+MEMBERSHIP_CACHE_KEY = "studygroups:memberships:%s"
+MEMBERSHIP_CACHE_TIMEOUT = 24 * 60 * 60
+
+
 class MembershipManager(models.Manager):
-    pass
+    def get_membership_map(self, user):
+        # returns the (cached) membership map of user
+        key = MEMBERSHIP_CACHE_KEY % user.pk
+        membership_map = cache.get(key)
+        if membership_map is None:
+            field_names = self.get_cache_field_names()
+            membership_map = {
+                values[field_names.index("group_id")]: values
+                for values in self.filter(member_id=user.pk).values_list(*field_names)
+            }
+            cache.set(key, membership_map, MEMBERSHIP_CACHE_TIMEOUT)
+        return membership_map
+
+    def get_cached(self, user, group):
+        # returns the membership of user in group from the membership map (or None)
+        values = self.get_membership_map(user).get(group.pk)
+        if values is None:
+            return None
+        membership = self.model.from_db(
+            self.db, self.get_cache_field_names(), list(values)
+        )
+        membership.group = group
+        membership.member = user
+        return membership
+
+    def get_version(self, user):
+        # returns [(group_id, updated_at), ...] of the memberships of user (cached)
+        field_names = self.get_cache_field_names()
+        group_id = field_names.index("group_id")
+        updated_at = field_names.index("updated_at")
+        return sorted(
+            (values[group_id], values[updated_at])
+            for values in self.get_membership_map(user).values()
+        )
+
+    def get_approved_group_ids(self, user):
+        # returns the ids of the groups user is an approved (and not blocked)
+        # member of (cached)
+        field_names = self.get_cache_field_names()
+        approved, blocked = field_names.index("approved"), field_names.index("blocked")
+        return [
+            group_id
+            for group_id, values in self.get_membership_map(user).items()
+            if values[approved] and not values[blocked]
+        ]
+
+    def invalidate_membership_map(self, user_id):
+        # deleted now and again on commit: a concurrent request may cache the
+        # old (committed) rows until this transaction commits
+        key = MEMBERSHIP_CACHE_KEY % user_id
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.delete(key))
+
+    def get_cache_field_names(self):
+        return [field.attname for field in self.model._meta.concrete_fields]
 
 
 class Membership(UUIDMixin, TimestampMixin, models.Model):
@@ -116,6 +333,13 @@ class Membership(UUIDMixin, TimestampMixin, models.Model):
         verbose_name_plural = _("Memberships")
         unique_together = ("group", "member")
         ordering = ("role", "member")
+        indexes = [
+            # Delta sync of the user's memberships
+            models.Index(
+                name="membership_member_updated_idx",
+                fields=["member", "updated_at", "id"],
+            ),
+        ]
 
     group = models.ForeignKey(
         StudyGroup,
@@ -157,9 +381,162 @@ class Membership(UUIDMixin, TimestampMixin, models.Model):
         return "%s is %s in %s" % (self.member, self.get_role_display(), self.group)
 
     def get_score(self):
-        # TODO: gets the recall score of all cards
-        return "%d %%" % (0)
+        # Mean recall score of the member's cards of the group
+        try:
+            return "%d %%" % self.progress.recall_score
+        except MemberProgress.DoesNotExist:
+            performances = apps.get_model("flashcards", "Performance").objects.filter(
+                owner_id=self.member_id, card__group_id=self.group_id
+            )
+            return "%d %%" % ReviewHistory.load(performances).score()
 
     def get_absolute_url(self):
         # Returns path to update-view
         pass  # return reverse("memocard_update_view", kwargs={"unique_id": self.unique_id})
+
+
+# Recall score (0-100) from which a card counts as mastered
+MASTERED_RECALL_SCORE = 80
+# Ranking of the members of a group (progress_group_rank_idx)
+PROGRESS_RANKING = ("-cards_mastered", "-recall_score", "member_id")
+
+
+class MemberProgressManager(models.Manager):
+    def ranked(self, group):
+        # returns the progress of the group's members, best first
+        return (
+            self.filter(group=group)
+            .select_related("membership__member", "membership__group")
+            .order_by(*PROGRESS_RANKING)
+        )
+
+    def record(self, performance, old=None, created=False, deleted=False):
+        """Applies the change of a performance to the progress of its owner
+        old: (recall_score, trials) before the change; None if not known, then
+        the progress is recalculated
+        """
+        Card = apps.get_model("flashcards", "Card")
+        progress = self.filter(
+            member_id=performance.owner_id,
+            group_id=Subquery(
+                Card.objects.filter(pk=performance.card_id).values("group_id")
+            ),
+        )
+        if old is None and not created:
+            return self.rebuild(progress)
+        old_score, old_trials = (0, 0) if created else old
+        new_score, new_trials = (0, 0) if deleted else performance.get_progress_state()
+        cards = 1 if created else -1 if deleted else 0
+        mastered = int(new_score >= MASTERED_RECALL_SCORE) - int(
+            old_score >= MASTERED_RECALL_SCORE
+        )
+        score = float(new_score) - float(old_score)
+        total = F("recall_score_total") + score
+        values = {
+            "cards": F("cards") + cards,
+            "cards_mastered": F("cards_mastered") + mastered,
+            "recall_score_total": total,
+            "recall_score": ExpressionWrapper(
+                total / Greatest(F("cards") + cards, 1), output_field=FloatField()
+            ),
+            "updated_at": timezone.now(),
+        }
+        if new_trials > old_trials:  # an answer was recorded
+            values["last_active_at"] = timezone.now()
+        return progress.update(**values)
+
+    def create_missing(self):
+        # creates the rows of memberships without progress (e.g. bulk created)
+        missing = Membership.objects.filter(progress__isnull=True).values_list(
+            "pk", "group_id", "member_id"
+        )
+        return self.bulk_create(
+            [
+                MemberProgress(membership_id=pk, group_id=group_id, member_id=member_id)
+                for pk, group_id, member_id in missing
+            ],
+            ignore_conflicts=True,
+        )
+
+    def rebuild(self, queryset=None):
+        # Recalculates the progress rows (all or of queryset) in one query; all
+        # rows: the missing ones are created first
+        if queryset is None:
+            self.create_missing()
+        Performance = apps.get_model("flashcards", "Performance")
+        performances = (
+            Performance.objects.filter(
+                owner=OuterRef("member_id"), card__group=OuterRef("group_id")
+            )
+            .order_by()
+            .values("owner")
+        )
+
+        def aggregate(expression, output_field, default=0):
+            subquery = Subquery(
+                performances.annotate(aggregate=expression).values("aggregate"),
+                output_field=output_field,
+            )
+            return subquery if default is None else Coalesce(subquery, default)
+
+        mastered = Q(recall_score__gte=MASTERED_RECALL_SCORE)
+        answered = Q(recall_trials__gt=0) | Q(learn_trials__gt=0)
+        return (self if queryset is None else queryset).update(
+            cards=aggregate(Count("pk"), IntegerField()),
+            cards_mastered=aggregate(Count("pk", filter=mastered), IntegerField()),
+            recall_score_total=aggregate(Sum("recall_score"), FloatField()),
+            recall_score=aggregate(Avg("recall_score"), FloatField()),
+            last_active_at=aggregate(
+                Max("updated_at", filter=answered), models.DateTimeField(), None
+            ),
+            updated_at=timezone.now(),
+        )
+
+
+class MemberProgress(TimestampMixin, models.Model):
+    """
+    Progress of a member in a group (maintained from the member's performances)
+    Rows are updated incrementally whenever a performance changes (see
+    flashcards.signals), so ranking the members is a single indexed read.
+    """
+
+    class Meta:
+        verbose_name = _("Member Progress")
+        verbose_name_plural = _("Member Progress")
+        indexes = [
+            models.Index(
+                name="progress_group_rank_idx",
+                fields=["group", "-cards_mastered", "-recall_score"],
+            ),
+            models.Index(name="progress_member_group_idx", fields=["member", "group"]),
+        ]
+
+    membership = models.OneToOneField(
+        Membership,
+        help_text=_("Membership of the progress"),
+        related_name="progress",
+        on_delete=models.CASCADE,
+    )
+    # denormalized from the membership (updates and ranking need no join)
+    group = models.ForeignKey(
+        StudyGroup,
+        help_text=_("Study Group of the progress"),
+        related_name="member_progress",
+        on_delete=models.CASCADE,
+    )
+    member = models.ForeignKey(
+        User,
+        help_text=_("User of the progress"),
+        related_name="progress",
+        on_delete=models.CASCADE,
+    )
+    cards = models.PositiveIntegerField(_("Cards"), default=0)
+    cards_mastered = models.PositiveIntegerField(_("Cards mastered"), default=0)
+    recall_score_total = models.FloatField(_("Total recall score"), default=0)
+    recall_score = models.FloatField(_("Average recall score"), default=0)
+    last_active_at = models.DateTimeField(_("Last active at"), null=True, blank=True)
+
+    objects = MemberProgressManager()
+
+    def __str__(self):
+        return "%s in %s" % (self.member, self.group)
@@ -0,0 +1,100 @@
+#
+# Compiled group permissions
+# The group rules (studygroups.rules, flashcards.rules) only depend on the user
+# being authenticated, having a free group slot and on the role, approval and
+# block state of the membership and the kind of its group. All combinations are
+# evaluated once per process into a decision table, so a permission check is a
+# dict lookup instead of a walk through the composed predicates.
+from functools import lru_cache
+from itertools import product
+from types import SimpleNamespace
+
+import rules
+from studygroups.models import STUDYGROUP_ROLES
+
+# Rules of a user in a group (the get_group_permissions template tag)
+GROUP_RULES = (
+    "can_join_studygroup",
+    "can_leave_studygroup",
+    "has_unapproved_membership",
+    "can_create_studygroup",
+    "can_view_studygroup",
+    "can_update_studygroup",
+    "can_delete_studygroup",
+    "can_manage_member",
+    "can_manage_card",
+    "can_delete_card",
+    "can_manage_topic",
+)
+
+
+def evaluate_group_rules(user, membership):
+    # returns {rule: bool} by testing the rule predicates
+    return {name: rules.test_rule(name, user, membership) for name in GROUP_RULES}
+
+
+def user_key(user):
+    # returns the part of the decision key that depends on the user
+    is_authenticated = bool(getattr(user, "is_authenticated", False))
+    return (is_authenticated, is_authenticated and bool(user.has_free_group_slot()))
+
+
+def membership_key(membership):
+    # returns the part of the decision key that depends on the membership
+    if not membership:
+        return None
+    return (
+        membership.role,
+        bool(membership.approved),
+        bool(membership.blocked),
+        bool(membership.group.is_main_user_group),
+        bool(membership.group.is_publicly_available),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_decision_table():
+    # returns {(user_key, membership_key): {rule: bool}} of all combinations
+    import flashcards.rules  # noqa F401 (registers the card & topic rules)
+
+    booleans = (False, True)
+    roles = [role for role, label in STUDYGROUP_ROLES]
+    memberships = [None]
+    for role, approved, blocked, is_main, is_public in product(
+        roles, booleans, booleans, booleans, booleans
+    ):
+        memberships.append(
+            SimpleNamespace(
+                role=role,
+                approved=approved,
+                blocked=blocked,
+                group=SimpleNamespace(
+                    is_main_user_group=is_main, is_publicly_available=is_public
+                ),
+            )
+        )
+    table = {}
+    for is_authenticated, has_free_group_slot in product(booleans, booleans):
+        user = SimpleNamespace(
+            is_authenticated=is_authenticated,
+            has_free_group_slot=lambda slot=has_free_group_slot: slot,
+        )
+        for membership in memberships:
+            key = (user_key(user), membership_key(membership))
+            table[key] = evaluate_group_rules(user, membership)
+    return table
+
+
+def get_group_permissions(user, membership):
+    # returns {rule: bool} of user in the group of membership (dict lookup)
+    permissions = get_decision_table().get((user_key(user), membership_key(membership)))
+    if permissions is None:  # not a known role
+        return evaluate_group_rules(user, membership)
+    return permissions
+
+
+def check_group_rule(name, user, membership):
+    # returns the decision of a group rule (other rules are tested directly)
+    if name in GROUP_RULES:
+        return get_group_permissions(user, membership)[name]
+    return rules.test_rule(name, user, membership)
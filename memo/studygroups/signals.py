@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from studygroups.models import MemberProgress, Membership, StudyGroup
+
+
+# STUDY GROUP CHANGES (post save & delete)
+@receiver(post_save, sender=StudyGroup)
+@receiver(post_delete, sender=StudyGroup)
+def study_group_changed(sender, instance, **kwargs):
+    # Name, visibility or existence changed: rebuild the directory lazily
+    StudyGroup.objects.invalidate_public_catalogue()
+
+
+# MEMBERSHIP CHANGES (post save & delete)
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def membership_changed(sender, instance, **kwargs):
+    # Role, approval or existence changed: drop the member's membership map
+    Membership.objects.invalidate_membership_map(instance.member_id)
+
+
+@receiver(post_save, sender=Membership)
+def membership_created(sender, instance, created, **kwargs):
+    # Starts the progress of the member (from existing performances, if any)
+    if created:
+        progress = MemberProgress.objects.create(
+            membership=instance,
+            group_id=instance.group_id,
+            member_id=instance.member_id,
+        )
+        MemberProgress.objects.rebuild(MemberProgress.objects.filter(pk=progress.pk))
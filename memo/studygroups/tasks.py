@@ -0,0 +1,15 @@
+from studygroups.models import MemberProgress, StudyGroup
+
+from config import celery_app
+
+
+@celery_app.task()
+def refresh_public_catalogue():
+    """Rebuilds the cached public group catalogue of the directory."""
+    return len(StudyGroup.objects.refresh_public_catalogue())
+
+
+@celery_app.task()
+def rebuild_member_progress():
+    """Recalculates the member progress (repairs changes that skipped signals)."""
+    return MemberProgress.objects.rebuild()
@@ -1,5 +1,5 @@
-import rules
 from django import template
+from studygroups import permissions
 
 register = template.Library()
 
@@ -9,34 +9,19 @@ def get_group_membership(user, group):
     return group.membership_for(user)
 
 
-@register.simple_tag()
-def get_group_permissions(user, group):
-    # returns permission dict for the group
-    membership = group.membership_for(user)
-    permissions = {
-        "can_join_studygroup": rules.test_rule("can_join_studygroup", user, membership),
-        "can_leave_studygroup": rules.test_rule(
-            "can_leave_studygroup", user, membership
-        ),
-        "has_unapproved_membership": rules.test_rule(
-            "has_unapproved_membership", user, membership
-        ),
-        "can_create_studygroup": rules.test_rule(
-            "can_create_studygroup", user, membership
-        ),
-        "can_view_studygroup": rules.test_rule("can_view_studygroup", user, membership),
-        "can_update_studygroup": rules.test_rule(
-            "can_update_studygroup", user, membership
-        ),
-        "can_delete_studygroup": rules.test_rule(
-            "can_delete_studygroup", user, membership
-        ),
-        "can_manage_member": rules.test_rule("can_manage_member", user, membership),
-        "can_manage_card": rules.test_rule("can_manage_card", user, membership),
-        "can_delete_card": rules.test_rule("can_delete_card", user, membership),
-        "can_manage_topic": rules.test_rule("can_manage_topic", user, membership),
-    }
-    return permissions
+@register.simple_tag(takes_context=True)
+def get_group_permissions(context, user, group):
+    # returns permission dict for the group (memoized per request)
+    request = context.get("request")
+    memo = getattr(request, "_group_permissions", None)
+    if memo is None:
+        memo = {}
+        if request is not None:
+            request._group_permissions = memo
+    key = (user.pk, group.pk)
+    if key not in memo:
+        memo[key] = permissions.get_group_permissions(user, group.membership_for(user))
+    return memo[key]
 
 
 @register.inclusion_tag("studygroups/templatetags/_group_icon.html")
@@ -0,0 +1,390 @@
+import datetime
+import os
+import timeit
+from itertools import product
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from flashcards.models import Card, Performance, Topic
+from studygroups import permissions
+from studygroups.models import (
+    MEMBERSHIP_CACHE_KEY,
+    STUDYGROUP_ROLES,
+    MemberProgress,
+    Membership,
+    StudyGroup,
+)
+from studygroups.views import ManageMembershipRedirectView, StudyGroupDirectoryView
+
+from memo.users.models import User
+from memo.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def public_groups(user: User):
+    return [
+        StudyGroup.objects.create(
+            name="Group %d" % i, description="Public", is_publicly_available=True
+        )
+        for i in range(5)
+    ]
+
+
+def directory_page(user, rf, **params):
+    view = StudyGroupDirectoryView()
+    view.request = rf.get("/fake-url/", params)
+    view.request.user = user
+    view.kwargs = {}
+    queryset = view.get_queryset()
+    paginator, page, object_list, is_paginated = view.paginate_queryset(queryset, 2)
+    return page
+
+
+class TestPublicCatalogue:
+    def test_invalidated_on_group_change(self, public_groups):
+        catalogue = StudyGroup.objects.get_public_catalogue()
+        assert [entry[0] for entry in catalogue] == [g.pk for g in public_groups]
+
+        public_groups[0].is_publicly_available = False
+        public_groups[0].save()
+
+        catalogue = StudyGroup.objects.get_public_catalogue()
+        assert [entry[0] for entry in catalogue] == [g.pk for g in public_groups[1:]]
+
+    def test_directory_excludes_own_groups(
+        self, user: User, rf: RequestFactory, public_groups
+    ):
+        Membership.objects.create(group=public_groups[1], member=user, approved=True)
+
+        page = directory_page(user, rf)
+        assert [g.pk for g in page] == [public_groups[0].pk, public_groups[2].pk]
+
+        page = directory_page(user, rf, cursor=page.next_cursor)
+        assert [g.pk for g in page] == [public_groups[3].pk, public_groups[4].pk]
+        assert not page.has_next()
+
+    def test_directory_continues_after_a_removed_group(
+        self, user: User, rf: RequestFactory, public_groups
+    ):
+        page = directory_page(user, rf)
+        assert [g.pk for g in page] == [public_groups[0].pk, public_groups[1].pk]
+
+        public_groups[1].is_publicly_available = False
+        public_groups[1].save()
+        page = directory_page(user, rf, cursor=page.next_cursor)
+        assert [g.pk for g in page] == [public_groups[2].pk, public_groups[3].pk]
+
+        public_groups[3].delete()
+        page = directory_page(user, rf, cursor=page.next_cursor)
+        assert [g.pk for g in page] == [public_groups[4].pk]
+        assert not page.has_next()
+
+    def test_search_pages_with_tied_similarity(
+        self, user: User, rf: RequestFactory, public_groups
+    ):
+        # "grou" has the same (not exactly representable) similarity to all
+        page = directory_page(user, rf, search="grou")
+        pks = [g.pk for g in page]
+        while page.has_next():
+            page = directory_page(user, rf, search="grou", cursor=page.next_cursor)
+            pks.extend(g.pk for g in page)
+        assert pks == [g.pk for g in public_groups]
+
+
+class TestSearch:
+    @pytest.fixture
+    def group(self, user: User):
+        group = user.get_main_user_group()
+        topic = Topic.objects.create(group=group, title="Photosynthesis")
+        Card.objects.create(
+            group=group,
+            creator=user,
+            topic=topic,
+            front_text="<p>Photosynthesis in plants</p>",
+        )
+        return group
+
+    def test_similar_to(self, user: User, group):
+        other = UserFactory()
+        Card.objects.create(
+            group=other.get_main_user_group(),
+            creator=other,
+            front_text="Photosynthesis in algae",
+        )
+        public = StudyGroup.objects.create(
+            name="Photosynthesis Club", is_publicly_available=True
+        )
+        cards = Card.objects.similar_to("photosynth", user)
+        assert [card.group for card in cards] == [group]
+        topics = Topic.objects.similar_to("PHOTOSYNTH", user, group=group)
+        assert [topic.title for topic in topics] == ["Photosynthesis"]
+        assert list(StudyGroup.objects.similar_to("photosynth", user)) == [public]
+        assert not Card.objects.similar_to("xylophone", user)
+
+    def test_similar_to_excludes_blocked_members(self, group):
+        blocked = UserFactory()
+        Membership.objects.create(
+            group=group, member=blocked, approved=True, blocked=True
+        )
+        assert not Card.objects.similar_to("photosynth", blocked)
+        assert not Topic.objects.similar_to("photosynth", blocked)
+
+    def test_suggest_term(self, group):
+        assert Card.objects.suggest_term("photosynthsis", group) == "photosynthesis"
+        assert Card.objects.suggest_term("xylophone", group) is None
+
+    def test_did_you_mean(self, user: User, group, client: Client):
+        client.force_login(user)
+        url = reverse("studygroups:group_detail_view", kwargs={"slug": group.slug})
+        response = client.get(url, {"search": "photosynthsis"})
+        assert response.context["did_you_mean"] == "photosynthesis"
+        response = client.get(url, {"search": "photosynthesis"})
+        assert "did_you_mean" not in response.context
+
+    def test_autocomplete_view(self, user: User, group, client: Client):
+        client.force_login(user)
+        url = reverse("studygroups:autocomplete_view")
+        data = client.get(url, {"q": "photosynth", "group": group.unique_id}).json()
+        assert [card["group"] for card in data["cards"]] == [group.slug]
+        assert [topic["title"] for topic in data["topics"]] == ["Photosynthesis"]
+        assert client.get(url, {"q": "p"}).json()["cards"] == []
+        response = client.get(url, {"q": "photosynth", "group": "not-a-uuid"})
+        assert response.status_code == 400
+
+
+class TestViewQueries:
+    # Rows are loaded once per request (request scoped identity map)
+
+    def test_manage_membership_view(
+        self, user: User, rf: RequestFactory, django_assert_num_queries
+    ):
+        group = user.get_main_user_group()
+        membership = Membership.objects.create(group=group, member=UserFactory())
+        view = ManageMembershipRedirectView()
+        request = rf.get("/fake-url/")
+        request.user = user
+        view.setup(request, unique_id=membership.unique_id, verb="approve")
+
+        # managed membership with group + admin membership
+        with django_assert_num_queries(2):
+            assert view.has_permission()
+            assert view.get_permission_object().role == "admin"
+            assert view.get_managed_membership() == membership
+
+
+class TestMembershipCache:
+    def test_membership_for_is_cached(self, user: User, django_assert_num_queries):
+        group = user.get_main_user_group()
+        assert group.membership_for(user).role == "admin"
+
+        with django_assert_num_queries(0):
+            membership = group.membership_for(user)
+            assert membership.group is group
+            assert membership.approved
+            assert group.is_member(user)
+
+    def test_invalidated_on_membership_change(self, user: User):
+        group = StudyGroup.objects.create(name="Group", description="Public")
+        assert group.membership_for(user) is None
+
+        membership = Membership.objects.create(group=group, member=user)
+        assert group.membership_for(user) == membership
+        assert not group.membership_for(user).approved
+
+        membership.approved = True
+        membership.save()
+        assert group.membership_for(user).approved
+
+        membership.delete()
+        assert group.membership_for(user) is None
+        assert not group.is_member(user)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_invalidated_after_commit(self, user: User):
+        group = user.get_main_user_group()
+        member = UserFactory()
+        membership = Membership.objects.create(
+            group=group, member=member, approved=True
+        )
+        stale = Membership.objects.get_membership_map(member)
+        with transaction.atomic():
+            membership.blocked = True
+            membership.save()
+            # a concurrent request caches the committed rows before the commit
+            cache.set(MEMBERSHIP_CACHE_KEY % member.pk, stale)
+        assert Membership.objects.get_cached(member, group).blocked
+
+
+def all_memberships():
+    # yields unsaved memberships of every role, state and group kind
+    yield None
+    booleans = (False, True)
+    for (role, label), approved, blocked, is_main, is_public in product(
+        STUDYGROUP_ROLES, booleans, booleans, booleans, booleans
+    ):
+        group = StudyGroup(is_main_user_group=is_main, is_publicly_available=is_public)
+        yield Membership(role=role, approved=approved, blocked=blocked, group=group)
+
+
+class TestDecisionTable:
+    def test_equivalent_to_rules(self, user: User):
+        for member, membership in product([user, AnonymousUser()], all_memberships()):
+            assert permissions.get_group_permissions(
+                member, membership
+            ) == permissions.evaluate_group_rules(member, membership)
+
+    @pytest.mark.skipif(
+        "MEMO_BENCHMARK_TESTS" not in os.environ,
+        reason="Timing benchmark (set MEMO_BENCHMARK_TESTS to run)",
+    )
+    def test_benchmark_get_group_permissions(self, user: User, record_property):
+        memberships = list(all_memberships())
+
+        def run(evaluate):
+            for membership in memberships:
+                evaluate(user, membership)
+
+        before = timeit.timeit(
+            lambda: run(permissions.evaluate_group_rules), number=100
+        )
+        after = timeit.timeit(
+            lambda: run(permissions.get_group_permissions), number=100
+        )
+        timings = "get_group_permissions x %d: rules %.4fs, decision table %.4fs" % (
+            len(memberships) * 100,
+            before,
+            after,
+        )
+        record_property("benchmark", timings)
+        assert after < before, timings
+
+
+class TestConditionalGet:
+    def test_group_detail_not_modified(self, user: User, client: Client):
+        group = user.get_main_user_group()
+        url = reverse("studygroups:group_detail_view", kwargs={"slug": group.slug})
+        client.force_login(user)
+
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response["ETag"]
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        Card.objects.create(group=group, creator=user, front_text="Question")
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_modified_by_the_layout(self, user: User, client: Client, monkeypatch):
+        group = user.get_main_user_group()
+        url = reverse("studygroups:group_detail_view", kwargs={"slug": group.slug})
+        client.force_login(user)
+        etag = client.get(url)["ETag"]
+
+        # cards became due (navbar badge)
+        Performance.objects.adjust_due_count(user.pk, 2)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        etag = response["ETag"]
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        # relative times aged
+        later = timezone.now() + datetime.timedelta(hours=1)
+        monkeypatch.setattr(timezone, "now", lambda: later)
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_group_progress_not_modified(self, user: User, client: Client):
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        performance = card.performances.get(owner=user)
+        url = reverse("studygroups:group_progress_view", kwargs={"slug": group.slug})
+        client.force_login(user)
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json()["days"] == []
+        etag = response["ETag"]
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        performance.add_recalling_datapoint(1, 10)
+        performance.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()["reviews"] == [1]
+        assert response.json()["correct"] == [0]
+        assert response.json()["users"] == [1]
+
+
+class TestMemberProgress:
+    def progress(self, group):
+        return [
+            (p.member, p.cards, p.cards_mastered, p.recall_score)
+            for p in MemberProgress.objects.ranked(group)
+        ]
+
+    def test_updated_incrementally(self, user: User):
+        group = StudyGroup.objects.create(name="Group", description="Public")
+        other = UserFactory()
+        for member in (user, other):
+            Membership.objects.create(group=group, member=member, approved=True)
+        cards = [
+            Card.objects.create(group=group, creator=user, front_text="Question")
+            for i in range(2)
+        ]
+        assert self.progress(group) == [(user, 2, 0, 0), (other, 2, 0, 0)]
+
+        performance = Performance.objects.get(owner=other, card=cards[0])
+        performance.add_recalling_datapoint(5, 10)
+        performance.save()
+        assert self.progress(group) == [(other, 2, 1, 50), (user, 2, 0, 0)]
+        assert group.membership_for(other).progress.last_active_at is not None
+
+        cards[1].delete()
+        assert self.progress(group) == [(other, 1, 1, 100), (user, 1, 0, 0)]
+
+        incremental = self.progress(group)
+        MemberProgress.objects.rebuild()
+        assert self.progress(group) == incremental
+
+    def test_rebuild_creates_missing_rows(self, user: User):
+        group = user.get_main_user_group()
+        other = UserFactory()
+        Card.objects.create(group=group, creator=user, front_text="Question")
+        # bulk created: no progress row (signals skipped)
+        Membership.objects.bulk_create(
+            [Membership(group=group, member=other, approved=True)]
+        )
+        assert self.progress(group) == [(user, 1, 0, 0)]
+
+        MemberProgress.objects.rebuild()
+        assert self.progress(group) == [(user, 1, 0, 0), (other, 0, 0, 0)]
+
+    def test_score_of_member_list(self, user: User, django_assert_num_queries):
+        group = user.get_main_user_group()
+        card = Card.objects.create(group=group, creator=user, front_text="Question")
+        performance = card.performances.get(owner=user)
+        performance.add_recalling_datapoint(4, 10)
+        performance.save()
+
+        with django_assert_num_queries(1):
+            scores = [
+                progress.membership.get_score()
+                for progress in MemberProgress.objects.ranked(group)
+            ]
+        assert scores == ["80 %"]
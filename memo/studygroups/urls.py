@@ -1,6 +1,7 @@
 from django.urls import path
 
 from memo.studygroups.views import (
+    autocomplete_view,
     group_create_view,
     group_delete_view,
     group_detail_view,
@@ -9,6 +10,7 @@ from memo.studygroups.views import (
     group_join_view,
     group_leave_view,
     group_list_view,
+    group_progress_view,
     group_update_view,
     membership_manage_view,
 )
@@ -27,6 +29,11 @@ urlpatterns = [
         view=group_directory_view,
         name="group_directory_view",
     ),
+    path(
+        "autocomplete/",
+        view=autocomplete_view,
+        name="autocomplete_view",
+    ),
     path(
         "new/",
         view=group_create_view,
@@ -63,6 +70,11 @@ urlpatterns = [
         view=group_detail_view,
         name="group_detail_view",
     ),
+    path(
+        "progress/<str:slug>",
+        view=group_progress_view,
+        name="group_progress_view",
+    ),
     path(
         "manage/<uuid:unique_id>/<str:verb>",
         view=membership_manage_view,
@@ -1,9 +1,20 @@
+import datetime
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import HttpResponseRedirect
+from django.db.models import (
+    Count,
+    Exists,
+    FloatField,
+    Max,
+    OuterRef,
+    Prefetch,
+    prefetch_related_objects,
+)
+from django.db.models.functions import Cast
+from django.http import HttpResponseBadRequest, HttpResponseRedirect, JsonResponse
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import (
@@ -13,19 +24,39 @@ from django.views.generic import (
     ListView,
     RedirectView,
     UpdateView,
+    View,
 )
 from flashcards.forms import CardForm, CardSearchForm
-from flashcards.models import Performance
+from flashcards.models import Card, DailyStudyStats, Performance, Topic
 from studygroups.forms import StudyGroupForm
-from studygroups.models import Membership, StudyGroup
-from utils.views import CustomRulesPermissionRequiredMixin
+from studygroups.models import MemberProgress, Membership, StudyGroup
+from utils.pagination import KeysetPage, KeysetPaginator, decode_cursor, encode_cursor
+from utils.search import TrigramWordSimilarity, normalize_search_text
+from utils.views import (
+    ConditionalGetMixin,
+    CustomRulesPermissionRequiredMixin,
+    KeysetPaginationMixin,
+    parse_uuid,
+)
+
+
+def last_change(*values):
+    # returns the latest datetime of values (and of membership versions)
+    datetimes = []
+    for value in values:
+        if isinstance(value, list):
+            datetimes.extend(updated_at for group_id, updated_at in value)
+        elif isinstance(value, datetime.datetime):
+            datetimes.append(value)
+    return max(datetimes, default=None)
 
 
 @method_decorator(login_required, name="dispatch")
-class StudyGroupListView(ListView):
+class StudyGroupListView(KeysetPaginationMixin, ListView):
     model = StudyGroup
     template_name = "studygroups/group_list_view.html"
     paginate_by = 8  # [multiples of 3 - 1 (2,5,8...)]
+    keyset_ordering = ("-is_main_user_group", "name", "pk")
 
     def get_queryset(self, *args, **kwargs):
         # Returns group list for user
@@ -41,20 +72,94 @@ group_list_view = StudyGroupListView.as_view()
 
 
 @method_decorator(login_required, name="dispatch")
-class StudyGroupDirectoryView(ListView):
+class StudyGroupDirectoryView(ConditionalGetMixin, KeysetPaginationMixin, ListView):
     model = StudyGroup
     template_name = "studygroups/group_directory_view.html"
     paginate_by = 9  # [multiples of 3 (3,6,9...)]
+    keyset_ordering = ("name", "pk")
+
+    def get_keyset_ordering(self):
+        if self.request.GET.get("search"):
+            return ("-similarity", "name", "pk")
+        return self.keyset_ordering
+
+    def get_version(self):
+        # public groups (cached catalogue and their last change) & own memberships
+        public_version = StudyGroup.objects.get_public_version()
+        memberships = Membership.objects.get_version(self.request.user)
+        version = [
+            public_version,
+            StudyGroup.objects.get_public_catalogue(),
+            memberships,
+        ]
+        return version, last_change(public_version["updated_at"], memberships)
 
     def get_queryset(self, *args, **kwargs):
         # Returns public group list user is not a member
-        return StudyGroup.objects.filter(is_publicly_available=True).filter(
-            ~Q(memberships__member=self.request.user)
+        queryset = StudyGroup.objects.filter(is_publicly_available=True).filter(
+            ~Exists(
+                Membership.objects.filter(
+                    group=OuterRef("pk"), member=self.request.user
+                )
+            )
         )
+        search_query = self.request.GET.get("search")
+        if search_query:
+            # Fuzzy (trigram) match on the group name, best match first
+            search_query = normalize_search_text(search_query)
+            queryset = queryset.filter(
+                name__trigram_word_similar=search_query
+            ).annotate(
+                # double precision: the cursor's (JSON) value compares equal
+                similarity=Cast(
+                    TrigramWordSimilarity("name", search_query), FloatField()
+                )
+            )
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.request.GET.get("search"):
+            return super().paginate_queryset(queryset, page_size)
+        # Pages the cached public catalogue minus the groups of the user
+        member_of = Membership.objects.get_membership_map(self.request.user)
+        catalogue = [
+            entry
+            for entry in StudyGroup.objects.get_public_catalogue()
+            if entry[0] not in member_of
+        ]
+        # cursor: position and pk of the last group of the previous page; a
+        # group gone since (unpublished or deleted) continues at its position
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        start = 0
+        values = decode_cursor(cursor) if cursor else None
+        positions = {entry[0]: index for index, entry in enumerate(catalogue)}
+        if values and len(values) == 2 and values[1] in positions:
+            start = positions[values[1]] + 1
+        elif values and len(values) == 2 and isinstance(values[0], int):
+            start = min(max(values[0], 0), len(catalogue))
+        else:
+            cursor = None
+        end = start + page_size
+        entries = catalogue[start:end]
+        groups = StudyGroup.objects.in_bulk([entry[0] for entry in entries])
+        object_list = []
+        for pk, member_count, card_count in entries:
+            group = groups.get(pk)
+            if group is None:  # deleted since the catalogue was built
+                continue
+            group.member_count = member_count
+            group.card_count = card_count
+            object_list.append(group)
+        next_cursor = None
+        if end < len(catalogue):
+            next_cursor = encode_cursor([end - 1, entries[-1][0]])
+        page = KeysetPage(object_list, next_cursor, cursor, self.request.GET)
+        return (None, page, page.object_list, page.has_other_pages())
 
     def get_context_data(self, **kwargs):
         # Optional additional context data
         context = super(StudyGroupDirectoryView, self).get_context_data(**kwargs)
+        context["search_query"] = self.request.GET.get("search", "")
         context["group_create_form"] = StudyGroupForm(
             initial={
                 "creator": self.request.user,
@@ -67,7 +172,9 @@ group_directory_view = StudyGroupDirectoryView.as_view()
 
 
 @method_decorator(login_required, name="dispatch")
-class StudyGroupDetailView(CustomRulesPermissionRequiredMixin, DetailView):
+class StudyGroupDetailView(
+    CustomRulesPermissionRequiredMixin, ConditionalGetMixin, DetailView
+):
     model = StudyGroup  # detail model
     permission_required = "studygroups.view_studygroup"
     slug_field = "slug"
@@ -88,7 +195,13 @@ class StudyGroupDetailView(CustomRulesPermissionRequiredMixin, DetailView):
         return super().get(request, *args, **kwargs)
 
     def get_permission_object(self):
-        return self.get_object().membership_for(self.request.user)
+        return self.get_membership(self.get_object())
+
+    def get_version(self):
+        version = StudyGroup.objects.get_version(self.get_object(), self.request.user)
+        if version is None:
+            return None
+        return version, last_change(*version.values())
 
     def get_card_list(self):
         # Returns the card_list and filters by search and topic
@@ -96,36 +209,28 @@ class StudyGroupDetailView(CustomRulesPermissionRequiredMixin, DetailView):
         topic_query = self.request.GET.get("topic")
         paused_query = self.request.GET.get("paused")
         priority_query = self.request.GET.get("priority")
-        score_sort = self.request.GET.get("score_sort")
-        # Narrow down cards
-        card_list = self.object.cards.all()
+        # Narrow down cards (joining the user's performance once)
         if topic_query is None and search_query is None:
-            return card_list  # When search form is empty
-        if topic_query:
-            card_list = card_list.filter(topic__unique_id=topic_query)
-        if search_query:
-            card_list = card_list.filter(
-                Q(front_text__icontains=search_query)
-                | Q(back_text__icontains=search_query)
-            )
-        if paused_query != "all":
-            card_list = card_list.filter(
-                Q(performances__owner=self.request.user)
-                & Q(performances__is_paused=paused_query)
-            )
-        if priority_query != "all":
-            card_list = card_list.filter(
-                Q(performances__owner=self.request.user)
-                & Q(performances__priority=priority_query)
-            )
+            # When search form is empty
+            return self.object.cards.filter_for(self.request.user)
+        return self.object.cards.filter_for(
+            self.request.user,
+            topic=topic_query,
+            search=search_query,
+            paused=paused_query,
+            priority=priority_query,
+        )
+
+    def get_card_ordering(self):
+        # Returns the keyset ordering of the card list (unique tie breaker last)
+        score_sort = self.request.GET.get("score_sort")
         if score_sort == "asc":
-            card_list = card_list.order_by("performances__recall_score")
+            return ("user_recall_score", "pk")
         elif score_sort == "dsc":
-            card_list = card_list.order_by("-performances__recall_score")
-        else:
-            card_list = card_list.order_by("-created_at")
-
-        return card_list.all()
+            return ("-user_recall_score", "pk")
+        elif score_sort == "title":
+            return ("search_text", "pk")
+        return ("-created_at", "-pk")
 
     def get_context_data(self, **kwargs):
         context = super(StudyGroupDetailView, self).get_context_data(**kwargs)
@@ -144,9 +249,28 @@ class StudyGroupDetailView(CustomRulesPermissionRequiredMixin, DetailView):
         context["group_edit_form"] = StudyGroupForm(instance=self.object)
         # Add card search form to context
         context["card_search_form"] = self.get_card_search_form()
-        paginator = Paginator(card_list, self.paginate_by)
-        page_obj = paginator.get_page(self.request.GET.get("page"))
+        paginator = KeysetPaginator(
+            card_list, self.get_card_ordering(), self.paginate_by
+        )
+        page_obj = paginator.get_page(self.request.GET.get("cursor"), self.request.GET)
+        # Fetch the user's performances of the page at once (card tiles)
+        prefetch_related_objects(
+            page_obj.object_list,
+            Prefetch(
+                "performances",
+                queryset=Performance.objects.filter(owner=self.request.user),
+                to_attr="user_performances",
+            ),
+        )
         context["page_obj"] = page_obj
+        # Ranked member list of the member modal (evaluated when rendered)
+        context["member_progress"] = MemberProgress.objects.ranked(self.object)
+        # "Did you mean" fallback for searches without a result
+        search_query = self.request.GET.get("search")
+        if search_query and not page_obj.object_list:
+            context["did_you_mean"] = Card.objects.suggest_term(
+                search_query, group=self.object
+            )
         return context
 
     def get_card_search_form(self):
@@ -168,6 +292,131 @@ class StudyGroupDetailView(CustomRulesPermissionRequiredMixin, DetailView):
 group_detail_view = StudyGroupDetailView.as_view()
 
 
+@method_decorator(login_required, name="dispatch")
+class StudyGroupProgressView(
+    CustomRulesPermissionRequiredMixin, ConditionalGetMixin, DetailView
+):
+    """Progress of the group over time (reviews, correct and active members
+    per day, json)"""
+
+    model = StudyGroup
+    permission_required = "studygroups.view_studygroup"
+    slug_field = "slug"
+    slug_url_kwarg = "slug"
+
+    def get_permission_object(self):
+        return self.get_membership(self.get_object())
+
+    def get_start(self):
+        return DailyStudyStats.objects.get_activity_start(timezone.localdate())
+
+    def get_version(self):
+        start = self.get_start()
+        version = DailyStudyStats.objects.get_version(
+            groups=[self.get_object()], since=start
+        )
+        version["start"] = start
+        return version, None
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(
+            DailyStudyStats.objects.get_series(
+                self.get_start(),
+                groups=[self.get_object()],
+                fields=("reviews", "correct", "users"),
+            )
+        )
+
+
+group_progress_view = StudyGroupProgressView.as_view()
+
+
+@method_decorator(login_required, name="dispatch")
+class AutocompleteView(ConditionalGetMixin, View):
+    """JSON autocomplete of cards, topics and groups (trigram similarity)"""
+
+    default_limit = 5
+    max_limit = 20
+    min_query_length = 2
+
+    def get_version(self):
+        # public groups, own memberships and the cards & topics of own groups
+        if len(self.request.GET.get("q", "").strip()) < self.min_query_length:
+            return None
+        memberships = Membership.objects.get_version(self.request.user)
+        group_ids = [group_id for group_id, updated_at in memberships]
+        aggregates = {"updated_at": Max("updated_at"), "count": Count("pk")}
+        public_version = StudyGroup.objects.get_public_version()
+        card_version = Card.objects.filter(group_id__in=group_ids).aggregate(
+            **aggregates
+        )
+        topic_version = Topic.objects.filter(group_id__in=group_ids).aggregate(
+            **aggregates
+        )
+        version = [public_version, card_version, topic_version, memberships]
+        return version, last_change(
+            public_version["updated_at"],
+            card_version["updated_at"],
+            topic_version["updated_at"],
+            memberships,
+        )
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get("q", "").strip()
+        limit = self.get_limit()
+        data = {"query": query, "cards": [], "topics": [], "groups": []}
+        if len(query) < self.min_query_length:
+            return JsonResponse(data)
+        group = None
+        if "group" in request.GET:
+            group_id = parse_uuid(request.GET["group"])
+            if group_id is None:
+                return HttpResponseBadRequest("Invalid group")
+            group = StudyGroup.objects.filter(unique_id=group_id).first()
+        for card in Card.objects.similar_to(query, request.user, group, limit):
+            data["cards"].append(
+                {
+                    "unique_id": card.unique_id,
+                    "text": card.preview,
+                    "group": card.group.slug,
+                    "url": card.group.get_absolute_url(),
+                    "similarity": round(card.similarity, 3),
+                }
+            )
+        for topic in Topic.objects.similar_to(query, request.user, group, limit):
+            data["topics"].append(
+                {
+                    "unique_id": topic.unique_id,
+                    "title": topic.title,
+                    "group": topic.group.slug,
+                    "url": topic.group.get_absolute_url(),
+                    "similarity": round(topic.similarity, 3),
+                }
+            )
+        for study_group in StudyGroup.objects.similar_to(query, request.user, limit):
+            data["groups"].append(
+                {
+                    "unique_id": study_group.unique_id,
+                    "name": study_group.name,
+                    "url": study_group.get_absolute_url(),
+                    "is_member": study_group.user_is_member,
+                    "similarity": round(study_group.similarity, 3),
+                }
+            )
+        return JsonResponse(data)
+
+    def get_limit(self):
+        # top-k of each result list, bound by max_limit
+        try:
+            limit = int(self.request.GET.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+
+autocomplete_view = AutocompleteView.as_view()
+
+
 @method_decorator(login_required, name="dispatch")
 class StudyGroupCreateView(CustomRulesPermissionRequiredMixin, CreateView):
     model = StudyGroup
@@ -210,7 +459,7 @@ class StudyGroupUpdateView(CustomRulesPermissionRequiredMixin, UpdateView):
     # success_url comes from object.get_absolute_url
 
     def get_permission_object(self):
-        return self.get_object().membership_for(self.request.user)
+        return self.get_membership(self.get_object())
 
 
 group_update_view = StudyGroupUpdateView.as_view()
@@ -226,7 +475,7 @@ class StudyGroupDeleteView(CustomRulesPermissionRequiredMixin, DeleteView):
     success_url = reverse_lazy("studygroups:group_list_view")
 
     def get_permission_object(self):
-        return self.get_object().membership_for(self.request.user)
+        return self.get_membership(self.get_object())
 
 
 group_delete_view = StudyGroupDeleteView.as_view()
@@ -291,11 +540,9 @@ class LeaveStudyGroupRedirectView(RedirectView):
     def get(self, request, *args, **kwargs):
         # Deletes the membership and sets a message
         study_group = StudyGroup.objects.get(unique_id=self.kwargs["unique_id"])
-        if study_group.is_member(request.user):
-            Membership.objects.get(
-                member=self.request.user,
-                group=study_group,
-            ).delete()
+        membership = study_group.membership_for(request.user)
+        if membership:
+            membership.delete()
             # Delete performance objects for all cards|request.user
             for card in study_group.cards.all():
                 Performance.objects.filter(owner=request.user, card=card).delete()
@@ -318,17 +565,23 @@ class ManageMembershipRedirectView(CustomRulesPermissionRequiredMixin, RedirectV
     permission_required = "studygroups.manage_studygroup_memberships"
     # TODO: Refactor with SingleObjectMixin view to get the membership-to-manage by unique_id
 
+    def get_managed_membership(self):
+        # returns the membership-to-manage (with its group)
+        return self.memoize(
+            "managed_membership",
+            lambda: Membership.objects.select_related("group").get(
+                unique_id=self.kwargs["unique_id"]
+            ),
+        )
+
     def get_permission_object(self):
-        admin_membership = Membership.objects.get(
-            unique_id=self.kwargs["unique_id"]
-        ).group.membership_for(self.request.user)
+        admin_membership = self.get_membership(self.get_managed_membership().group)
         return admin_membership
 
     def get(self, request, *args, **kwargs):
         # Manage the membership and sets a message
-        unique_id = self.kwargs["unique_id"]
         verb = self.kwargs["verb"]
-        membership = Membership.objects.get(unique_id=unique_id)
+        membership = self.get_managed_membership()
         # Set redirect url
         self.url = reverse_lazy(
             "studygroups:group_detail_view", kwargs={"slug": membership.group.slug}
@@ -16,4 +16,5 @@ class UserAdmin(auth_admin.UserAdmin):
         auth_admin.UserAdmin.fieldsets
     )
     list_display = ["username", "name", "is_superuser"]
-    search_fields = ["name", "username"]
+    # username prefixes and names: indexed lookups (user autocomplete)
+    search_fields = ["^username", "name"]
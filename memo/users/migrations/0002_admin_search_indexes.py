@@ -0,0 +1,26 @@
+# Generated by Django 3.0.11 on 2026-10-19 17:29
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        # pg_trgm extension
+        ('studygroups', '0011_studygroup_name_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='users_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        # Prefix search of usernames (istartswith: UPPER(username::text) LIKE)
+        migrations.RunSQL(
+            'CREATE INDEX "users_username_upper_idx" ON "users_user" '
+            '(UPPER("username"::text) text_pattern_ops);',
+            reverse_sql='DROP INDEX "users_username_upper_idx";',
+        ),
+    ]
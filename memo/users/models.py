@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
 from django.db.models import CharField
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -9,6 +10,18 @@ from django.utils.translation import gettext_lazy as _
 class User(AbstractUser):
     """Default user for BrainGain."""
 
+    class Meta(AbstractUser.Meta):
+        # Admin search and autocomplete: the username prefix lookup
+        # (istartswith) is supported by the UPPER(username) pattern index
+        # users_username_upper_idx (migration 0002, an expression index)
+        indexes = [
+            GinIndex(
+                name="users_name_trgm_idx",
+                fields=["name"],
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
     #: First and last name do not cover name patterns around the globe
     name = CharField(_("Name of User"), blank=True, max_length=255)
 
@@ -1,11 +1,16 @@
+import json
+
 import pytest
 from django.contrib.auth.models import AnonymousUser
 from django.http.response import Http404
 from django.test import RequestFactory
+from django.utils import timezone
+from flashcards.models import Card, DailyStudyStats
 
 from memo.users.models import User
 from memo.users.tests.factories import UserFactory
 from memo.users.views import (
+    UserActivityView,
     UserRedirectView,
     UserUpdateView,
     user_detail_view,
@@ -77,3 +82,27 @@ class TestUserDetailView:
 
         with pytest.raises(Http404):
             user_detail_view(request, username="username")
+
+
+class TestUserActivityView:
+    def test_reviews_per_day(self, user: User, rf: RequestFactory):
+        card = Card.objects.create(
+            group=user.get_main_user_group(), creator=user, front_text="Question"
+        )
+        performance = card.performances.get(owner=user)
+        performance.add_recalling_datapoint(5, 10)
+        performance.save()
+        request = rf.get("/fake-url/")
+        request.user = user
+
+        response = UserActivityView.as_view()(request)
+
+        start = DailyStudyStats.objects.get_activity_start(timezone.localdate())
+        assert json.loads(response.content) == {
+            "start": start.isoformat(),
+            "days": [(timezone.localdate() - start).days],
+            "reviews": [1],
+            "correct": [1],
+            "seconds": [10],
+        }
+        assert response["ETag"]
@@ -1,6 +1,7 @@
 from django.urls import path
 
 from memo.users.views import (
+    user_activity_view,
     user_detail_view,
     user_redirect_view,
     user_update_view,
@@ -10,5 +11,6 @@ app_name = "users"
 urlpatterns = [
     path("~redirect/", view=user_redirect_view, name="redirect"),
     path("~update/", view=user_update_view, name="update"),
+    path("~activity/", view=user_activity_view, name="activity"),
     path("<str:username>/", view=user_detail_view, name="detail"),
 ]
@@ -1,9 +1,13 @@
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from django.views.generic import DetailView, RedirectView, UpdateView
+from django.views.generic import DetailView, RedirectView, UpdateView, View
+from flashcards.models import DailyStudyStats
+from utils.views import ConditionalGetMixin
 
 User = get_user_model()
 
@@ -18,6 +22,29 @@ class UserDetailView(LoginRequiredMixin, DetailView):
 user_detail_view = UserDetailView.as_view()
 
 
+class UserActivityView(LoginRequiredMixin, ConditionalGetMixin, View):
+    """Study activity heatmap data of the user (reviews per day, json)"""
+
+    def get_start(self):
+        return DailyStudyStats.objects.get_activity_start(timezone.localdate())
+
+    def get_version(self):
+        start = self.get_start()
+        version = DailyStudyStats.objects.get_version(
+            user=self.request.user, since=start
+        )
+        version["start"] = start
+        return version, None
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(
+            DailyStudyStats.objects.get_series(self.get_start(), user=request.user)
+        )
+
+
+user_activity_view = UserActivityView.as_view()
+
+
 class UserUpdateView(LoginRequiredMixin, UpdateView):
 
     model = User
@@ -0,0 +1,60 @@
+import operator
+from functools import reduce
+
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
+
+# Admin search on indexed lookups
+# icontains on a text column is an ILIKE the trigram (gin_trgm_ops) indexes
+# support, istartswith ("^") one a pattern index on UPPER(column) supports.
+# An OR across joined tables can not use those indexes, so fields of related
+# models are matched in a subquery (one per relation of the path) and filtered
+# by the ids it selects: every search term is an OR of index scans.
+
+SEARCH_LOOKUPS = {"^": "istartswith", "=": "iexact"}
+
+
+def get_search_condition(model, search_field, term):
+    """Returns the Q of a search field for term
+    search_field: "field" (icontains), "^field" (istartswith), "=field"
+    (iexact); "relation__field" matches the field of a related model, also
+    across several relations ("card__group__name")
+    """
+    lookup = SEARCH_LOOKUPS.get(search_field[:1], "icontains")
+    *relations, field_name = search_field.lstrip("^=").split("__")
+    models = [model]
+    for relation in relations:
+        related_model = models[-1]._meta.get_field(relation).related_model
+        if related_model is None:
+            raise ValueError("Not a relation in %s: %s" % (search_field, relation))
+        models.append(related_model)
+    condition = Q(**{"%s__%s" % (field_name, lookup): term})
+    for relation, related_model in reversed(list(zip(relations, models[1:]))):
+        matches = related_model._default_manager.filter(condition)
+        condition = Q(**{"%s__in" % relation: matches.values("pk")})
+    return condition
+
+
+class IndexedSearchMixin:
+    """
+    ModelAdmin search on indexed lookups (see get_search_condition)
+    Every search term has to match one of the search fields. Related matches
+    are filtered by id, so the results never need a DISTINCT.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        if not search_fields or not search_term:
+            return queryset, False
+        for term in smart_split(search_term):
+            # a quoted phrase is one term (like ModelAdmin.get_search_results)
+            if term.startswith(('"', "'")) and term[0] == term[-1]:
+                term = unescape_string_literal(term)
+            if not term:
+                continue
+            conditions = [
+                get_search_condition(queryset.model, field, term)
+                for field in search_fields
+            ]
+            queryset = queryset.filter(reduce(operator.or_, conditions))
+        return queryset, False
@@ -0,0 +1,28 @@
+from django.core.cache import cache
+
+# Hit/miss counters of cached fragments
+# Kept in the cache itself, so they are shared by all web processes
+CACHE_STATS_KEY = "cache_stats:%s:%s"
+
+
+def count_cache_access(name, hit):
+    # increments the hits or misses counter of name
+    key = CACHE_STATS_KEY % (name, "hits" if hit else "misses")
+    if cache.add(key, 1, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted since add
+        cache.set(key, 1, None)
+
+
+def get_cache_stats(name):
+    # returns hits, misses and hit rate of name
+    hits = cache.get(CACHE_STATS_KEY % (name, "hits"), 0)
+    misses = cache.get(CACHE_STATS_KEY % (name, "misses"), 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,203 @@
+import base64
+import datetime
+import json
+
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.functional import cached_property
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Keyset (cursor) pagination
+# Pages are addressed by the sort key of the last row of the previous page
+# rather than by an OFFSET, so no COUNT(*) is needed and deep pages cost as
+# much as the first one. The last ordering field must be unique (e.g. "pk").
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    # Keeps the microseconds of datetimes (DjangoJSONEncoder cuts them to ms)
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    # Returns an url safe cursor string of the sort key values
+    data = json.dumps(values, cls=CursorJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor):
+    # Returns the sort key values of a cursor string or None if invalid
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list):
+        return None
+    return values
+
+
+class KeysetPage:
+    """
+    A page of a KeysetPaginator (iterable like django's Page)
+    """
+
+    def __init__(self, object_list, next_cursor, cursor=None, query_dict=None):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.query_dict = query_dict
+
+    def __repr__(self):
+        return "<KeysetPage cursor=%s>" % (self.cursor)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        # Keyset pages can only be walked forward; the start is always reachable
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_querystring(self):
+        # Returns the GET parameters of the next page (filters are kept)
+        return self.get_querystring(self.next_cursor)
+
+    def first_querystring(self):
+        # Returns the GET parameters of the first page (filters are kept)
+        return self.get_querystring(None)
+
+    def get_querystring(self, cursor, cursor_kwarg="cursor"):
+        query_dict = QueryDict(mutable=True)
+        if self.query_dict is not None:
+            query_dict = self.query_dict.copy()
+        query_dict.pop(cursor_kwarg, None)
+        query_dict.pop("page", None)
+        if cursor:
+            query_dict[cursor_kwarg] = cursor
+        return query_dict.urlencode()
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by the values of its ordering fields
+    ordering: e.g. ("-created_at", "pk"); a leading "-" sorts descending
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = int(per_page)
+        self.fields = [(field.lstrip("-"), field.startswith("-")) for field in ordering]
+
+    def get_page(self, cursor=None, query_dict=None):
+        # Returns the page following the cursor (first page for no/invalid cursor)
+        queryset = self.queryset.order_by(*self.ordering)
+        values = decode_cursor(cursor) if cursor else None
+        if values is not None and len(values) == len(self.fields):
+            queryset = queryset.filter(self.get_cursor_filter(values))
+        else:
+            cursor = None
+        # Fetch one row more to know if there is a next page
+        object_list = list(queryset[: self.per_page + 1])
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[: self.per_page]
+            next_cursor = self.get_cursor(object_list[-1])
+        return KeysetPage(object_list, next_cursor, cursor, query_dict)
+
+    def get_cursor(self, obj):
+        # Returns the cursor pointing behind obj
+        return encode_cursor([getattr(obj, name) for name, descending in self.fields])
+
+    def get_cursor_filter(self, values):
+        # (a > x) | (a = x & b > y) | (a = x & b = y & c > z) ...
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = "%s__%s" % (name, "lt" if descending else "gt")
+            condition |= equal & Q(**{lookup: value})
+            equal &= Q(**{name: value})
+        return condition
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Keyset pagination of api views
+    The ordering is taken from the view (ordering attribute, default "pk").
+    Returns {"next": <url of the next page or null>, "results": [...]}
+    """
+
+    page_size = 100
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, "ordering", None) or ("pk",)
+        paginator = KeysetPaginator(queryset, ordering, self.page_size)
+        self.request = request
+        self.page = paginator.get_page(
+            request.query_params.get(self.cursor_query_param)
+        )
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_next_link(self):
+        if not self.page.has_next():
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.page.next_cursor)
+
+
+# Estimated counts
+# COUNT(*) scans the whole table. Unfiltered querysets of large tables are
+# counted with the planner's row estimate of the table instead (pg_class
+# reltuples, kept up to date by autovacuum and ANALYZE).
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting unfiltered querysets by the table's row estimate
+    Filtered querysets and tables estimated below exact_count_limit rows are
+    counted exactly. The last pages of an estimate may be empty.
+    """
+
+    exact_count_limit = 10000
+
+    def get_estimated_count(self):
+        # returns the row estimate of the queryset's table or None (filtered)
+        query = getattr(self.object_list, "query", None)
+        if query is None or query.where or query.distinct or query.is_sliced:
+            return None
+        with connections[self.object_list.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)",
+                [self.object_list.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
+
+    @cached_property
+    def count(self):
+        estimate = self.get_estimated_count()
+        if estimate is None or estimate < self.exact_count_limit:
+            return super().count
+        return estimate
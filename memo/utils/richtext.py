@@ -0,0 +1,93 @@
+import html
+import re
+
+import bleach
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# Rich text (CKEditor) rendering
+# Card content is sanitized and projected to plain text once when it is
+# written, so the request path only prints the stored columns.
+# See: https://bleach.readthedocs.io/en/latest/clean.html
+
+ALLOWED_TAGS = [
+    "a",
+    "abbr",
+    "b",
+    "blockquote",
+    "br",
+    "code",
+    "div",
+    "em",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "hr",
+    "i",
+    "img",
+    "li",
+    "ol",
+    "p",
+    "pre",
+    "s",
+    "span",
+    "strike",
+    "strong",
+    "sub",
+    "sup",
+    "table",
+    "tbody",
+    "td",
+    "th",
+    "thead",
+    "tr",
+    "u",
+    "ul",
+]
+ALLOWED_ATTRIBUTES = {
+    "*": ["class", "style", "title"],
+    "a": ["href", "rel", "target"],
+    "img": ["alt", "height", "src", "width"],
+    "td": ["colspan", "rowspan"],
+    "th": ["colspan", "rowspan"],
+}
+ALLOWED_STYLES = [
+    "background-color",
+    "color",
+    "float",
+    "font-style",
+    "font-weight",
+    "height",
+    "text-align",
+    "text-decoration",
+    "width",
+]
+ALLOWED_PROTOCOLS = ["http", "https", "mailto"]
+
+PREVIEW_LENGTH = 80
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def sanitize_html(text):
+    # Returns text with all but the allowed tags, attributes and styles removed
+    return bleach.clean(
+        text or "",
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        styles=ALLOWED_STYLES,
+        protocols=ALLOWED_PROTOCOLS,
+        strip=True,
+    )
+
+
+def plain_text(text):
+    # Returns the whitespace collapsed text content of (sanitized) html
+    return WHITESPACE_RE.sub(" ", html.unescape(strip_tags(text or ""))).strip()
+
+
+def preview(text, length=PREVIEW_LENGTH):
+    # Returns plain text shortened to length characters (with an ellipsis)
+    return Truncator(text).chars(length)
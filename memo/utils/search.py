@@ -0,0 +1,52 @@
+import difflib
+import html
+import re
+
+from django.db.models import CharField, FloatField, Func, Lookup, TextField, Value
+from django.utils.html import strip_tags
+
+# Trigram (pg_trgm) helpers for fuzzy search
+# See: https://www.postgresql.org/docs/current/pgtrgm.html
+
+WHITESPACE_RE = re.compile(r"\s+")
+WORD_RE = re.compile(r"\w{3,}")
+
+
+def normalize_search_text(*parts):
+    # Returns the lowercased plain text of the given (rich text) parts
+    text = " ".join(html.unescape(strip_tags(part or "")) for part in parts)
+    return WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def closest_term(query, texts, cutoff=0.6):
+    # Returns the word of texts that is closest to the query or None
+    words = set()
+    for text in texts:
+        words.update(WORD_RE.findall(text))
+    matches = difflib.get_close_matches(query, words, n=1, cutoff=cutoff)
+    if matches:
+        return matches[0]
+    return None
+
+
+class TrigramWordSimilarity(Func):
+    # word_similarity(query, field): greatest similarity of query to a word extent of field
+    function = "WORD_SIMILARITY"
+    output_field = FloatField()
+
+    def __init__(self, expression, string, **extra):
+        if not hasattr(string, "resolve_expression"):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class TrigramWordSimilar(Lookup):
+    # field %> query: index supported (gin_trgm_ops) word similarity lookup
+    lookup_name = "trigram_word_similar"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return "%s %%%%> %s" % (lhs, rhs), lhs_params + rhs_params
@@ -0,0 +1,81 @@
+import datetime
+import uuid
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils import timezone
+
+from memo.utils.pagination import (
+    EstimatedCountPaginator,
+    KeysetPage,
+    KeysetPaginator,
+    decode_cursor,
+    encode_cursor,
+)
+from memo.utils.search import closest_term, normalize_search_text
+from memo.utils.views import parse_uuid
+
+
+class TestKeysetCursor:
+    def test_cursor_roundtrip_keeps_microseconds(self):
+        created_at = timezone.make_aware(datetime.datetime(2021, 1, 2, 3, 4, 5, 678901))
+        cursor = encode_cursor([created_at, Decimal("42.5"), 7])
+        assert decode_cursor(cursor) == [created_at.isoformat(), "42.5", 7]
+
+    def test_invalid_cursor(self):
+        assert decode_cursor("not-a-cursor") is None
+        assert decode_cursor(encode_cursor({"a": 1})) is None
+
+    def test_cursor_filter(self):
+        paginator = KeysetPaginator(None, ("-created_at", "pk"), 8)
+        condition = paginator.get_cursor_filter(["2021-01-01", 3])
+        assert condition == Q(created_at__lt="2021-01-01") | (
+            Q(created_at="2021-01-01") & Q(pk__gt=3)
+        )
+
+    def test_page_querystring_keeps_filters(self):
+        page = KeysetPage([], "abc", "xyz", QueryDict("search=foo&cursor=xyz&page=2"))
+        assert page.has_next() and page.has_previous()
+        assert page.next_querystring() == "search=foo&cursor=abc"
+        assert page.first_querystring() == "search=foo"
+
+
+@pytest.mark.django_db
+class TestEstimatedCountPaginator:
+    def test_filtered_querysets_are_counted(self):
+        users = get_user_model().objects.filter(is_staff=True)
+        assert EstimatedCountPaginator(users, 10).get_estimated_count() is None
+        assert EstimatedCountPaginator(users, 10).count == users.count()
+
+    def test_estimate_of_large_tables(self, monkeypatch):
+        users = get_user_model().objects.all()
+        assert EstimatedCountPaginator(users, 10).get_estimated_count() is not None
+        monkeypatch.setattr(
+            EstimatedCountPaginator, "get_estimated_count", lambda self: 20000
+        )
+        assert EstimatedCountPaginator(users, 10).count == 20000
+        assert EstimatedCountPaginator(users, 10).num_pages == 2000
+
+
+class TestSearchHelpers:
+    def test_normalize_search_text(self):
+        text = normalize_search_text("<p>Caf&eacute;  <b>AU</b></p>", None, "Lait")
+        assert text == "café au lait"
+
+    def test_closest_term(self):
+        texts = ["photosynthesis in plants", "cell respiration"]
+        assert closest_term("photosynthsis", texts) == "photosynthesis"
+        assert closest_term("xylophone", texts) is None
+
+    def test_trigram_word_similar_lookup(self):
+        users = get_user_model().objects.filter(name__trigram_word_similar="ann")
+        assert '"users_user"."name" %> ann' in str(users.query)
+
+    def test_parse_uuid(self):
+        value = uuid.uuid4()
+        assert parse_uuid(str(value)) == value
+        assert parse_uuid("not-a-uuid") is None
+        assert parse_uuid(None) is None
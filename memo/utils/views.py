@@ -1,5 +1,25 @@
+import hashlib
+import json
+import uuid
+from calendar import timegm
+
 import rules
+from django.contrib import messages
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+from flashcards.models import Performance
 from rules.contrib.views import PermissionRequiredMixin
+from utils.pagination import CursorJSONEncoder, KeysetPaginator
+
+
+def parse_uuid(value):
+    # returns the UUID of a request parameter or None (missing or malformed)
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError, AttributeError):
+        return None
 
 
 class CustomRulesPermissionRequiredMixin(PermissionRequiredMixin):
@@ -7,5 +27,115 @@ class CustomRulesPermissionRequiredMixin(PermissionRequiredMixin):
     # (calling them directly rather than self.request.user.has_perms(perms, obj) )
     # See: https://github.com/dfunckt/django-rules/blob/master/rules/contrib/views.py LINE 47
     def has_permission(self):
-        obj = self.get_permission_object()
+        obj = self.memoize("permission_object", self.get_permission_object)
         return rules.has_perm(self.permission_required, self.request.user, obj)
+
+    # Request scoped identity map
+    # A view instance lives for one request, so rows loaded through memoize
+    # (object, permission object, memberships, ...) are fetched only once
+    def memoize(self, key, loader):
+        # returns the value stored under key (calls loader on first access)
+        identity_map = self.__dict__.setdefault("_identity_map", {})
+        if key not in identity_map:
+            identity_map[key] = loader()
+        return identity_map[key]
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        return self.memoize("object", super().get_object)
+
+    def get_membership(self, group):
+        # returns the membership of the request user in group (or None)
+        return self.memoize(
+            ("membership", group.pk), lambda: group.membership_for(self.request.user)
+        )
+
+
+class KeysetPaginationMixin:
+    # Replaces the OFFSET pagination of ListView with keyset (cursor) pagination
+    # keyset_ordering must end with a unique field (tie breaker)
+    cursor_kwarg = "cursor"
+    keyset_ordering = ("pk",)
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.get_keyset_ordering(), page_size)
+        page = paginator.get_page(
+            self.request.GET.get(self.cursor_kwarg), self.request.GET
+        )
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
+class ConditionalGetMixin:
+    # Conditional GET (ETag / Last-Modified)
+    # get_version returns a cheap summary of everything the response depends on
+    # (json serializable) and its last modification (or None). Requests of a
+    # version the client already has are answered with 304 Not Modified before
+    # any template work. Put it behind permission mixins (checked first).
+
+    # relative times of a page ("active 5 minutes ago") are at most that stale
+    etag_lifetime = 60 * 10
+
+    def get_version(self):
+        # returns (version, last_modified) or None (no conditional response)
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or self.has_pending_messages():
+            return super().dispatch(request, *args, **kwargs)
+        version = self.get_version()
+        if version is None:
+            return super().dispatch(request, *args, **kwargs)
+        etag = self.get_etag(version[0])
+        last_modified = version[1] and timegm(version[1].utctimetuple())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        # The page is personal: browsers may store it but must revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_layout_version(self):
+        # the layout shows the due card count of the user (navbar badge, see
+        # flashcards.context_processors.due_cards) and the page its relative
+        # times, which change with the clock
+        user = self.request.user
+        return [
+            (
+                Performance.objects.get_due_count(user.pk)
+                if user.is_authenticated
+                else None
+            ),
+            int(timezone.now().timestamp() // self.etag_lifetime),
+        ]
+
+    def get_etag(self, version):
+        # the page also depends on the user (and their login), language, url
+        # and layout
+        user = self.request.user
+        data = json.dumps(
+            [
+                user.pk,
+                getattr(user, "last_login", None),
+                get_language(),
+                self.request.get_full_path(),
+                self.get_layout_version(),
+                version,
+            ],
+            cls=CursorJSONEncoder,
+        )
+        return quote_etag(hashlib.md5(data.encode()).hexdigest())
+
+    def has_pending_messages(self):
+        # pending messages are shown (and consumed) by the next rendered page
+        return len(messages.get_messages(self.request)) > 0